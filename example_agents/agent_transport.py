@@ -0,0 +1,35 @@
+"""
+Agent Transport: Injectable broker connection and monitor client for BaseAgent subclasses.
+
+The example agents mix AgentTransport in ahead of BaseAgent and call setup_transport()
+from their constructor. By default an agent keeps the STOMP connection BaseAgent built
+and talks to the monitor through a MonitorClient from the environment. A STOMP-compatible
+connection and a MonitorClient-compatible monitor can be passed instead, the way
+DAQSimulator takes connection= and monitor= (e.g. local_transport.LocalConnection and
+LocalMonitorAPI to run without ActiveMQ and the monitor).
+
+BaseAgent's own monitor calls (heartbeats, status reports, call_monitor_api) stay as they
+are; the HTTP session BaseAgent built is replaced by the client's pooled session, so they
+share its connection pool and reach an injected monitor.
+"""
+
+import requests
+
+from swf_testbed_cli.monitor_client import MonitorClient
+
+
+class AgentTransport:
+    """BaseAgent mixin: connection and monitor client injection."""
+
+    def setup_transport(self, connection=None, monitor=None):
+        """Use the given connection and monitor client instead of the defaults."""
+        if connection is not None:
+            self.conn = connection
+            self.conn.set_listener(self.agent_name, self)
+        self.monitor_client = monitor or MonitorClient.from_env(monitor_url=getattr(self, 'monitor_url', None),
+                                                                api_token=getattr(self, 'api_token', None))
+        session = self.monitor_client.session
+        for name, value in list(vars(self).items()):
+            if isinstance(value, requests.Session) and value is not session:
+                value.close()
+                setattr(self, name, session)
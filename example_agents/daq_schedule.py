@@ -0,0 +1,190 @@
+"""
+DAQ Schedule: Declarative run schedules for the DAQ simulator.
+
+A schedule file (JSON, or YAML when PyYAML is installed) lists the runs to simulate.
+Each entry may override the defaults for its state durations, physics periods and the
+gap before the next run, and may be repeated with 'count':
+
+    defaults:
+      states:                     # seconds spent in each DAQ state
+        no_beam_not_ready: 5      # collider not operating
+        beam_not_ready: 5         # run start imminent (after run_imminent)
+        beam_ready: 2             # ready for physics
+        standby: 2                # between consecutive physics periods
+        run_end: 5                # beam/not_ready after end_run
+      physics_periods:            # STF rate in Hz for each physics period
+        - {duration: 10, stf_rate: 0.5}
+        - {duration: 10, stf_rate: 0.5}
+      gap_after: 60               # seconds between the end of a run and the next run
+      streams:                    # parallel STF producers (omit for a single producer)
+        - {id: tof, count: 4}     # tof00..tof03 at each physics period's stf_rate
+        - {id: calo, stf_rate: 2, payload: {dist: lognormal, size: 500M, sigma: 0.3}}
+    runs:
+      - count: 3
+      - physics_periods: [{duration: 3600, stf_rate: 10}]
+        start_after: 30           # overlap: start 30s after the previous run started
+
+Without 'start_after' a run starts 'gap_after' seconds after the previous run ended.
+A stream's 'stf_rate' (Hz) replaces the period's rate for that stream, and its 'payload'
+(dist, size, sigma, seed) replaces the simulator's payload size distribution.
+"""
+
+import copy
+import json
+import re
+from pathlib import Path
+
+from stf_payload import DISTRIBUTIONS, parse_size
+
+DEFAULT_STATES = {
+    'no_beam_not_ready': 5,
+    'beam_not_ready': 5,
+    'beam_ready': 2,
+    'standby': 2,
+    'run_end': 5,
+}
+
+DEFAULT_RUN = {
+    'states': DEFAULT_STATES,
+    'physics_periods': [
+        {'duration': 10, 'stf_rate': 0.5},
+        {'duration': 10, 'stf_rate': 0.5},
+    ],
+    'gap_after': 60,
+    'start_after': None,
+    'streams': None,
+}
+
+STREAM_PAYLOAD_KEYS = {'dist', 'size', 'sigma', 'seed'}
+
+
+def default_run_spec():
+    """The built-in run: the fixed cycle the simulator has always run."""
+    return copy.deepcopy(DEFAULT_RUN)
+
+
+def cycle_schedule(num_cycles):
+    """Back-to-back default runs, as produced by --cycles."""
+    return [default_run_spec() for _ in range(num_cycles)]
+
+
+def load_schedule(path):
+    """Load and validate a schedule file; returns the expanded list of run specs."""
+    path = Path(path)
+    text = path.read_text()
+    if path.suffix.lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as e:
+            raise RuntimeError(f"PyYAML is required to read YAML schedule {path}") from e
+        document = yaml.safe_load(text)
+    else:
+        document = json.loads(text)
+    return parse_schedule(document)
+
+
+def uniform_streams(count, prefix='s'):
+    """count identical streams (s00, s01, ...) at the physics periods' rates, as produced by --streams."""
+    return [{'id': f"{prefix}{index:02d}", 'stf_rate': None, 'payload': None} for index in range(count)]
+
+
+def parse_schedule(document):
+    """Validate a schedule document and expand 'count' into individual run specs."""
+    if not isinstance(document, dict) or not isinstance(document.get('runs'), list):
+        raise ValueError("Schedule must be a mapping with a 'runs' list")
+
+    defaults = _merge_run(DEFAULT_RUN, document.get('defaults') or {}, 'defaults')
+    runs = []
+    for index, entry in enumerate(document['runs']):
+        where = f"runs[{index}]"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{where} must be a mapping")
+        count = entry.get('count', 1)
+        if not isinstance(count, int) or count < 1:
+            raise ValueError(f"{where}.count must be a positive integer")
+        spec = _merge_run(defaults, entry, where)
+        runs.extend(copy.deepcopy(spec) for _ in range(count))
+    if not runs:
+        raise ValueError("Schedule contains no runs")
+    return runs
+
+
+def _merge_run(base, overrides, where):
+    unknown = set(overrides) - set(DEFAULT_RUN) - {'count'}
+    if unknown:
+        raise ValueError(f"{where}: unknown keys {', '.join(sorted(unknown))}")
+
+    spec = copy.deepcopy(base)
+    states = overrides.get('states') or {}
+    unknown = set(states) - set(DEFAULT_STATES)
+    if unknown:
+        raise ValueError(f"{where}.states: unknown states {', '.join(sorted(unknown))}")
+    for name, seconds in states.items():
+        spec['states'][name] = _non_negative(seconds, f"{where}.states.{name}")
+
+    if 'physics_periods' in overrides:
+        periods = overrides['physics_periods']
+        if not isinstance(periods, list) or not periods:
+            raise ValueError(f"{where}.physics_periods must be a non-empty list")
+        spec['physics_periods'] = []
+        for i, period in enumerate(periods):
+            label = f"{where}.physics_periods[{i}]"
+            if not isinstance(period, dict):
+                raise ValueError(f"{label} must be a mapping")
+            duration = _non_negative(period.get('duration'), f"{label}.duration")
+            stf_rate = _non_negative(period.get('stf_rate', 0.5), f"{label}.stf_rate")
+            if stf_rate == 0:
+                raise ValueError(f"{label}.stf_rate must be positive")
+            spec['physics_periods'].append({'duration': duration, 'stf_rate': stf_rate})
+
+    if overrides.get('streams') is not None:
+        spec['streams'] = _parse_streams(overrides['streams'], f"{where}.streams")
+
+    if 'gap_after' in overrides:
+        spec['gap_after'] = _non_negative(overrides['gap_after'], f"{where}.gap_after")
+    if overrides.get('start_after') is not None:
+        spec['start_after'] = _non_negative(overrides['start_after'], f"{where}.start_after")
+    return spec
+
+
+def _parse_streams(entries, where):
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{where} must be a non-empty list")
+    streams = []
+    seen = set()
+    for i, entry in enumerate(entries):
+        label = f"{where}[{i}]"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{label} must be a mapping")
+        unknown = set(entry) - {'id', 'count', 'stf_rate', 'payload'}
+        if unknown:
+            raise ValueError(f"{label}: unknown keys {', '.join(sorted(unknown))}")
+        stream_id = str(entry.get('id', ''))
+        if not re.fullmatch(r'[A-Za-z0-9-]+', stream_id):
+            # The stream ID is part of STF filenames
+            raise ValueError(f"{label}.id must be letters, digits or '-', got {stream_id!r}")
+        count = entry.get('count', 1)
+        if not isinstance(count, int) or count < 1:
+            raise ValueError(f"{label}.count must be a positive integer")
+        stf_rate = entry.get('stf_rate')
+        if stf_rate is not None and not _non_negative(stf_rate, f"{label}.stf_rate"):
+            raise ValueError(f"{label}.stf_rate must be positive")
+        payload = entry.get('payload')
+        if payload is not None:
+            if not isinstance(payload, dict) or set(payload) - STREAM_PAYLOAD_KEYS:
+                raise ValueError(f"{label}.payload must be a mapping of {', '.join(sorted(STREAM_PAYLOAD_KEYS))}")
+            if payload.get('dist', 'fixed') not in DISTRIBUTIONS:
+                raise ValueError(f"{label}.payload.dist must be one of {', '.join(DISTRIBUTIONS)}")
+            payload = dict(payload, size=parse_size(payload.get('size', '1.5G')))
+        for sid in [stream_id] if count == 1 else [f"{stream_id}{n:02d}" for n in range(count)]:
+            if sid in seen:
+                raise ValueError(f"{label}: duplicate stream ID {sid}")
+            seen.add(sid)
+            streams.append({'id': sid, 'stf_rate': stf_rate, 'payload': payload})
+    return streams
+
+
+def _non_negative(value, label):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"{label} must be a non-negative number, got {value!r}")
+    return value
@@ -5,13 +5,18 @@ Generates workflow events that drive the testbed agents
 """
 
 import simpy
+import simpy.rt
 import json
 import os
 import sys
 import logging
-from datetime import datetime
+import logging.handlers
+import queue
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
-import stomp
 import time
 
 def setup_environment():
@@ -54,15 +59,119 @@ def setup_environment():
 
 # Import the centralized logging from swf-common-lib
 from swf_common_lib.rest_logging import setup_rest_logging
+from swf_testbed_cli.monitor_client import MonitorClient
+
+from daq_schedule import cycle_schedule, default_run_spec, load_schedule, uniform_streams
+from event_index import INDEX_FILE, EventIndex
+from event_journal import CODECS, EventJournal
+from heartbeat_scheduler import HeartbeatScheduler
+from hop_timing import stamp_origin
+from run_number_allocator import RunNumberAllocator
+from stomp_publisher import QueuedPublisher, mq_settings_from_env, open_stomp_connection
+from stf_payload import CHECKSUMS, DISTRIBUTIONS, WRITE_MODES, PayloadGenerator, parse_size
+
+
+LOG_MODES = ('rest', 'buffered', 'local')
+CLOCK_MODES = ('fast', 'realtime', 'scaled')
+
+
+def create_environment(clock_mode='fast', time_scale=10.0):
+    """
+    Create the SimPy environment for a clock mode.
+    
+    'fast' advances simulated time as fast as the CPU allows, 'realtime' ties one
+    simulated second to one wall-clock second, and 'scaled' runs time_scale simulated
+    seconds per wall-clock second (e.g. 100 replays a 24h schedule in under 15 minutes).
+    Realtime environments are non-strict: if event handling falls behind the wall
+    clock the simulation catches up instead of failing.
+    """
+    if clock_mode == 'fast':
+        return simpy.Environment()
+    if clock_mode == 'realtime':
+        return simpy.rt.RealtimeEnvironment(factor=1.0, strict=False)
+    if clock_mode == 'scaled':
+        if time_scale <= 0:
+            raise ValueError(f"Time scale must be positive, got {time_scale}")
+        return simpy.rt.RealtimeEnvironment(factor=1.0 / time_scale, strict=False)
+    raise ValueError(f"Unknown clock mode '{clock_mode}' (expected one of {', '.join(CLOCK_MODES)})")
+
+
+def setup_simulator_logging(app_name, instance_name, log_mode='rest'):
+    """
+    Set up simulator logging.
+    
+    'rest' sends every record to the monitor from the calling thread, 'buffered' queues
+    records and ships them to the REST handlers from a background thread, and 'local'
+    logs warnings and errors to the console only, without touching the monitor.
+    """
+    if log_mode == 'local':
+        logger = logging.getLogger(f"{app_name}.{instance_name}")
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(levelname)s %(message)s'))
+            logger.addHandler(handler)
+        logger.setLevel(logging.WARNING)
+        logger.propagate = False
+        return logger
+    
+    logger = setup_rest_logging(app_name, instance_name)
+    if log_mode == 'buffered':
+        rest_handlers = [h for h in logger.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+        if rest_handlers:
+            queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+            queue_handler.listener = logging.handlers.QueueListener(
+                queue_handler.queue, *rest_handlers, respect_handler_level=True)
+            for handler in rest_handlers:
+                logger.removeHandler(handler)
+            logger.addHandler(queue_handler)
+            queue_handler.listener.start()
+    elif log_mode != 'rest':
+        raise ValueError(f"Unknown log mode '{log_mode}' (expected one of {', '.join(LOG_MODES)})")
+    return logger
+
+
+def drain_logger(logger):
+    """Ship any queued log records and stop background log shipping (call once at shutdown)."""
+    for handler in logger.handlers:
+        listener = getattr(handler, 'listener', None)
+        if listener is not None:
+            listener.stop()
+        else:
+            handler.flush()
 
 
 class DAQSimulator:
     """ePIC DAQ state machine simulator using SimPy"""
     
-    def __init__(self, env):
+    def __init__(self, env, persist_payload=True, persist_events=True, log_mode='rest', sim_epoch=None,
+                 run_number_block=10, run_number_state='daq_state/run_numbers.json', payload=None,
+                 connection=None, monitor=None, event_codec='json', shard=None, run_numbers=None,
+                 events_dir="daq_events"):
         self.env = env
+        # Optional transport overrides (e.g. local_transport.LocalConnection / LocalMonitorAPI)
+        # for running without ActiveMQ and the monitor
+        self._connection = connection
+        # Wall-clock datetime of simulation tick 0; message timestamps follow the simulation clock
+        self.sim_epoch = sim_epoch or datetime.now()
+        # Headless load tests can skip STF payload files and per-event JSON files
+        self.persist_payload = persist_payload
+        self.persist_events = persist_events
+        self._run_dirs = set()  # Run directories already created under daq_data/
+        # Optional stf_payload.PayloadGenerator; without one STF files hold a short text stub
+        self.payload = payload
         self.file_counter = 0  # Serial counter for unique filenames across all runs
-        self.current_run_id = None
+        self.run_file_counts = {}  # STFs generated per run (reported in end_run)
+        self.current_run_id = None  # Most recently started run
+        self.stream_file_counts = {}  # run_id -> {stream_id: STFs generated} for multi-stream runs
+        self._stream_payloads = {}  # stream_id -> PayloadGenerator for streams with their own profile
+        
+        # Multi-stream runs can be sharded across processes: this simulator emits the streams
+        # whose index % shard_count == shard_index and only counts the others. Shard 0 owns run
+        # control (run numbers, run state broadcasts, heartbeats); the other shards follow the
+        # same schedule with the run numbers handed to them.
+        self.shard_index, self.shard_count = shard or (0, 1)
+        self.run_control = self.shard_index == 0
+        self._assigned_run_numbers = deque(run_numbers) if run_numbers is not None else None
         
         # Agent identity
         self.agent_name = 'daq-simulator'
@@ -72,94 +181,98 @@ class DAQSimulator:
         self.monitor_url = os.getenv('SWF_MONITOR_URL', 'https://pandaserver02.sdcc.bnl.gov/swf-monitor')
         self.api_token = os.getenv('SWF_API_TOKEN')
         
-        # Set up API session
-        import requests
-        self.api_session = requests.Session()
-        if self.api_token:
-            self.api_session.headers.update({'Authorization': f'Token {self.api_token}'})
-        
-        # For localhost development, disable SSL verification
-        if 'localhost' in self.monitor_url:
-            self.api_session.verify = False
-            import urllib3
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        # All monitor calls go through the pooled, retrying client (SSL verification is
+        # disabled for localhost development)
+        self.monitor = monitor or MonitorClient.from_env(monitor_url=self.monitor_url, api_token=self.api_token)
         
         # STF generation parameters
         self.stf_interval = 2  # STFs every 2 seconds during physics (~0.5Hz)
         
         # Set up centralized logging
-        self.logger = setup_rest_logging('daqsim-agent', 'daqsim-simulator-1')
+        self.logger = setup_simulator_logging('daqsim-agent', 'daqsim-simulator-1', log_mode)
+        
+        # Run numbers are reserved from the monitor in blocks and cached across restarts
+        self.run_numbers = RunNumberAllocator(self.reserve_run_numbers, block_size=run_number_block,
+                                              state_file=run_number_state, logger=self.logger)
         
-        # Create output directories
-        Path("daq_events").mkdir(exist_ok=True)
+        # Create output directories; broadcast events go to one append-only journal segment per run
         Path("daq_data").mkdir(exist_ok=True)
+        self.journal = EventJournal(events_dir, codec=event_codec) if persist_events else None
+        # Per-run/per-type message counters, saved to daq_events/index.json at each run end
+        self.event_index = EventIndex(Path(events_dir) / INDEX_FILE if persist_events else None)
         
         # Setup ActiveMQ connection
         self.setup_activemq()
         
+        # Heartbeats run at a fixed cadence in the background; the STF loop only updates counters
+        self.heartbeat = HeartbeatScheduler(
+            self.send_heartbeat,
+            interval=float(os.getenv('SWF_HEARTBEAT_INTERVAL', '30')),
+            jitter=float(os.getenv('SWF_HEARTBEAT_JITTER', '0.1')),
+            logger=self.logger,
+            name='daqsim-heartbeat'
+        )
+        
         # Send initial registration/heartbeat
-        self.send_heartbeat()
+        if self.run_control:
+            self.heartbeat.send_now()
+            self.heartbeat.start()
+    
+    def sim_datetime(self):
+        """Datetime of the current simulation tick"""
+        return self.sim_epoch + timedelta(seconds=self.env.now)
     
     def get_next_run_number(self):
-        """Get the next run number from persistent state API."""
+        """Get the next run number from the locally reserved block (monitor only when it is used up)."""
+        if self._assigned_run_numbers is not None:
+            if not self._assigned_run_numbers:
+                raise RuntimeError("No assigned run numbers left for this producer shard")
+            return self._assigned_run_numbers.popleft()
         try:
-            url = f"{self.monitor_url}/api/state/next-run-number/"
-            response = self.api_session.post(url, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get('status') == 'success':
-                run_number = data.get('run_number')
-                self.logger.info(f"Got next run number from persistent state: {run_number}")
-                return str(run_number)  # Return as string for consistency
-            else:
-                raise RuntimeError(f"API returned error: {data.get('error', 'Unknown error')}")
-                
+            run_number = self.run_numbers.next()
+            self.logger.info(f"Using run number {run_number} ({self.run_numbers.remaining()} reserved)")
+            return run_number
         except Exception as e:
-            self.logger.error(f"Failed to get next run number from API: {e}")
+            self.logger.error(f"Failed to get next run number: {e}")
             raise RuntimeError(f"Critical failure getting run number: {e}") from e
+    
+    def assign_run_numbers(self, count):
+        """Draw the run numbers of the next count runs now (to hand the same ones to producer shards)."""
+        run_numbers = [self.get_next_run_number() for _ in range(count)]
+        self._assigned_run_numbers = deque(run_numbers)
+        return run_numbers
+    
+    def reserve_run_numbers(self, count):
+        """Reserve up to count run numbers from the persistent state API."""
+        numbers = []
+        while len(numbers) < count:
+            # Ask for the whole block; allocators that only hand out one number per call are polled
+            data = self.monitor.call_api('POST', '/state/next-run-number/', {'count': count - len(numbers)})
+            if data.get('status') != 'success':
+                raise RuntimeError(f"API returned error: {data.get('error', 'Unknown error')}")
+            if data.get('run_numbers'):
+                numbers.extend(str(n) for n in data['run_numbers'])
+            else:
+                numbers.append(str(data.get('run_number')))  # Return as string for consistency
+        self.logger.info(f"Got run numbers from persistent state: {', '.join(numbers)}")
+        return numbers[:count]
         
     def setup_activemq(self):
-        """Setup connection to ActiveMQ broker using same pattern as base_agent"""
+        """Setup connection to ActiveMQ broker and the queued publisher that sends on it"""
         # Configuration from environment variables
-        self.mq_host = os.getenv('ACTIVEMQ_HOST', 'pandaserver02.sdcc.bnl.gov')
-        self.mq_port = int(os.getenv('ACTIVEMQ_PORT', 61612))
-        self.mq_user = os.getenv('ACTIVEMQ_USER', 'wenauseic')
-        self.mq_password = os.getenv('ACTIVEMQ_PASSWORD', 'swf123_wenauseic')
-        self.use_ssl = os.getenv('ACTIVEMQ_USE_SSL', 'True').lower() == 'true'
-        self.ssl_ca_certs = os.getenv('ACTIVEMQ_SSL_CA_CERTS', '/eic/u/wenauseic/github/swf-monitor/full-chain.pem')
+        settings = mq_settings_from_env()
+        self.mq_settings = settings
+        self.mq_host = settings['host']
+        self.mq_port = settings['port']
+        self.mq_user = settings['user']
+        self.mq_password = settings['password']
+        self.use_ssl = settings['use_ssl']
+        self.ssl_ca_certs = settings['ssl_ca_certs']
         
         self.logger.info(f"Connecting to ActiveMQ at {self.mq_host}:{self.mq_port}")
         
-        # Create connection matching base_agent pattern
-        self.conn = stomp.Connection(
-            host_and_ports=[(self.mq_host, self.mq_port)],
-            vhost=self.mq_host,
-            try_loopback_connect=False
-        )
-        
-        # Configure SSL if enabled
-        if self.use_ssl:
-            import ssl
-            self.logger.info(f"Configuring SSL connection with CA certs: {self.ssl_ca_certs}")
-            self.conn.transport.set_ssl(
-                for_hosts=[(self.mq_host, self.mq_port)],
-                ca_certs=self.ssl_ca_certs,
-                ssl_version=ssl.PROTOCOL_TLS_CLIENT
-            )
-        
         try:
-            # Connect with STOMP version 1.1
-            self.conn.connect(
-                self.mq_user, 
-                self.mq_password, 
-                wait=True, 
-                version='1.1',
-                headers={
-                    'client-id': 'daqsim-simulator',
-                    'heart-beat': '30000,3600000'  # Send heartbeat every 30sec, timeout after 1hr
-                }
-            )
+            self.conn = self.connect_activemq()
             self.logger.info("Successfully connected to ActiveMQ")
             
             # Set the destination topic
@@ -168,20 +281,62 @@ class DAQSimulator:
         except Exception as e:
             self.logger.error(f"Failed to connect to ActiveMQ: {e}")
             raise
+        
+        # Outbound messages are queued and sent by a background thread that reconnects
+        # with backoff and replays the queue, so broker hiccups never stall simulated time
+        self.publisher = QueuedPublisher(
+            self.connect_activemq,
+            conn=self.conn,
+            max_queue=int(os.getenv('SWF_PUBLISHER_QUEUE_SIZE', '10000')),
+            overflow=os.getenv('SWF_PUBLISHER_OVERFLOW', 'drop_oldest'),
+            block_timeout=float(os.getenv('SWF_PUBLISHER_BLOCK_TIMEOUT', '5')),
+            logger=self.logger,
+            name='daqsim-publisher'
+        )
     
-    def send_message(self, destination, message_body):
-        """Send a JSON message to a specific destination - same as base_agent"""
-        try:
-            self.conn.send(body=json.dumps(message_body), destination=destination)
-            self.logger.debug(f"Sent {message_body.get('msg_type')} message to '{destination}'")
-        except Exception as e:
-            self.logger.error(f"Failed to send message to '{destination}': {e}")
+    def connect_activemq(self):
+        """Open a new connection to ActiveMQ (initial connect and publisher reconnects)"""
+        if self._connection is not None:
+            self._connection.connect()
+            self.conn = self._connection
+            return self.conn
+        self.conn = open_stomp_connection(
+            self.mq_settings,
+            client_id='daqsim-simulator',
+            heart_beat='30000,3600000',  # Send heartbeat every 30sec, timeout after 1hr
+            logger=self.logger
+        )
+        return self.conn
     
-    def send_heartbeat(self):
+    def send_message(self, destination, message_body):
+        """Queue a JSON message for a specific destination; the publisher thread sends it"""
+        if not self.run_control and message_body.get('msg_type') != 'stf_gen':
+            return  # Run state broadcasts come from the run-control shard only
+        stamp_origin(message_body, self.agent_name)
+        body = json.dumps(message_body)
+        self.event_index.add(message_body, len(body))
+        if self.publisher.send(destination, body):
+            self.logger.debug(f"Queued {message_body.get('msg_type')} message for '{destination}'")
+    
+    def close(self):
+        """Flush queued messages, disconnect from ActiveMQ and stop background threads"""
+        self.heartbeat.stop()
+        self.event_index.save()
+        if self.journal:
+            self.journal.close()
+            self.logger.info("Event journal closed", extra=dict(self.journal.stats))
+        metrics = self.publisher.metrics()
+        self.publisher.close()
+        self.logger.info("Publisher closed", extra=metrics)
+    
+    def send_heartbeat(self, workflow_metadata=None):
         """Register/update this agent in the monitor system."""
+        if not self.run_control:
+            return  # Producer shards run under the run-control shard's registration
         try:
             # Determine status based on ActiveMQ connection
-            mq_connected = hasattr(self, 'conn') and self.conn and self.conn.is_connected()
+            publisher = getattr(self, 'publisher', None)
+            mq_connected = bool(publisher and publisher.connected)
             status = "OK" if mq_connected else "WARNING"
             
             payload = {
@@ -191,15 +346,17 @@ class DAQSimulator:
                 "description": f"DAQ Simulator - SimPy-based ePIC DAQ state machine. MQ: {'connected' if mq_connected else 'disconnected'}",
                 "workflow_enabled": True  # Enable this agent for workflow tracking
             }
+            if publisher:
+                workflow_metadata = dict(workflow_metadata or {}, publisher=publisher.metrics())
+            if workflow_metadata:
+                payload["workflow_metadata"] = workflow_metadata
             
-            print(f"[HEARTBEAT] Sending heartbeat for {self.agent_name} to {self.monitor_url}/api/systemagents/heartbeat/")
+            print(f"[HEARTBEAT] Sending heartbeat for {self.agent_name} to {self.monitor.url('/api/systemagents/heartbeat/')}")
             print(f"[HEARTBEAT] Payload: {payload}")
             
-            url = f"{self.monitor_url}/api/systemagents/heartbeat/"
-            response = self.api_session.post(url, json=payload, timeout=10)
-            response.raise_for_status()
+            self.monitor.call_api('POST', '/systemagents/heartbeat/', payload)
             
-            print(f"[HEARTBEAT] SUCCESS: Status {response.status_code}")
+            print("[HEARTBEAT] SUCCESS")
             self.logger.info(f"Heartbeat sent successfully. Status: {status}")
             
         except Exception as e:
@@ -208,74 +365,98 @@ class DAQSimulator:
             import traceback
             print(f"[HEARTBEAT] Traceback: {traceback.format_exc()}")
         
-    def run_daq_cycle(self):
-        """Complete DAQ cycle following state transitions"""
+    def run_daq_cycle(self, run_spec=None):
+        """Complete DAQ cycle following state transitions (durations from the run spec)"""
+        spec = run_spec or default_run_spec()
+        states = spec['states']
+        periods = spec['physics_periods']
         self.logger.info("Starting DAQ cycle", extra={"simulation_tick": self.env.now})
         
-        # Send heartbeat at start of cycle
-        self.send_heartbeat()
+        # Send heartbeat at start of cycle (state change: immediate)
+        self.heartbeat.send_now(current_run_id=self.current_run_id, total_files=self.file_counter)
         
-        # State 1: no_beam / not_ready (5 seconds - fast test)
+        # State 1: no_beam / not_ready
         self.logger.info("DAQ State -> no_beam/not_ready (Collider not operating)", 
                         extra={"simulation_tick": self.env.now, "state": "no_beam", "substate": "not_ready"})
-        yield self.env.timeout(5)  # 5 seconds
+        yield self.env.timeout(states['no_beam_not_ready'])
         
-        # State 2: beam / not_ready (5 seconds - fast test) + broadcast run imminent
+        # State 2: beam / not_ready + broadcast run imminent
         self.logger.info("DAQ State -> beam/not_ready (Run start imminent)", 
                         extra={"simulation_tick": self.env.now, "state": "beam", "substate": "not_ready"})
-        self.current_run_id = self.get_next_run_number()
+        # Kept local so that overlapping runs do not share a run number
+        run_id = self.get_next_run_number()
+        self.current_run_id = run_id
+        self.run_file_counts[run_id] = 0
         
         # Broadcast run imminent message
-        yield self.env.process(self.broadcast_run_imminent())
-        yield self.env.timeout(5)  # 5 seconds
+        yield self.env.process(self.broadcast_run_imminent(run_id))
+        yield self.env.timeout(states['beam_not_ready'])
         
-        # State 3: beam / ready (2 seconds - fast test)
+        # State 3: beam / ready
         self.logger.info("DAQ State -> beam/ready (Ready for physics)", 
                         extra={"simulation_tick": self.env.now, "state": "beam", "substate": "ready"})
-        yield self.env.timeout(2)  # 2 seconds
-        
-        # State 4: run / physics (10 seconds = 5 STFs) + run start + STF generation
-        self.logger.info("DAQ State -> run/physics (Physics datataking period 1)", 
-                        extra={"simulation_tick": self.env.now, "state": "run", "substate": "physics", "physics_period": 1})
-        yield self.env.process(self.broadcast_run_start())
-        
-        # Start STF generation for physics period 1 (10 seconds = 5 STFs)
-        stf_process_1 = self.env.process(self.generate_stfs_during_physics(10))
-        yield stf_process_1
-        
-        # State 5: run / standby (2 seconds - fast test)
-        self.logger.info("DAQ State -> run/standby (Brief standby)", 
-                        extra={"simulation_tick": self.env.now, "state": "run", "substate": "standby"})
-        yield self.env.process(self.broadcast_pause_run())
-        yield self.env.timeout(2)  # 2 seconds
-        
-        # State 6: run / physics (10 seconds = 5 STFs) + STF generation
-        self.logger.info("DAQ State -> run/physics (Physics datataking period 2)", 
-                        extra={"simulation_tick": self.env.now, "state": "run", "substate": "physics"})
-        yield self.env.process(self.broadcast_resume_run())
-        
-        # Start STF generation for physics period 2 (10 seconds = 5 STFs)
-        stf_process_2 = self.env.process(self.generate_stfs_during_physics(10))
-        yield stf_process_2
-        
-        # State 7: beam / not_ready (5 seconds - fast test) + run end
+        yield self.env.timeout(states['beam_ready'])
+        
+        for index, period in enumerate(periods, 1):
+            # State 4: run / physics + run start (or resume) + STF generation
+            self.logger.info(f"DAQ State -> run/physics (Physics datataking period {index})", 
+                            extra={"simulation_tick": self.env.now, "state": "run", "substate": "physics", "physics_period": index})
+            if index == 1:
+                yield self.env.process(self.broadcast_run_start(run_id))
+            else:
+                yield self.env.process(self.broadcast_resume_run(run_id))
+            
+            yield self.env.process(self.run_physics_period(spec, period, run_id))
+            
+            if index < len(periods):
+                # State 5: run / standby between physics periods
+                self.logger.info("DAQ State -> run/standby (Brief standby)", 
+                                extra={"simulation_tick": self.env.now, "state": "run", "substate": "standby"})
+                yield self.env.process(self.broadcast_pause_run(run_id))
+                yield self.env.timeout(states['standby'])
+        
+        # State 7: beam / not_ready + run end
         self.logger.info("DAQ State -> beam/not_ready (Run ended by shifters)", 
                         extra={"simulation_tick": self.env.now, "state": "beam", "substate": "not_ready"})
-        yield self.env.process(self.broadcast_run_end())
-        yield self.env.timeout(5)  # 5 seconds
+        yield self.env.process(self.broadcast_run_end(run_id))
+        self.heartbeat.send_now(current_run_id=run_id, total_files=self.file_counter)
+        yield self.env.timeout(states['run_end'])
         
         # State 8: no_beam / not_ready (final)
         self.logger.info("DAQ State -> no_beam/not_ready (Collider shutdown)", 
                         extra={"simulation_tick": self.env.now, "state": "no_beam", "substate": "not_ready"})
         
-        self.logger.info("DAQ cycle complete", extra={"simulation_tick": self.env.now, "total_files": self.file_counter})
+        self.logger.info("DAQ cycle complete", extra={"simulation_tick": self.env.now, "run_id": run_id,
+                                                       "run_files": self.run_file_counts.get(run_id, 0),
+                                                       "total_files": self.file_counter})
+    
+    def run_schedule(self, runs):
+        """Run a list of run specs back to back, or overlapping where a run sets start_after"""
+        cycles = []
+        for index, spec in enumerate(runs):
+            self.logger.info("Starting scheduled run", extra={"simulation_tick": self.env.now,
+                                                              "run_index": index + 1, "total_runs": len(runs)})
+            cycle = self.env.process(self.run_daq_cycle(spec))
+            cycles.append(cycle)
+            if index == len(runs) - 1:
+                break
+            next_spec = runs[index + 1]
+            if next_spec.get('start_after') is not None:
+                # Overlapping: next run starts relative to this run's start
+                yield self.env.timeout(next_spec['start_after'])
+            else:
+                # Back to back: wait for this run to finish, then the inter-run gap
+                yield cycle
+                yield self.env.timeout(spec['gap_after'])
+        yield self.env.all_of(cycles)
     
-    def broadcast_run_imminent(self):
+    def broadcast_run_imminent(self, run_id=None):
         """Broadcast run imminent message - triggers dataset creation"""
+        run_id = run_id or self.current_run_id
         message = {
             "msg_type": "run_imminent",
-            "run_id": self.current_run_id,
-            "timestamp": datetime.now().isoformat(),
+            "run_id": run_id,
+            "timestamp": self.sim_datetime().isoformat(),
             "simulation_tick": self.env.now,
             "run_conditions": {
                 "beam_energy": "5 GeV",
@@ -285,156 +466,234 @@ class DAQSimulator:
             }
         }
         
-        event_file = Path("daq_events") / f"run_{self.current_run_id}_imminent.json"
-        with open(event_file, "w") as f:
-            json.dump(message, f, indent=2)
+        self.record_event(f"run_{run_id}_imminent", message)
         
         # Send to ActiveMQ
         self.send_message(self.destination, message)
             
         self.logger.info("Broadcasted run_imminent message", 
-                         extra={"simulation_tick": self.env.now, "run_id": self.current_run_id, "msg_type": "run_imminent"})
+                         extra={"simulation_tick": self.env.now, "run_id": run_id, "msg_type": "run_imminent"})
         yield self.env.timeout(1)  # Brief broadcast time
     
-    def broadcast_run_start(self):
+    def broadcast_run_start(self, run_id=None):
         """Broadcast run start message - triggers PanDA task creation"""
+        run_id = run_id or self.current_run_id
         message = {
             "msg_type": "start_run",
-            "run_id": self.current_run_id,
-            "timestamp": datetime.now().isoformat(),
+            "run_id": run_id,
+            "timestamp": self.sim_datetime().isoformat(),
             "simulation_tick": self.env.now,
             "state": "run",
             "substate": "physics"
         }
         
-        event_file = Path("daq_events") / f"run_{self.current_run_id}_start.json"
-        with open(event_file, "w") as f:
-            json.dump(message, f, indent=2)
+        self.record_event(f"run_{run_id}_start", message)
         
         # Send to ActiveMQ
         self.send_message(self.destination, message)
             
         self.logger.info("Broadcasted run_start message", 
-                         extra={"simulation_tick": self.env.now, "run_id": self.current_run_id, "msg_type": "start_run"})
+                         extra={"simulation_tick": self.env.now, "run_id": run_id, "msg_type": "start_run"})
         yield self.env.timeout(1)
     
-    def broadcast_pause_run(self):
+    def broadcast_pause_run(self, run_id=None):
         """Broadcast run pause message - entering standby"""
+        run_id = run_id or self.current_run_id
         message = {
             "msg_type": "pause_run",
-            "run_id": self.current_run_id,
-            "timestamp": datetime.now().isoformat(),
+            "run_id": run_id,
+            "timestamp": self.sim_datetime().isoformat(),
             "simulation_tick": self.env.now,
             "state": "run",
             "substate": "standby",
             "reason": "Brief standby period"
         }
         
-        event_file = Path("daq_events") / f"run_{self.current_run_id}_pause.json"
-        with open(event_file, "w") as f:
-            json.dump(message, f, indent=2)
+        self.record_event(f"run_{run_id}_pause", message)
         
         # Send to ActiveMQ
         self.send_message(self.destination, message)
             
         self.logger.info("Broadcasted pause_run message", 
-                         extra={"simulation_tick": self.env.now, "run_id": self.current_run_id, "msg_type": "pause_run"})
+                         extra={"simulation_tick": self.env.now, "run_id": run_id, "msg_type": "pause_run"})
         yield self.env.timeout(1)
     
-    def broadcast_resume_run(self):
+    def broadcast_resume_run(self, run_id=None):
         """Broadcast run resume message - returning to physics"""
+        run_id = run_id or self.current_run_id
         message = {
             "msg_type": "resume_run",
-            "run_id": self.current_run_id,
-            "timestamp": datetime.now().isoformat(),
+            "run_id": run_id,
+            "timestamp": self.sim_datetime().isoformat(),
             "simulation_tick": self.env.now,
             "state": "run",
             "substate": "physics",
         }
         
-        event_file = Path("daq_events") / f"run_{self.current_run_id}_resume.json"
-        with open(event_file, "w") as f:
-            json.dump(message, f, indent=2)
+        self.record_event(f"run_{run_id}_resume", message)
         
         # Send to ActiveMQ
         self.send_message(self.destination, message)
             
         self.logger.info("Broadcasted resume_run message", 
-                         extra={"simulation_tick": self.env.now, "run_id": self.current_run_id, "msg_type": "resume_run"})
+                         extra={"simulation_tick": self.env.now, "run_id": run_id, "msg_type": "resume_run"})
         yield self.env.timeout(1)
     
-    def broadcast_run_end(self):
+    def broadcast_run_end(self, run_id=None):
         """Broadcast run end message"""
+        run_id = run_id or self.current_run_id
         message = {
             "msg_type": "end_run",
-            "run_id": self.current_run_id,
-            "timestamp": datetime.now().isoformat(),
+            "run_id": run_id,
+            "timestamp": self.sim_datetime().isoformat(),
             "simulation_tick": self.env.now,
-            "total_files": self.file_counter
+            "total_files": self.run_file_counts.get(run_id, 0)
         }
+        stream_counts = self.stream_file_counts.pop(run_id, None)
+        if stream_counts:
+            # Per-stream totals let consumers check fan-in completeness stream by stream
+            message["stream_files"] = stream_counts
         
-        event_file = Path("daq_events") / f"run_{self.current_run_id}_end.json"
-        with open(event_file, "w") as f:
-            json.dump(message, f, indent=2)
+        self.record_event(f"run_{run_id}_end", message)
+        if self.journal:
+            self.journal.close_run(run_id)
         
         # Send to ActiveMQ
         self.send_message(self.destination, message)
+        self.event_index.save()
             
         self.logger.info("Broadcasted run_end message", 
-                         extra={"simulation_tick": self.env.now, "run_id": self.current_run_id, "msg_type": "end_run", "total_files": self.file_counter})
+                         extra={"simulation_tick": self.env.now, "run_id": run_id, "msg_type": "end_run", "total_files": self.run_file_counts.get(run_id, 0)})
         yield self.env.timeout(1)
     
-    def generate_stfs_during_physics(self, duration_seconds):
-        """Generate STFs programmatically during physics period"""
+    def run_physics_period(self, spec, period, run_id):
+        """STF generation for one physics period: a single producer, or one SimPy process per stream"""
+        streams = spec.get('streams')
+        if not streams:
+            # A single producer belongs to the run-control shard
+            yield self.env.process(self.generate_stfs_during_physics(
+                period['duration'], run_id=run_id, stf_interval=1.0 / period['stf_rate'], emit=self.run_control))
+            return
+        producers = [
+            self.env.process(self.generate_stfs_during_physics(
+                period['duration'], run_id=run_id, stf_interval=1.0 / (stream['stf_rate'] or period['stf_rate']),
+                stream=stream, emit=index % self.shard_count == self.shard_index))
+            for index, stream in enumerate(streams)
+        ]
+        yield self.env.all_of(producers)
+    
+    def generate_stfs_during_physics(self, duration_seconds, run_id=None, stf_interval=None, stream=None, emit=True):
+        """Generate STFs programmatically during physics period (for one stream, if given)"""
+        run_id = run_id or self.current_run_id
+        stf_interval = stf_interval or self.stf_interval
         self.logger.info("Starting STF generation", 
-                        extra={"simulation_tick": self.env.now, "duration_minutes": duration_seconds/60})
+                        extra={"simulation_tick": self.env.now, "duration_minutes": duration_seconds/60,
+                               "run_id": run_id, "stf_rate_hz": 1.0 / stf_interval,
+                               "stream_id": stream['id'] if stream else None, "emit": emit})
         
         start_time = self.env.now
-        heartbeat_counter = 0
-        
-        while (self.env.now - start_time) < duration_seconds:
-            # Generate STF
-            yield self.env.process(self.generate_single_stf())
+        end_time = start_time + duration_seconds
+        stf_index = 0
+        
+        # STF n is due at start + n * interval on the simulation clock, so the configured rate
+        # is the achieved rate; generation time is part of the interval, not added to it
+        while start_time + stf_index * stf_interval < end_time:
+            due = start_time + stf_index * stf_interval
+            if due > self.env.now:
+                yield self.env.timeout(due - self.env.now)
             
-            # Send heartbeat every 10 STFs
-            heartbeat_counter += 1
-            if heartbeat_counter % 10 == 0:
-                self.send_heartbeat()
+            # Generate STF (streams owned by another shard are only counted here)
+            self.generate_single_stf(run_id, stream, emit)
+            stf_index += 1
             
-            # Wait for next STF interval
-            yield self.env.timeout(self.stf_interval)
+            # Counters go out with the next scheduled heartbeat
+            self.heartbeat.update(current_run_id=run_id, total_files=self.file_counter)
+        
+        # The physics period lasts its full duration
+        if end_time > self.env.now:
+            yield self.env.timeout(end_time - self.env.now)
         
         self.logger.info("STF generation complete", 
-                        extra={"simulation_tick": self.env.now})
+                        extra={"simulation_tick": self.env.now, "stf_count": stf_index})
     
-    def generate_single_stf(self):
+    def generate_single_stf(self, run_id=None, stream=None, emit=True):
         """Generate single STF file and broadcast stf_gen message"""
+        if emit:
+            return self.emit_stf(run_id, stream)
+        self.count_stf(run_id or self.current_run_id, stream)
+        return None
+    
+    def count_stf(self, run_id, stream=None):
+        """Count an STF towards the run totals; returns its sequence number within the stream"""
+        self.run_file_counts[run_id] = self.run_file_counts.get(run_id, 0) + 1
+        if stream is None:
+            return None
+        counts = self.stream_file_counts.setdefault(run_id, {})
+        counts[stream['id']] = counts.get(stream['id'], 0) + 1
+        return counts[stream['id']]
+    
+    def stream_payload(self, stream):
+        """Payload generator for a stream: its own size profile if it has one, else the simulator's"""
+        if not stream or not stream.get('payload'):
+            return self.payload
+        generator = self._stream_payloads.get(stream['id'])
+        if generator is None:
+            profile = stream['payload']
+            generator = self._stream_payloads[stream['id']] = PayloadGenerator(
+                profile.get('dist', 'fixed'), mean_bytes=profile['size'], sigma=profile.get('sigma', 0.1),
+                mode=self.payload.mode if self.payload else 'write',
+                checksum=self.payload.checksum if self.payload else 'sha256', seed=profile.get('seed'))
+        return generator
+    
+    def emit_stf(self, run_id=None, stream=None):
+        """Create one STF (payload file unless disabled), broadcast stf_gen and return the message"""
+        run_id = run_id or self.current_run_id
         self.file_counter += 1
-        filename = f"{self.current_run_id}_{self.file_counter:06d}.dat"
-        
-        # Create STF data file
-        run_dir = Path("daq_data") / f"run_{self.current_run_id}"
-        run_dir.mkdir(exist_ok=True)
+        seq = self.count_stf(run_id, stream)
+        if stream is None:
+            stf_name = f"{run_id}_{self.file_counter:06d}"
+        else:
+            # Per-stream sequence numbers: concurrent streams never collide on a filename
+            stf_name = f"{run_id}_{stream['id']}_{seq:06d}"
+        filename = f"{stf_name}.dat"
+        payload = self.stream_payload(stream)
         
+        run_dir = Path("daq_data") / f"run_{run_id}"
         stf_file = run_dir / filename
-        with open(stf_file, "w") as f:
-            f.write(f"STF data: run {self.current_run_id}, file {self.file_counter}\n")
-            f.write(f"Generated at simulation time: {self.env.now:.1f}\n")
-            f.write(f"Real time: {datetime.now().isoformat()}\n")
-            f.write("Mock ePIC detector data payload...\n")
-        
-        # Calculate start/end times (STF covers ~0.5 second period)
-        start_time = datetime.now()
-        end_time = datetime.fromtimestamp(start_time.timestamp() + 0.5)
+        size_bytes = 0
+        checksum = None
+        if self.persist_payload:
+            # Create STF data file
+            if run_dir not in self._run_dirs:
+                run_dir.mkdir(exist_ok=True)
+                self._run_dirs.add(run_dir)
+            
+            if payload:
+                # Realistic volume; checksum computed while writing
+                size_bytes, checksum = payload.write(stf_file)
+            else:
+                with open(stf_file, "w") as f:
+                    f.write(f"STF data: run {run_id}, file {self.file_counter}\n")
+                    f.write(f"Generated at simulation time: {self.env.now:.1f}\n")
+                    f.write(f"Real time: {datetime.now().isoformat()}\n")
+                    f.write("Mock ePIC detector data payload...\n")
+                size_bytes = stf_file.stat().st_size
+        elif payload:
+            # Headless: report a size from the distribution without writing anything
+            size_bytes = payload.sample_size()
+        
+        # Calculate start/end times on the simulation clock (STF covers ~0.5 second period)
+        start_time = self.sim_datetime()
+        end_time = start_time + timedelta(seconds=0.5)
         
         # Broadcast STF generation
         message = {
             "msg_type": "stf_gen",
             "filename": filename,
-            "run_id": self.current_run_id,
+            "run_id": run_id,
             "file_url": f"file://{stf_file.absolute()}",
-            "size_bytes": stf_file.stat().st_size,
-            "checksum": f"sha256:mock_checksum_{self.file_counter:06d}",
+            "size_bytes": size_bytes,
+            "checksum": checksum or f"sha256:mock_checksum_{self.file_counter:06d}",
             "start": start_time.strftime('%Y%m%d%H%M%S'),
             "end": end_time.strftime('%Y%m%d%H%M%S'),
             "simulation_tick": self.env.now,
@@ -442,76 +701,202 @@ class DAQSimulator:
             "substate": "physics",
             "comment": f"STF file {self.file_counter} generated during physics datataking"
         }
+        if stream is not None:
+            message["stream_id"] = stream['id']
         
-        event_file = Path("daq_events") / f"stf_{self.current_run_id}_{self.file_counter:06d}_gen.json"
-        with open(event_file, "w") as f:
-            json.dump(message, f, indent=2)
+        self.record_event(f"stf_{stf_name}_gen", message)
         
         # Send to ActiveMQ
         self.send_message(self.destination, message)
         
         self.logger.info("Generated STF and broadcasted stf_gen message", 
-                         extra={"simulation_tick": self.env.now, "run_id": self.current_run_id, "stf_filename": filename, "msg_type": "stf_gen"})
-        yield self.env.timeout(0.1)  # Brief generation time
+                         extra={"simulation_tick": self.env.now, "run_id": run_id, "stf_filename": filename, "msg_type": "stf_gen"})
+        return message
+    
+    def record_event(self, event_name, message):
+        """Append a broadcast message to its run's journal under daq_events/ (skipped in headless mode)"""
+        if not self.journal or (not self.run_control and message.get('msg_type') != 'stf_gen'):
+            return
+        self.journal.append(message['run_id'], event_name, message)
+
 
+def run_producer_shard(shard_index, shard_count, schedule, run_numbers, duration_hours=None,
+                       clock_mode='fast', time_scale=10.0, **simulator_options):
+    """
+    Run the STF streams of one producer shard in its own process (see run_simulation's shards).
+    The shard follows the same schedule and run numbers as the run-control shard, journals
+    under daq_events/shard<N>/ and returns its message counts.
+    """
+    env = create_environment(clock_mode, time_scale)
+    daq_sim = DAQSimulator(env, shard=(shard_index, shard_count), run_numbers=run_numbers, run_number_state=None,
+                           events_dir=str(Path("daq_events") / f"shard{shard_index}"), **simulator_options)
+    schedule_process = env.process(daq_sim.run_schedule(schedule))
+    env.run(until=schedule_process if duration_hours is None else duration_hours * 3600)
+    daq_sim.close()
+    drain_logger(daq_sim.logger)
+    return {'shard': shard_index, 'total_files': daq_sim.file_counter,
+            'event_types': daq_sim.event_index.totals(daq_sim.event_index.session_runs)}
 
-def run_simulation(duration_hours=1.0, num_cycles=1):
-    """Run DAQ simulation for specified duration and cycles"""
+
+def run_simulation(duration_hours=1.0, num_cycles=1, persist_payload=True, persist_events=True, log_mode='rest',
+                   clock_mode='fast', time_scale=10.0, schedule=None, shards=1, **simulator_options):
+    """
+    Run DAQ simulation for specified duration and cycles, or for a run schedule.
+    With duration_hours=None the simulation runs until the schedule completes.
+    With shards > 1 the STF streams of multi-stream runs are split across that many OS
+    processes; this process keeps run control and emits shard 0's streams. Streams are
+    only synchronised with the run state through the clock, so use the realtime or scaled
+    clock when the order of stf_gen and end_run matters.
+    Extra keyword arguments are passed on to DAQSimulator.
+    """
+    if schedule is None:
+        schedule = cycle_schedule(num_cycles)
+    if shards > 1 and simulator_options.get('connection') is not None:
+        raise ValueError("Producer shards publish through their own ActiveMQ connections; "
+                         "an injected connection cannot be shared across processes")
     # Set up main simulation logger
-    main_logger = setup_rest_logging('daqsim-agent', 'simulation-main')
+    main_logger = setup_simulator_logging('daqsim-agent', 'simulation-main', log_mode)
     
     main_logger.info("ePIC DAQ Simulation Starting", 
-                    extra={"duration_hours": duration_hours, "num_cycles": num_cycles})
+                    extra={"duration_hours": duration_hours, "num_cycles": len(schedule),
+                           "clock_mode": clock_mode, "time_scale": time_scale})
     
     # Create SimPy environment
-    env = simpy.Environment()
+    env = create_environment(clock_mode, time_scale)
+    wall_started = time.perf_counter()
     
     # Create DAQ simulator
-    daq_sim = DAQSimulator(env)
-    
-    # Start DAQ cycles
-    for cycle in range(num_cycles):
-        main_logger.info("Starting DAQ cycle", extra={"cycle": cycle + 1, "total_cycles": num_cycles})
-        env.process(daq_sim.run_daq_cycle())
-        
-        # Brief pause between cycles
-        if cycle < num_cycles - 1:
-            env.process(lambda: env.timeout(60))  # 1 minute between cycles
+    shard_options = {'shard': (0, shards)} if shards > 1 else {}
+    daq_sim = DAQSimulator(env, persist_payload=persist_payload, persist_events=persist_events, log_mode=log_mode,
+                           **shard_options, **simulator_options)
+    
+    shard_pool = None
+    shard_results = []
+    if shards > 1:
+        # Every shard must use the same run numbers: reserve them all up front
+        run_numbers = daq_sim.assign_run_numbers(len(schedule))
+        shard_pool = ProcessPoolExecutor(max_workers=shards - 1, mp_context=multiprocessing.get_context('spawn'))
+        shard_results = [
+            shard_pool.submit(run_producer_shard, index, shards, schedule, run_numbers, duration_hours,
+                              clock_mode=clock_mode, time_scale=time_scale, persist_payload=persist_payload,
+                              persist_events=persist_events, log_mode=log_mode, **simulator_options)
+            for index in range(1, shards)
+        ]
+        main_logger.info("Started producer shards", extra={"shards": shards, "run_numbers": run_numbers})
+    
+    # Start DAQ runs one after another (or overlapping, as the schedule says)
+    main_logger.info("Starting DAQ schedule", extra={"total_runs": len(schedule)})
+    schedule_process = env.process(daq_sim.run_schedule(schedule))
     
     # Run simulation
-    simulation_duration = duration_hours * 3600  # Convert to seconds
-    env.run(until=simulation_duration)
+    if duration_hours is None:
+        env.run(until=schedule_process)
+    else:
+        simulation_duration = duration_hours * 3600  # Convert to seconds
+        env.run(until=simulation_duration)
     
+    wall_seconds = time.perf_counter() - wall_started
     main_logger.info("ePIC DAQ Simulation Complete", 
                     extra={"simulation_tick_seconds": env.now, "simulation_tick_hours": env.now/3600, 
-                          "total_files": daq_sim.file_counter})
+                          "total_files": daq_sim.file_counter, "wall_clock_seconds": wall_seconds,
+                          "effective_time_scale": env.now / wall_seconds if wall_seconds > 0 else None})
     
-    # Disconnect from ActiveMQ
+    # Send queued messages and disconnect from ActiveMQ
     try:
-        if daq_sim.conn and daq_sim.conn.is_connected():
-            daq_sim.conn.disconnect()
-            main_logger.info("Disconnected from ActiveMQ")
+        daq_sim.close()
+        main_logger.info("Disconnected from ActiveMQ")
     except Exception as e:
         main_logger.error(f"Error disconnecting from ActiveMQ: {e}")
     
-    # Report generated events
-    events = list(Path("daq_events").glob("*.json"))
-    main_logger.info("Simulation results", extra={"total_events": len(events)})
+    # Report generated events from the running counters (runs of this simulation only;
+    # query daq_events/index.json with event_index.py for earlier runs)
+    event_types = daq_sim.event_index.totals(daq_sim.event_index.session_runs)
+    if shard_pool:
+        for future in shard_results:
+            try:
+                result = future.result()
+            except Exception as e:
+                main_logger.error(f"Producer shard failed: {e}")
+                continue
+            main_logger.info("Producer shard complete", extra=result)
+            for msg_type, counters in result['event_types'].items():
+                total = event_types.setdefault(msg_type, {'count': 0, 'bytes': 0})
+                total['count'] += counters['count']
+                total['bytes'] += counters['bytes']
+        shard_pool.shutdown()
+    main_logger.info("Simulation results", extra={"total_events": sum(t['count'] for t in event_types.values()),
+                                                  "runs": sorted(daq_sim.event_index.session_runs)})
+    
+    for msg_type, counters in event_types.items():
+        main_logger.info("Event type summary", extra={"msg_type": msg_type, "count": counters['count'],
+                                                      "bytes": counters['bytes']})
+    
+    drain_logger(daq_sim.logger)
+    drain_logger(main_logger)
+
+
+def run_load_generation(target_rate, duration_seconds=60.0, run_id=None,
+                        persist_payload=False, persist_events=False, log_mode='local',
+                        clock_mode='realtime', time_scale=10.0, **simulator_options):
+    """
+    Emit stf_gen messages at a target rate (Hz of simulated time) for agent load tests.
+    
+    With the default realtime clock the rate is paced in wall-clock time; the fast clock
+    emits open-loop as fast as possible. The run is bracketed by the usual
+    run_imminent/start_run and end_run broadcasts so the agents see a complete run.
+    Returns the achieved rate in STFs per wall-clock second. Extra keyword arguments
+    are passed on to DAQSimulator.
+    """
+    main_logger = setup_simulator_logging('daqsim-agent', 'simulation-main', log_mode)
+    
+    env = create_environment(clock_mode, time_scale)
+    daq_sim = DAQSimulator(env, persist_payload=persist_payload, persist_events=persist_events,
+                           log_mode=log_mode, **simulator_options)
+    daq_sim.current_run_id = str(run_id) if run_id else daq_sim.get_next_run_number()
+    
+    interval = 1.0 / target_rate
+    result = {'sent': 0, 'elapsed': 0.0}
+    
+    def load_run():
+        yield env.process(daq_sim.broadcast_run_imminent())
+        yield env.process(daq_sim.broadcast_run_start())
+        
+        started = time.perf_counter()
+        start_tick = env.now
+        while env.now - start_tick < duration_seconds:
+            daq_sim.emit_stf()
+            result['sent'] += 1
+            if result['sent'] % 1000 == 0:
+                daq_sim.heartbeat.update(current_run_id=daq_sim.current_run_id, total_files=daq_sim.file_counter)
+            yield env.timeout(interval)
+        result['elapsed'] = time.perf_counter() - started
+        
+        yield env.process(daq_sim.broadcast_run_end())
+    
+    env.run(until=env.process(load_run()))
+    sent, elapsed = result['sent'], result['elapsed']
+    achieved_rate = sent / elapsed if elapsed > 0 else 0.0
+    
+    daq_sim.heartbeat.send_now(current_run_id=daq_sim.current_run_id, total_files=daq_sim.file_counter)
+    publisher_metrics = daq_sim.publisher.metrics()
     
-    # Group events by type
-    event_types = {}
-    for event_file in events:
-        try:
-            with open(event_file) as f:
-                data = json.load(f)
-                msg_type = data.get("msg_type", "unknown")
-                event_types[msg_type] = event_types.get(msg_type, 0) + 1
-        except (json.JSONDecodeError, OSError, KeyError) as e:
-            main_logger.error(f"Failed to process event file {event_file}: {e}")
-            # Don't crash here since this is just summary reporting
-    
-    for msg_type, count in event_types.items():
-        main_logger.info("Event type summary", extra={"msg_type": msg_type, "count": count})
+    try:
+        daq_sim.close()
+    except Exception as e:
+        main_logger.error(f"Error disconnecting from ActiveMQ: {e}")
+    
+    main_logger.warning("Load generation complete",
+                        extra={"run_id": daq_sim.current_run_id, "stf_count": sent, "elapsed_seconds": elapsed,
+                               "target_rate_hz": target_rate, "achieved_rate_hz": achieved_rate,
+                               "clock_mode": clock_mode, "publisher": publisher_metrics})
+    drain_logger(daq_sim.logger)
+    drain_logger(main_logger)
+    print(f"Load generation: {sent} STFs in {elapsed:.1f}s wall clock - target {target_rate:.1f} Hz, "
+          f"achieved {achieved_rate:.1f} Hz")
+    print(f"Publisher: queue depth {publisher_metrics['queue_depth']}, avg send latency "
+          f"{publisher_metrics['latency_avg_ms']} ms (max {publisher_metrics['latency_max_ms']} ms), "
+          f"{publisher_metrics['reconnects']} reconnects, {publisher_metrics['dropped']} dropped")
+    return achieved_rate
 
 
 if __name__ == "__main__":
@@ -522,14 +907,66 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Run ePIC DAQ simulation")
-    parser.add_argument("--duration", type=float, default=1.0,
-                       help="Simulation duration in hours (default: 1.0)")
+    parser.add_argument("--duration", type=float, default=None,
+                       help="Simulation duration in hours (default: 1.0, or until the --schedule completes)")
     parser.add_argument("--cycles", type=int, default=1,
                        help="Number of DAQ cycles to run (default: 1)")
+    parser.add_argument("--schedule", default=None,
+                       help="Run schedule file (JSON or YAML) with state durations, STF rates, run counts and gaps")
+    parser.add_argument("--payload-dist", choices=('text',) + DISTRIBUTIONS, default='text',
+                       help="STF payload size distribution; 'text' writes the small text stub (default: text)")
+    parser.add_argument("--payload-size", type=parse_size, default=parse_size('1.5G'),
+                       help="Mean (fixed/normal) or median (lognormal) STF size, e.g. 1.5G (default: 1.5G)")
+    parser.add_argument("--payload-sigma", type=float, default=0.1,
+                       help="Spread: relative std. deviation (normal) or shape (lognormal) (default: 0.1)")
+    parser.add_argument("--payload-mode", choices=WRITE_MODES, default='write',
+                       help="write (chunked data), sparse (truncate) or fallocate (preallocated) (default: write)")
+    parser.add_argument("--checksum", choices=CHECKSUMS, default='sha256',
+                       help="Checksum computed while writing STF payloads (default: sha256)")
+    parser.add_argument("--payload-seed", type=int, default=None,
+                       help="Random seed for reproducible STF sizes")
+    parser.add_argument("--run-number-block", type=int, default=10,
+                       help="Run numbers reserved from the monitor per request (default: 10)")
+    parser.add_argument("--run-number-state", default="daq_state/run_numbers.json",
+                       help="File caching reserved run numbers across restarts (default: daq_state/run_numbers.json)")
     parser.add_argument("--clean", action="store_true",
                        help="Clean up previous simulation files")
+    parser.add_argument("--clock", choices=CLOCK_MODES, default=None,
+                       help="Simulation clock: fast (as fast as possible, default for DAQ cycles), "
+                            "realtime (default for load generation) or scaled (see --time-scale)")
+    parser.add_argument("--time-scale", type=float, default=10.0,
+                       help="Simulated seconds per wall-clock second for --clock scaled (default: 10)")
+    parser.add_argument("--load-rate", type=float, default=None,
+                       help="Load-generation mode: emit stf_gen messages at this rate in Hz instead of running DAQ cycles")
+    parser.add_argument("--load-duration", type=float, default=60.0,
+                       help="Load-generation duration in seconds (default: 60)")
+    parser.add_argument("--run-id", default=None,
+                       help="Run number for load generation (default: next number from the monitor)")
+    parser.add_argument("--headless", action="store_true",
+                       help="Skip STF payload and event files and REST logging")
+    parser.add_argument("--no-payload", action="store_true",
+                       help="Do not write STF payload files under daq_data/")
+    parser.add_argument("--no-events", action="store_true",
+                       help="Do not write the event journal under daq_events/")
+    parser.add_argument("--event-codec", choices=sorted(CODECS), default='json',
+                       help="Event journal record encoding; msgpack needs the msgpack package (default: json)")
+    parser.add_argument("--streams", type=int, default=None,
+                       help="Run N parallel STF producer streams per physics period (overrides the schedule's streams)")
+    parser.add_argument("--shards", type=int, default=1,
+                       help="Split the STF streams across this many OS processes (default: 1)")
+    parser.add_argument("--log-mode", choices=LOG_MODES, default=None,
+                       help="Logging: rest (per record), buffered (batched REST) or local (console only)")
     
     args = parser.parse_args()
+    persist_payload = not (args.headless or args.no_payload)
+    persist_events = not (args.headless or args.no_events)
+    log_mode = args.log_mode or ('local' if args.headless else 'rest')
+    simulator_options = {'run_number_block': args.run_number_block, 'run_number_state': args.run_number_state,
+                         'event_codec': args.event_codec}
+    if args.payload_dist != 'text':
+        simulator_options['payload'] = PayloadGenerator(
+            args.payload_dist, mean_bytes=args.payload_size, sigma=args.payload_sigma,
+            mode=args.payload_mode, checksum=args.checksum, seed=args.payload_seed)
     
     if args.clean:
         print("Cleaning up previous simulation files...")
@@ -540,9 +977,38 @@ if __name__ == "__main__":
                 shutil.rmtree(dir_path)
                 print(f"  Removed {dir_name}/")
     
+    if args.load_rate:
+        print(f"Starting STF load generation: {args.load_rate} Hz for {args.load_duration}s")
+        run_load_generation(args.load_rate, args.load_duration, run_id=args.run_id,
+                            persist_payload=persist_payload, persist_events=persist_events,
+                            log_mode=log_mode, clock_mode=args.clock or 'realtime', time_scale=args.time_scale,
+                            **simulator_options)
+        sys.exit(0)
+    
+    schedule = None
+    duration = args.duration
+    if args.schedule:
+        schedule = load_schedule(args.schedule)
+        plan = f"{len(schedule)} scheduled runs from {args.schedule}"
+    else:
+        if duration is None:
+            duration = 1.0
+        plan = f"{args.cycles} cycles"
+    if args.streams:
+        schedule = schedule or cycle_schedule(args.cycles)
+        for spec in schedule:
+            spec['streams'] = uniform_streams(args.streams)
+        plan += f", {args.streams} streams"
+    if args.shards > 1:
+        plan += f" in {args.shards} processes"
+    
     # Print to console for user feedback
-    print(f"Starting ePIC DAQ simulation: {args.duration} hours, {args.cycles} cycles")
+    limit = f"{duration} hours" if duration is not None else "until schedule completes"
+    print(f"Starting ePIC DAQ simulation: {limit}, {plan}, {args.clock or 'fast'} clock")
     
-    run_simulation(args.duration, args.cycles)
+    run_simulation(duration, args.cycles, persist_payload=persist_payload,
+                   persist_events=persist_events, log_mode=log_mode,
+                   clock_mode=args.clock or 'fast', time_scale=args.time_scale, schedule=schedule,
+                   shards=args.shards, **simulator_options)
     
     print("ePIC DAQ simulation complete")
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Dedup Cache: Drops redelivered workflow messages before an agent acts on them.
+
+Only file-bearing messages (stf_gen, data_ready, ...) are deduplicated. Each one is
+identified by (msg_type, run_id, filename). After a broker redelivery or an agent restart
+the same key arrives again, and the agent would otherwise register the STF twice (400s
+from the monitor) or reconstruct it twice. Run lifecycle messages carry no such identity
+(a run may be paused and resumed several times) and always pass. Recently seen keys are kept
+in a bounded LRU table (state_store.StateTable). Keys can also go to an optional sqlite
+store (SWF_DEDUP_DB), so duplicates are still recognised after a restart. Writes to the
+store are committed in batches. A message whose handling fails is forgotten again, so
+its redelivery is processed.
+
+Configured from the environment:
+
+  SWF_DEDUP_MAX_ENTRIES   keys kept in memory (default 100000)
+  SWF_DEDUP_TTL           seconds a key stays in memory (default: no expiry)
+  SWF_DEDUP_DB            sqlite file for restart-safe deduplication (default: memory only)
+  SWF_DEDUP_DB_MAX_ROWS   keys kept in the sqlite file (default 1000000)
+  SWF_DEDUP=0             disable deduplication
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from state_store import StateRecord, StateTable
+
+
+class SeenRecord(StateRecord):
+    """Marker for a seen message key (the table tracks recency)."""
+
+    __slots__ = ()
+
+
+def message_key(message):
+    """
+    Dedup key of a message: msg_type, run_id and filename joined by a unit separator,
+    or None for messages without a filename (those are never deduplicated).
+    """
+    filename = message.get('filename')
+    if not filename:
+        return None
+    return f"{message.get('msg_type')}\x1f{message.get('run_id')}\x1f{filename}"
+
+
+class SqliteSeenStore:
+    """Seen keys on disk, oldest rows pruned beyond max_rows, commits batched."""
+
+    def __init__(self, path, max_rows=1000000, commit_every=100, commit_interval=1.0):
+        self.path = path
+        self.max_rows = max_rows
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level='DEFERRED')
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, seen_at REAL)')
+        self._conn.commit()
+        self._uncommitted = 0
+        self._inserted = 0
+        self._last_commit = time.monotonic()
+
+    def contains(self, key):
+        return self._conn.execute('SELECT 1 FROM seen WHERE key = ?', (key,)).fetchone() is not None
+
+    def add(self, key):
+        self._conn.execute('INSERT OR IGNORE INTO seen (key, seen_at) VALUES (?, ?)', (key, time.time()))
+        self._uncommitted += 1
+        self._inserted += 1
+        if self._inserted >= self.max_rows // 10:
+            self._prune()
+        if self._uncommitted >= self.commit_every or time.monotonic() - self._last_commit >= self.commit_interval:
+            self.commit()
+
+    def discard(self, key):
+        self._conn.execute('DELETE FROM seen WHERE key = ?', (key,))
+        self._uncommitted += 1
+
+    def commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+    def _prune(self):
+        # Checked every max_rows/10 inserts: drop the oldest rows beyond max_rows
+        self._inserted = 0
+        self._conn.execute('DELETE FROM seen WHERE rowid IN (SELECT rowid FROM seen ORDER BY rowid '
+                           'LIMIT max(0, (SELECT count(*) FROM seen) - ?))', (self.max_rows,))
+
+
+class DedupCache:
+    """Bounded seen-message cache with an optional sqlite store and hit/miss counters."""
+
+    def __init__(self, max_entries=100000, ttl=None, db_path=None, db_max_rows=1000000, enabled=True):
+        self.enabled = enabled
+        self._seen = StateTable(max_entries=max_entries, ttl=ttl)
+        self._store = SqliteSeenStore(db_path, max_rows=db_max_rows) if enabled and db_path else None
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'store_hits': 0, 'forgotten': 0}
+
+    @classmethod
+    def from_env(cls):
+        ttl = os.getenv('SWF_DEDUP_TTL')
+        return cls(max_entries=int(os.getenv('SWF_DEDUP_MAX_ENTRIES', '100000')),
+                   ttl=float(ttl) if ttl else None,
+                   db_path=os.getenv('SWF_DEDUP_DB') or None,
+                   db_max_rows=int(os.getenv('SWF_DEDUP_DB_MAX_ROWS', '1000000')),
+                   enabled=os.getenv('SWF_DEDUP', '1').lower() not in ('0', 'false', 'no', 'off'))
+
+    def check_and_add(self, message):
+        """True if the message is new (and is now remembered), False for a duplicate."""
+        key = message_key(message) if self.enabled else None
+        if key is None:
+            return True
+        with self._lock:
+            if key in self._seen:
+                self.stats['hits'] += 1
+                return False
+            if self._store is not None and self._store.contains(key):
+                # Seen before a restart (or evicted from memory): keep it in memory again
+                self._seen.put(key, SeenRecord())
+                self.stats['hits'] += 1
+                self.stats['store_hits'] += 1
+                return False
+            self._seen.put(key, SeenRecord())
+            if self._store is not None:
+                self._store.add(key)
+            self.stats['misses'] += 1
+            return True
+
+    def forget(self, message):
+        """Drop a message's key after its handling failed, so a redelivery is processed."""
+        key = message_key(message) if self.enabled else None
+        if key is None:
+            return
+        with self._lock:
+            self._seen.pop(key)
+            if self._store is not None:
+                self._store.discard(key)
+            self.stats['forgotten'] += 1
+
+    def metrics(self):
+        """Counters for the heartbeat."""
+        with self._lock:
+            return {'dedup_hits': self.stats['hits'], 'dedup_misses': self.stats['misses'],
+                    'dedup_store_hits': self.stats['store_hits'], 'dedup_entries': len(self._seen)}
+
+    def close(self):
+        with self._lock:
+            if self._store is not None:
+                self._store.close()
+                self._store = None
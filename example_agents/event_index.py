@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Event Index: Per-run, per-message-type counters for the DAQ simulator's broadcasts.
+
+The simulator counts every message it publishes as it goes: message count and bytes on
+the wire per run and msg_type, plus the announced STF payload bytes (size_bytes of
+stf_gen). The counters are saved to a small JSON index, daq_events/index.json, whenever
+a run ends and when the simulator closes. Runs from earlier simulations stay in the index,
+so summaries never have to re-read the event journal:
+
+    {"runs": {"100042": {"types": {"stf_gen": {"count": 40, "bytes": 21480}, ...},
+                         "stf_bytes": 60000000000, "first_tick": 12.0, "last_tick": 61.0}},
+     "updated": "2025-08-01T14:30:00"}
+
+Examples:
+  python event_index.py                      # totals per run
+  python event_index.py --run 100042         # per-type breakdown of one run
+  python event_index.py --type stf_gen --json
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+INDEX_FILE = 'index.json'
+
+
+def _empty_run():
+    return {'types': {}, 'stf_bytes': 0, 'first_tick': None, 'last_tick': None}
+
+
+class EventIndex:
+    """Running counters per run and msg_type, persisted as a JSON index file."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.runs = {}  # run_id (str) -> run summary
+        self.session_runs = set()  # runs counted by this process (not just loaded)
+        if self.path and self.path.exists():
+            self.load()
+
+    def load(self):
+        with open(self.path) as f:
+            self.runs = json.load(f).get('runs', {})
+
+    def add(self, message, nbytes):
+        """Count one published message of nbytes."""
+        run_id = str(message.get('run_id'))
+        msg_type = message.get('msg_type', 'unknown')
+        run = self.runs.get(run_id)
+        if run is None:
+            run = self.runs[run_id] = _empty_run()
+        self.session_runs.add(run_id)
+        counters = run['types'].get(msg_type)
+        if counters is None:
+            counters = run['types'][msg_type] = {'count': 0, 'bytes': 0}
+        counters['count'] += 1
+        counters['bytes'] += nbytes
+        if msg_type == 'stf_gen' and isinstance(message.get('size_bytes'), int):
+            run['stf_bytes'] += message['size_bytes']
+        tick = message.get('simulation_tick')
+        if tick is not None:
+            if run['first_tick'] is None:
+                run['first_tick'] = tick
+            run['last_tick'] = tick
+
+    def save(self):
+        """Write the index atomically (readers never see a partial file)."""
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({'runs': self.runs, 'updated': datetime.now().isoformat(timespec='seconds')}, f,
+                      indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def totals(self, run_ids=None, msg_type=None):
+        """Per-type {'count', 'bytes'} summed over the given runs (default: all)."""
+        totals = {}
+        for run_id in run_ids if run_ids is not None else self.runs:
+            for name, counters in self.runs.get(str(run_id), {}).get('types', {}).items():
+                if msg_type is not None and name != msg_type:
+                    continue
+                total = totals.setdefault(name, {'count': 0, 'bytes': 0})
+                total['count'] += counters['count']
+                total['bytes'] += counters['bytes']
+        return totals
+
+
+def format_bytes(value):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if abs(value) < 1024 or unit == 'TB':
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Query the DAQ simulator's event index",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--index', default=str(Path('daq_events') / INDEX_FILE),
+                        help=f'Index file (default daq_events/{INDEX_FILE})')
+    parser.add_argument('--run', action='append', help='Only this run (repeatable)')
+    parser.add_argument('--type', dest='msg_type', help='Only this message type')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    if not Path(args.index).exists():
+        parser.error(f"no event index at {args.index}")
+    index = EventIndex(args.index)
+    run_ids = args.run if args.run else sorted(index.runs)
+    missing = [run_id for run_id in run_ids if run_id not in index.runs]
+    if missing:
+        parser.error(f"unknown run(s): {', '.join(missing)}")
+
+    if args.json:
+        print(json.dumps({'runs': {run_id: index.runs[run_id] for run_id in run_ids},
+                          'totals': index.totals(run_ids, args.msg_type)}, indent=2))
+        return
+
+    if args.run:
+        # Per-type breakdown of the selected runs
+        for run_id in run_ids:
+            run = index.runs[run_id]
+            print(f"Run {run_id} (ticks {run['first_tick']} - {run['last_tick']}, "
+                  f"STF payload {format_bytes(run['stf_bytes'])})")
+            for name, counters in sorted(index.totals([run_id], args.msg_type).items()):
+                print(f"  {name:<20} {counters['count']:>10} {format_bytes(counters['bytes']):>12}")
+    else:
+        print(f"{'run':<12} {'events':>10} {'bytes':>12} {'stf_gen':>10} {'stf payload':>14}")
+        for run_id in run_ids:
+            totals = index.totals([run_id], args.msg_type)
+            events = sum(counters['count'] for counters in totals.values())
+            nbytes = sum(counters['bytes'] for counters in totals.values())
+            stfs = totals.get('stf_gen', {}).get('count', 0)
+            print(f"{run_id:<12} {events:>10} {format_bytes(nbytes):>12} {stfs:>10} "
+                  f"{format_bytes(index.runs[run_id]['stf_bytes']):>14}")
+    print("Totals:")
+    for name, counters in sorted(index.totals(run_ids, args.msg_type).items()):
+        print(f"  {name:<20} {counters['count']:>10} {format_bytes(counters['bytes']):>12}")
+
+
+if __name__ == "__main__":
+    main()
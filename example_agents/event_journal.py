@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Event Journal: Append-only, per-run journal of the DAQ simulator's broadcast messages.
+
+Replaces the one-pretty-printed-JSON-file-per-event layout of daq_events/. Each run gets
+one segment file, daq_events/run_<run_id>.journal, starting with a short header:
+
+    b'SWFJ' | version (1 byte) | codec (1 byte: b'j' compact JSON, b'm' msgpack)
+
+followed by length-prefixed records:
+
+    message length (uint32, big-endian) | name length (uint16) | name (UTF-8) | message
+
+The name is the event's legacy file stem (e.g. 'run_100042_imminent',
+'stf_100042_000017_gen'), so to_legacy_files() can rebuild the old per-file layout.
+Writes are buffered and flushed every flush_interval seconds, every flush_every records
+and when a run's segment is closed. A record cut short by a crash is ignored on read.
+
+msgpack is optional (pip install msgpack) and only used when requested.
+
+Examples:
+  python event_journal.py list daq_events
+  python event_journal.py dump daq_events --run 100042 --type stf_gen
+  python event_journal.py convert daq_events --output daq_events_legacy
+"""
+
+import json
+import os
+import struct
+import time
+from pathlib import Path
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency, checked when the msgpack codec is selected
+    msgpack = None
+
+MAGIC = b'SWFJ'
+VERSION = 1
+HEADER = struct.Struct('>4sBc')
+RECORD_HEADER = struct.Struct('>IH')
+SEGMENT_SUFFIX = '.journal'
+CODECS = {'json': b'j', 'msgpack': b'm'}
+
+
+def _encoder(codec):
+    if codec == b'j':
+        return lambda message: json.dumps(message, separators=(',', ':'), default=str).encode()
+    if msgpack is None:
+        raise RuntimeError("The msgpack journal codec requires the msgpack package (pip install msgpack)")
+    return lambda message: msgpack.packb(message, default=str, use_bin_type=True)
+
+
+def _decoder(codec):
+    if codec == b'j':
+        return json.loads
+    if msgpack is None:
+        raise RuntimeError("Reading a msgpack journal requires the msgpack package (pip install msgpack)")
+    return lambda data: msgpack.unpackb(data, raw=False)
+
+
+def segment_path(directory, run_id):
+    return Path(directory) / f"run_{run_id}{SEGMENT_SUFFIX}"
+
+
+class JournalSegment:
+    """Append handle for one run's segment file."""
+
+    def __init__(self, path, codec='json', buffer_size=1 << 20):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown journal codec '{codec}' (expected {', '.join(CODECS)})")
+        self.path = Path(path)
+        existing = self.path.exists() and self.path.stat().st_size > 0
+        if existing:
+            # Appending to a segment from an earlier process: keep its codec and cut off
+            # a torn final record so new records stay aligned
+            with open(self.path, 'r+b') as f:
+                self.codec = _read_header(f, self.path)
+                f.truncate(_complete_length(f))
+        else:
+            self.codec = CODECS[codec]
+        self._encode = _encoder(self.codec)
+        self._file = open(self.path, 'ab', buffering=buffer_size)
+        if not existing:
+            self._file.write(HEADER.pack(MAGIC, VERSION, self.codec))
+        self.records = 0
+        self.bytes = 0
+
+    def append(self, name, message):
+        """Buffer one record; returns its size in bytes."""
+        name_bytes = name.encode()
+        body = self._encode(message)
+        self._file.write(RECORD_HEADER.pack(len(body), len(name_bytes)))
+        self._file.write(name_bytes)
+        self._file.write(body)
+        self.records += 1
+        size = RECORD_HEADER.size + len(name_bytes) + len(body)
+        self.bytes += size
+        return size
+
+    def flush(self, sync=False):
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def close(self, sync=False):
+        if not self._file.closed:
+            self.flush(sync)
+            self._file.close()
+
+
+class EventJournal:
+    """
+    Per-run append-only journal under one directory.
+
+    Segments stay open while their run is active (overlapping runs each have their own)
+    and are closed with close_run() when the run ends.
+    """
+
+    def __init__(self, directory='daq_events', codec='json', flush_interval=1.0, flush_every=1000,
+                 fsync=False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.codec = codec
+        self.flush_interval = float(flush_interval)
+        self.flush_every = max(1, int(flush_every))
+        self.fsync = fsync
+        _encoder(CODECS[codec])  # fail early when msgpack is requested but missing
+        self._segments = {}  # run_id -> JournalSegment
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self.stats = {'records': 0, 'bytes': 0, 'flushes': 0, 'segments': 0}
+
+    def append(self, run_id, name, message):
+        """Journal one event for a run; returns the record size in bytes."""
+        segment = self._segments.get(run_id)
+        if segment is None:
+            segment = self._segments[run_id] = JournalSegment(segment_path(self.directory, run_id), self.codec)
+            self.stats['segments'] += 1
+        size = segment.append(name, message)
+        self.stats['records'] += 1
+        self.stats['bytes'] += size
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return size
+
+    def flush(self):
+        for segment in self._segments.values():
+            segment.flush(self.fsync)
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self.stats['flushes'] += 1
+
+    def close_run(self, run_id):
+        """Flush and close a finished run's segment."""
+        segment = self._segments.pop(run_id, None)
+        if segment is not None:
+            segment.close(self.fsync)
+
+    def close(self):
+        for run_id in list(self._segments):
+            self.close_run(run_id)
+
+
+def _read_header(f, path):
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path}: truncated journal header")
+    magic, version, codec = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not an event journal")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported journal version {version}")
+    if codec not in CODECS.values():
+        raise ValueError(f"{path}: unknown journal codec {codec!r}")
+    return codec
+
+
+def _complete_length(f):
+    """Offset just past the last complete record (f positioned after the header)."""
+    end = f.seek(0, os.SEEK_END)
+    offset = f.seek(HEADER.size)
+    while True:
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return offset
+        body_length, name_length = RECORD_HEADER.unpack(header)
+        next_offset = offset + RECORD_HEADER.size + name_length + body_length
+        if next_offset > end:
+            return offset
+        offset = f.seek(next_offset)
+
+
+def read_segment(path):
+    """Yield (name, message) for every complete record in a segment file."""
+    with open(path, 'rb') as f:
+        decode = _decoder(_read_header(f, path))
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            body_length, name_length = RECORD_HEADER.unpack(header)
+            name = f.read(name_length)
+            body = f.read(body_length)
+            if len(name) < name_length or len(body) < body_length:
+                return  # Torn final record from an interrupted write
+            yield name.decode(), decode(body)
+
+
+def list_segments(directory='daq_events'):
+    """Segment files in a journal directory, as {run_id: path}."""
+    prefix = 'run_'
+    return {path.name[len(prefix):-len(SEGMENT_SUFFIX)]: path
+            for path in sorted(Path(directory).glob(f"{prefix}*{SEGMENT_SUFFIX}"))}
+
+
+def iter_events(directory='daq_events', run_id=None, msg_type=None):
+    """Yield (run_id, name, message) from a journal directory, optionally for one run or message type."""
+    segments = list_segments(directory)
+    if run_id is not None:
+        segments = {str(run_id): segments[str(run_id)]} if str(run_id) in segments else {}
+    for segment_run, path in segments.items():
+        for name, message in read_segment(path):
+            if msg_type is None or message.get('msg_type') == msg_type:
+                yield segment_run, name, message
+
+
+def to_legacy_files(directory='daq_events', output_dir=None, run_id=None):
+    """Write every journaled event as its own pretty-printed <name>.json file (the old layout)."""
+    output_dir = Path(output_dir or directory)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for _, name, message in iter_events(directory, run_id):
+        with open(output_dir / f"{name}.json", 'w') as f:
+            json.dump(message, f, indent=2)
+        written += 1
+    return written
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect and convert DAQ event journals",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('command', choices=('list', 'dump', 'convert'))
+    parser.add_argument('directory', nargs='?', default='daq_events', help='Journal directory (default daq_events)')
+    parser.add_argument('--run', help='Only this run')
+    parser.add_argument('--type', dest='msg_type', help='Only this message type (dump)')
+    parser.add_argument('--output', help='Directory for the per-event JSON files (convert, default: the journal directory)')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for run_id, path in list_segments(args.directory).items():
+            if args.run and run_id != args.run:
+                continue
+            records = sum(1 for _ in read_segment(path))
+            print(f"{run_id:<12} {records:>9} events {path.stat().st_size:>12} bytes  {path}")
+    elif args.command == 'dump':
+        for _, name, message in iter_events(args.directory, args.run, args.msg_type):
+            print(json.dumps({'event': name, 'message': message}, separators=(',', ':')))
+    else:
+        written = to_legacy_files(args.directory, args.output, args.run)
+        print(f"Wrote {written} event files to {args.output or args.directory}")
+
+
+if __name__ == "__main__":
+    main()
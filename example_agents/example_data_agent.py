@@ -3,32 +3,102 @@ Example Data Agent: Handles STF generation messages.
 """
 
 from swf_common_lib.base_agent import BaseAgent
+import os
 import json
-import requests
+import time
+import threading
 from datetime import datetime
 
-class DataAgent(BaseAgent):
+from agent_transport import AgentTransport
+from dedup_cache import DedupCache
+from heartbeat_scheduler import HeartbeatScheduler
+from hop_timing import forward, mark_received
+from shard_partition import ShardPartition
+from state_store import FileRecord, PendingStfRecord, RunRecord, StateTable
+from stf_registration_pipeline import StfRegistrationPipeline
+
+class DataAgent(AgentTransport, BaseAgent):
     """
     An example agent that simulates the role of the Data Agent.
     It listens for 'stf_gen' messages and sends 'data_ready' messages.
     """
 
-    def __init__(self):
+    def __init__(self, connection=None, monitor=None):
         super().__init__(agent_type='DATA', subscription_queue='epictopic')
-        self.active_runs = {}  # Track active runs and their monitor IDs
-        self.active_files = {}  # Track STF files being processed
+        # Optional transport overrides (e.g. local_transport.LocalConnection / LocalMonitorAPI)
+        # for running without ActiveMQ and the monitor
+        self.setup_transport(connection, monitor)
+        # Track active runs and their STF files in bounded tables: idle entries expire after a
+        # TTL, the least recently used are evicted at the size cap, and end_run drops a run's files
+        self.active_runs = StateTable(
+            max_entries=int(os.getenv('SWF_STATE_MAX_RUNS', '1000')),
+            ttl=float(os.getenv('SWF_STATE_RUN_TTL', '86400'))
+        )
+        self.active_files = StateTable(
+            max_entries=int(os.getenv('SWF_STATE_MAX_FILES', '100000')),
+            ttl=float(os.getenv('SWF_STATE_FILE_TTL', '3600'))
+        )
+        self._state_lock = threading.Lock()
+
+        # Redelivered messages are dropped before any monitor call
+        self.dedup = DedupCache.from_env()
+
+        # Scale-out: with SWF_DATA_AGENT_SHARDS > 1 this process handles only its share of the STFs
+        self.partition = ShardPartition.from_env()
+        if self.partition.enabled:
+            self.logger.info(f"Data agent shard {self.partition.index + 1} of {self.partition.count} "
+                             f"(partitioned by {self.partition.key})")
+        # STFs of a run another shard has not announced yet (run_registered) wait here
+        self.pending_stfs = StateTable(max_entries=int(os.getenv('SWF_SHARD_PENDING_MAX', '10000')))
+        self.pending_timeout = float(os.getenv('SWF_SHARD_PENDING_TIMEOUT', '300'))
+        self.pending_stats = {'held': 0, 'released': 0, 'expired': 0}
+
+        # Pipelined mode: send data_ready immediately and register STFs in background batches.
+        # Enable with SWF_DATA_AGENT_PIPELINE=1 (or true/yes/on).
+        self.pipeline_enabled = os.getenv('SWF_DATA_AGENT_PIPELINE', '0').lower() in ('1', 'true', 'yes', 'on')
+        self.registration_pipeline = None
+        if self.pipeline_enabled:
+            self.registration_pipeline = StfRegistrationPipeline(
+                self._flush_stf_registrations,
+                batch_size=int(os.getenv('SWF_STF_BATCH_SIZE', '50')),
+                flush_interval=float(os.getenv('SWF_STF_FLUSH_INTERVAL', '1.0')),
+                logger=self.logger,
+                on_failure=self._registrations_failed
+            )
+
+        # Heartbeats go out from a background thread at a fixed cadence, never per message
+        self.messages_received = 0
+        self.heartbeat = HeartbeatScheduler(
+            self.send_data_agent_heartbeat,
+            interval=float(os.getenv('SWF_HEARTBEAT_INTERVAL', '30')),
+            jitter=float(os.getenv('SWF_HEARTBEAT_JITTER', '0.1')),
+            logger=self.logger,
+            name='data-agent-heartbeat'
+        ).start()
 
     def on_message(self, frame):
         """
         Handles incoming DAQ messages (stf_gen, run_imminent, start_run, end_run).
         """
         self.logger.info("Data Agent received message")
+        self.messages_received += 1
+        self.heartbeat.update(messages_received=self.messages_received)
+        message_data = None
         try:
-            message_data = json.loads(frame.body)
+            message_data = mark_received(json.loads(frame.body), self.agent_name)
             msg_type = message_data.get('msg_type')
             
+            if msg_type == 'stf_gen' and not self.partition.owns_stf(message_data):
+                return
+            if not self.dedup.check_and_add(message_data):
+                self.logger.info("Dropping duplicate message", extra={"msg_type": msg_type, "run_id": message_data.get('run_id'),
+                                                                      "stf_filename": message_data.get('filename')})
+                return
+            
             if msg_type == 'stf_gen':
                 self.handle_stf_gen(message_data)
+            elif msg_type == 'run_registered':
+                self.handle_run_registered(message_data)
             elif msg_type == 'run_imminent':
                 self.handle_run_imminent(message_data)
             elif msg_type == 'start_run':
@@ -38,6 +108,9 @@ class DataAgent(BaseAgent):
             else:
                 self.logger.info("Ignoring unknown message type", extra={"msg_type": msg_type})
         except Exception as e:
+            if message_data is not None:
+                # Let a redelivery of the failed message through
+                self.dedup.forget(message_data)
             self.logger.error(f"CRITICAL: Message processing failed - {str(e)}", extra={"error": str(e)})
             import traceback
             self.logger.error(f"Traceback: {traceback.format_exc()}")
@@ -55,14 +128,10 @@ class DataAgent(BaseAgent):
         }
         
         try:
-            result = self.call_monitor_api('POST', '/runs/', run_data)
+            result = self.monitor_client.call_api('POST', '/runs/', run_data)
             if result:
                 monitor_run_id = result.get('run_id')
-                self.active_runs[run_id] = {
-                    'monitor_run_id': monitor_run_id,
-                    'files_created': 0,
-                    'total_files': 0
-                }
+                self.active_runs.put(run_id, RunRecord(monitor_run_id))
                 self.logger.info(f"Run {run_id} registered in monitor with ID {monitor_run_id}")
                 return monitor_run_id
             else:
@@ -81,18 +150,19 @@ class DataAgent(BaseAgent):
     
     def update_run_status(self, run_id, status='completed'):
         """Update run status in the monitor."""
-        if run_id not in self.active_runs:
+        run = self.active_runs.get(run_id)
+        if run is None:
             self.logger.warning(f"Run {run_id} not found in active runs")
             return False
             
-        monitor_run_id = self.active_runs[run_id]['monitor_run_id']
+        monitor_run_id = run.monitor_run_id
         self.logger.info(f"Updating run {run_id} status to {status} in monitor...")
         
         update_data = {
             'end_time': datetime.now().isoformat()
         }
         
-        result = self.call_monitor_api('PATCH', f'/runs/{monitor_run_id}/', update_data)
+        result = self.monitor_client.call_api('PATCH', f'/runs/{monitor_run_id}/', update_data)
         if result:
             self.logger.info(f"Run {run_id} status updated successfully")
             return True
@@ -100,40 +170,50 @@ class DataAgent(BaseAgent):
             self.logger.warning(f"Failed to update run {run_id} status")
             return False
     
-    def register_stf_file(self, run_id, filename, file_size=None):
-        """Register an STF file in the monitor."""
-        if run_id not in self.active_runs:
+    def _stf_file_record(self, run_id, filename, file_size=None, status='registered'):
+        """Build the monitor record for an STF file, or None if its run is not registered."""
+        run = self.active_runs.get(run_id)
+        if run is None:
             self.logger.warning(f"Cannot register file {filename} - run {run_id} not active")
             return None
             
-        monitor_run_id = self.active_runs[run_id]['monitor_run_id']
+        monitor_run_id = run.monitor_run_id
         
         # Skip registration if run registration failed
         if monitor_run_id is None:
             self.logger.warning(f"Skipping STF file registration for {filename} - run {run_id} was not registered in monitor")
             return None
             
-        self.logger.info(f"Registering STF file {filename} in monitor...")
-        
-        file_data = {
+        return {
             'run': monitor_run_id,
             'stf_filename': filename,
             'file_size_bytes': file_size,
             'machine_state': 'physics',
-            'status': 'registered',
+            'status': status,
             'metadata': {'created_by': self.agent_name}
         }
+    
+    def _remember_stf_file(self, run_id, filename, file_id, status):
+        """Track a registered STF file and count it against its run."""
+        with self._state_lock:
+            self.active_files.put(filename, FileRecord(file_id, run_id, status), group=run_id)
+            run = self.active_runs.get(run_id)
+            if run is not None:
+                run.files_created += 1
+    
+    def register_stf_file(self, run_id, filename, file_size=None, status='registered'):
+        """Register an STF file in the monitor."""
+        file_data = self._stf_file_record(run_id, filename, file_size, status)
+        if file_data is None:
+            return None
+            
+        self.logger.info(f"Registering STF file {filename} in monitor...")
         
         try:
-            result = self.call_monitor_api('POST', '/stf-files/', file_data)
+            result = self.monitor_client.call_api('POST', '/stf-files/', file_data)
             if result:
                 file_id = result.get('file_id')
-                self.active_files[filename] = {
-                    'file_id': file_id,
-                    'run_id': run_id,
-                    'status': 'registered'
-                }
-                self.active_runs[run_id]['files_created'] += 1
+                self._remember_stf_file(run_id, filename, file_id, status)
                 self.logger.info(f"STF file {filename} registered with ID {file_id}")
                 return file_id
             else:
@@ -151,12 +231,12 @@ class DataAgent(BaseAgent):
     
     def update_stf_file_status(self, filename, status):
         """Update STF file status in the monitor."""
-        if filename not in self.active_files:
+        file_info = self.active_files.get(filename)
+        if file_info is None:
             self.logger.warning(f"File {filename} not found in active files")
             return False
             
-        file_info = self.active_files[filename]
-        file_id = file_info['file_id']
+        file_id = file_info.file_id
         self.logger.info(f"Updating STF file {filename} status to {status}...")
         
         update_data = {
@@ -164,22 +244,34 @@ class DataAgent(BaseAgent):
             'metadata': {'processed_by': self.agent_name, 'updated_at': datetime.now().isoformat()}
         }
         
-        result = self.call_monitor_api('PATCH', f'/stf-files/{file_id}/', update_data)
+        result = self.monitor_client.call_api('PATCH', f'/stf-files/{file_id}/', update_data)
         if result:
-            self.active_files[filename]['status'] = status
+            file_info.status = status
             self.logger.info(f"STF file {filename} status updated to {status}")
             return True
         else:
             self.logger.warning(f"Failed to update STF file {filename} status")
             return False
     
-    def send_data_agent_heartbeat(self):
+    def send_data_agent_heartbeat(self, counters=None):
         """Send enhanced heartbeat with data agent context."""
-        workflow_metadata = {
-            'active_runs': len(self.active_runs),
-            'active_files': len(self.active_files),
-            'completed_tasks': sum(run['files_created'] for run in self.active_runs.values())
-        }
+        workflow_metadata = dict(counters or {})
+        with self._state_lock:
+            workflow_metadata.update({
+                'active_runs': len(self.active_runs),
+                'active_files': len(self.active_files),
+                'completed_tasks': sum(run.files_created for run in self.active_runs.values()),
+                'state_evictions': self.active_runs.stats['evicted'] + self.active_files.stats['evicted'],
+                'state_expirations': self.active_runs.stats['expired'] + self.active_files.stats['expired']
+            })
+        if self.registration_pipeline:
+            workflow_metadata['pending_registrations'] = self.registration_pipeline.pending_count()
+        if self.partition.enabled:
+            self.expire_pending_stfs()
+            workflow_metadata['partition'] = self.partition.describe()
+            workflow_metadata['pending_stfs'] = dict(self.pending_stats, waiting=len(self.pending_stfs),
+                                                     evicted=self.pending_stfs.stats['evicted'])
+        workflow_metadata.update(self.dedup.metrics())
         
         return self.send_enhanced_heartbeat(workflow_metadata)
 
@@ -190,8 +282,23 @@ class DataAgent(BaseAgent):
         self.logger.info("Processing run_imminent message", 
                         extra={"run_id": run_id, "simulation_tick": message_data.get('simulation_tick')})
         
+        if not self.partition.owns_run(run_id):
+            # The owning shard registers the run (and announces it with run_registered)
+            self.logger.info("Run is registered by another shard",
+                             extra={"run_id": run_id, "owner_shard": self.partition.owner(str(run_id))})
+            return
+        
         # Create run record in monitor
         monitor_run_id = self.create_run_record(run_id, run_conditions)
+        if self.partition.enabled and self.partition.key == 'filename':
+            # Other shards register this run's STFs too and need the monitor's run ID
+            self.send_message(self.subscription_queue, {
+                "msg_type": "run_registered",
+                "run_id": run_id,
+                "monitor_run_id": monitor_run_id,
+                "shard": self.partition.index,
+                "processed_by": self.agent_name
+            })
         
         # TODO: Call Rucio to create dataset for this run
         
@@ -201,14 +308,50 @@ class DataAgent(BaseAgent):
         else:
             self.logger.warning("Dataset created but monitor registration failed", extra={"run_id": run_id})
 
+    def handle_run_registered(self, message_data):
+        """Handle run_registered message - another shard registered a run whose STFs we share"""
+        run_id = message_data.get('run_id')
+        if message_data.get('shard') == self.partition.index or self.partition.key != 'filename':
+            return
+        with self._state_lock:
+            if run_id not in self.active_runs:
+                self.active_runs.put(run_id, RunRecord(message_data.get('monitor_run_id')))
+            pending = self.pending_stfs.pop_group(run_id)
+            self.pending_stats['released'] += len(pending)
+        self.logger.info("Run registered by another shard",
+                         extra={"run_id": run_id, "monitor_run_id": message_data.get('monitor_run_id'),
+                                "owner_shard": message_data.get('shard'), "pending_stfs": len(pending)})
+        # STFs that arrived before the announcement can be registered now
+        for record in pending:
+            self.handle_stf_gen(record.message)
+
+    def _awaits_run_registration(self, run_id):
+        """True if another shard registers this run and has not announced it yet."""
+        return (self.partition.enabled and self.partition.key == 'filename'
+                and not self.partition.owns_run(run_id) and run_id not in self.active_runs)
+
+    def expire_pending_stfs(self):
+        """Give up on held STFs whose run_registered never came (forgotten, so a redelivery is retried)."""
+        cutoff = time.monotonic() - self.pending_timeout
+        with self._state_lock:
+            expired = [self.pending_stfs.pop(record.message.get('filename'))
+                       for record in self.pending_stfs.values() if record.received < cutoff]
+            self.pending_stats['expired'] += len(expired)
+        for record in expired:
+            self.dedup.forget(record.message)
+            self.logger.warning("Dropping STF held for an unregistered run",
+                                extra={"stf_filename": record.message.get('filename'),
+                                       "run_id": record.message.get('run_id')})
+        return len(expired)
+
     def handle_start_run(self, message_data):
         """Handle start_run message - run is starting physics"""
         run_id = message_data.get('run_id')
         self.logger.info("Processing start_run message", 
                         extra={"run_id": run_id, "simulation_tick": message_data.get('simulation_tick')})
         
-        # Send enhanced heartbeat with run context
-        self.send_data_agent_heartbeat()
+        # Send enhanced heartbeat with run context (state change: immediate)
+        self.heartbeat.send_now()
         
         self.logger.info("Run started", extra={"run_id": run_id})
 
@@ -219,17 +362,29 @@ class DataAgent(BaseAgent):
         self.logger.info("Processing end_run message", 
                         extra={"run_id": run_id, "total_files": total_files, "simulation_tick": message_data.get('simulation_tick')})
         
+        # Registrations still queued for this run must reach the monitor while the run is active
+        if self.registration_pipeline:
+            if not self.registration_pipeline.drain():
+                self.logger.warning("Timed out flushing pending STF registrations", extra={"run_id": run_id})
+        
         # Update run status in monitor API
-        if run_id in self.active_runs:
-            self.active_runs[run_id]['total_files'] = total_files
+        run = self.active_runs.get(run_id)
+        if run is not None and self.partition.owns_run(run_id):
+            run.total_files = total_files
             self.update_run_status(run_id, 'completed')
         
         # TODO: Finalize dataset in Rucio
         
         # Send final heartbeat and clean up
-        self.send_data_agent_heartbeat()
-        if run_id in self.active_runs:
-            del self.active_runs[run_id]
+        self.heartbeat.send_now()
+        with self._state_lock:
+            self.active_runs.pop(run_id, None)
+            dropped_files = self.active_files.drop_group(run_id)
+            unregistered = self.pending_stfs.drop_group(run_id)
+        if unregistered:
+            self.logger.warning(f"Run {run_id} ended before it was registered; dropped {unregistered} held STF files")
+        if dropped_files:
+            self.logger.info(f"Released tracking for {dropped_files} STF files of run {run_id}")
         
         self.logger.info("Run ended", extra={"run_id": run_id, "total_files": total_files})
 
@@ -241,19 +396,34 @@ class DataAgent(BaseAgent):
         checksum = message_data.get('checksum')
         size_bytes = message_data.get('size_bytes')
         
+        if self._awaits_run_registration(run_id):
+            # Without the monitor's run ID the file cannot be registered: hold it until the
+            # owning shard's run_registered arrives (or the hold times out)
+            with self._state_lock:
+                self.pending_stfs.put(filename, PendingStfRecord(message_data, time.monotonic()), group=run_id)
+                self.pending_stats['held'] += 1
+            self.logger.info("Holding STF until its run is registered",
+                             extra={"stf_filename": filename, "run_id": run_id})
+            return
+        
         self.logger.info("Processing STF file", 
                         extra={"stf_filename": filename, "run_id": run_id, "size_bytes": size_bytes,
                               "simulation_tick": message_data.get('simulation_tick')})
         
-        # Register STF file and workflow with monitor
-        self.register_stf_file(run_id, filename, size_bytes)
+        if self.registration_pipeline:
+            # Registration and the 'processed' status update are coalesced into one
+            # background record; data_ready goes out without waiting on the monitor.
+            self.registration_pipeline.submit(filename, run_id=run_id, file_size=size_bytes, status='processed')
+        else:
+            # Register STF file and workflow with monitor
+            self.register_stf_file(run_id, filename, size_bytes)
         
         # TODO: Register STF file with Rucio
         # TODO: Initiate transfer to E1 facilities  
         
-        # Simulate processing time
-        import time
-        time.sleep(0.1)
+        if not self.registration_pipeline:
+            # Simulate processing time
+            time.sleep(0.1)
         
         # Send data_ready message to processing agent
         data_ready_message = {
@@ -267,14 +437,65 @@ class DataAgent(BaseAgent):
             "processed_by": self.agent_name
         }
         
-        self.send_message('processing_agent', data_ready_message)
+        self.send_message('processing_agent', forward(message_data, data_ready_message))
         
-        # Update STF file status to processed
-        self.update_stf_file_status(filename, 'processed')
+        if not self.registration_pipeline:
+            # Update STF file status to processed
+            self.update_stf_file_status(filename, 'processed')
         
         self.logger.info("Sent data_ready message", 
                         extra={"stf_filename": filename, "run_id": run_id, "destination": "processing_agent"})
 
+    def _flush_stf_registrations(self, batch):
+        """Register a batch of coalesced STF records (runs on the pipeline worker thread)."""
+        if self.monitor_client.bulk:
+            self._bulk_register_stf_files(batch)
+            return
+        for record in batch:
+            try:
+                file_id = self.register_stf_file(record['run_id'], record['filename'],
+                                                 record.get('file_size'), status=record.get('status', 'registered'))
+            except Exception as e:
+                self.logger.error(f"STF file {record['filename']} registration failed: {e}")
+                file_id = None
+            if file_id is None:
+                self._registrations_failed([record])
+
+    def _bulk_register_stf_files(self, batch):
+        """Register a batch of STF files with one bulk monitor request."""
+        pending = []
+        for record in batch:
+            file_data = self._stf_file_record(record['run_id'], record['filename'],
+                                              record.get('file_size'), record.get('status', 'registered'))
+            if file_data is not None:
+                pending.append((record, file_data))
+            else:
+                self._registrations_failed([record])
+        if not pending:
+            return
+        
+        results = self.monitor_client.bulk_create('/stf-files/', [file_data for _, file_data in pending])
+        for (record, file_data), result in zip(pending, results):
+            if result:
+                self._remember_stf_file(record['run_id'], record['filename'], result.get('file_id'), file_data['status'])
+            else:
+                self.logger.warning(f"Failed to register STF file {record['filename']} in bulk request")
+                self._registrations_failed([record])
+        self.logger.info(f"Registered {len(pending)} STF files in bulk")
+
+    def _registrations_failed(self, records):
+        """Forget the stf_gen messages of unregistered records, so a broker redelivery registers them."""
+        for record in records:
+            self.dedup.forget({'msg_type': 'stf_gen', 'run_id': record.get('run_id'), 'filename': record['filename']})
+
+    def shutdown(self):
+        """Flush pending STF registrations and stop the heartbeat thread before the agent exits."""
+        self.heartbeat.stop()
+        if self.registration_pipeline:
+            self.registration_pipeline.close()
+        self.dedup.close()
+        self.monitor_client.close()
+
 
     
     
@@ -294,4 +515,7 @@ class DataAgent(BaseAgent):
 
 if __name__ == "__main__":
     agent = DataAgent()
-    agent.run()
+    try:
+        agent.run()
+    finally:
+        agent.shutdown()
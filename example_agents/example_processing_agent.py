@@ -3,32 +3,108 @@ Example Processing Agent: Handles data ready messages.
 """
 
 from swf_common_lib.base_agent import BaseAgent
+import os
 import json
 import time
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
+from functools import partial
 
-class ProcessingAgent(BaseAgent):
+from agent_transport import AgentTransport
+from dedup_cache import DedupCache
+from heartbeat_scheduler import HeartbeatScheduler
+from hop_timing import forward, mark_received
+from state_store import ProcessingRecord, StateTable
+
+
+def run_reconstruction(filename, duration_seconds=0.5):
+    """
+    Stand-in for the reconstruction job. Module level so it can run in a process pool.
+    Returns the output file names and the elapsed time in milliseconds.
+    """
+    started = time.monotonic()
+    time.sleep(duration_seconds)  # Simulate compute-intensive processing
+    output_files = [
+        f"{filename.replace('.dat', '.dst')}",
+        f"{filename.replace('.dat', '.hist.root')}"
+    ]
+    return output_files, int((time.monotonic() - started) * 1000)
+
+
+class ProcessingAgent(AgentTransport, BaseAgent):
     """
     An example agent that simulates the role of the Processing Agent.
     It listens for 'data_ready' messages.
     """
 
-    def __init__(self):
+    def __init__(self, connection=None, monitor=None):
         super().__init__(agent_type='PROCESSING', subscription_queue='processing_agent')
-        self.active_processing = {}  # Track files being processed
+        # Optional transport overrides (e.g. local_transport.LocalConnection / LocalMonitorAPI)
+        # for running without ActiveMQ and the monitor
+        self.setup_transport(connection, monitor)
+        # Track files being processed; entries leaked by lost completions expire after a TTL
+        self.active_processing = StateTable(
+            max_entries=int(os.getenv('SWF_STATE_MAX_TASKS', '10000')),
+            ttl=float(os.getenv('SWF_STATE_TASK_TTL', '3600'))
+        )
         self.processing_stats = {'total_processed': 0, 'failed_count': 0}
+        self._state_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        # Redelivered messages are dropped before any reconstruction or monitor call
+        self.dedup = DedupCache.from_env()
+        
+        # Executor mode: 'inline' (default, reconstruct in the listener thread), 'thread' or 'process'
+        self.executor_mode = os.getenv('SWF_PROCESSING_EXECUTOR', 'inline').lower()
+        self.processing_time = float(os.getenv('SWF_PROCESSING_TIME', '0.5'))
+        workers = int(os.getenv('SWF_PROCESSING_WORKERS', str(os.cpu_count() or 1)))
+        max_inflight = int(os.getenv('SWF_PROCESSING_MAX_INFLIGHT', str(2 * workers)))
+        
+        self.executor = None
+        if self.executor_mode == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reconstruction')
+        elif self.executor_mode == 'process':
+            # Spawn rather than fork: the listener and heartbeat threads are already running
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        elif self.executor_mode != 'inline':
+            raise ValueError(f"Unknown SWF_PROCESSING_EXECUTOR '{self.executor_mode}' (expected inline, thread or process)")
+        
+        # Bounds the jobs submitted but not yet completed. When it is exhausted the listener
+        # thread blocks in handle_data_ready, so no further messages are consumed or acked.
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+        if self.executor:
+            self.logger.info(f"Reconstruction executor: {self.executor_mode} pool, "
+                             f"{workers} workers, {max_inflight} jobs in flight max")
+        
+        # Heartbeats go out from a background thread at a fixed cadence, never per message
+        self.messages_received = 0
+        self.heartbeat = HeartbeatScheduler(
+            self.send_processing_agent_heartbeat,
+            interval=float(os.getenv('SWF_HEARTBEAT_INTERVAL', '30')),
+            jitter=float(os.getenv('SWF_HEARTBEAT_JITTER', '0.1')),
+            logger=self.logger,
+            name='processing-agent-heartbeat'
+        ).start()
 
     def on_message(self, frame):
         """
         Handles incoming workflow messages (data_ready, run_imminent, start_run, end_run).
         """
         self.logger.info("Processing Agent received message")
-        # Update heartbeat on message activity
-        self.send_processing_agent_heartbeat()
+        # Record message activity for the next scheduled heartbeat
+        self.messages_received += 1
+        self.heartbeat.update(messages_received=self.messages_received)
+        message_data = None
         try:
-            message_data = json.loads(frame.body)
+            message_data = mark_received(json.loads(frame.body), self.agent_name)
             msg_type = message_data.get('msg_type')
             
+            if not self.dedup.check_and_add(message_data):
+                self.logger.info("Dropping duplicate message", extra={"msg_type": msg_type, "run_id": message_data.get('run_id'),
+                                                                      "stf_filename": message_data.get('filename')})
+                return
+            
             if msg_type == 'data_ready':
                 self.handle_data_ready(message_data)
             elif msg_type == 'run_imminent':
@@ -40,6 +116,9 @@ class ProcessingAgent(BaseAgent):
             else:
                 self.logger.info("Ignoring unknown message type", extra={"msg_type": msg_type})
         except Exception as e:
+            if message_data is not None:
+                # Let a redelivery of the failed message through
+                self.dedup.forget(message_data)
             self.logger.error(f"CRITICAL: Message processing failed - {str(e)}", extra={"error": str(e)})
             import traceback
             self.logger.error(f"Traceback: {traceback.format_exc()}")
@@ -63,7 +142,7 @@ class ProcessingAgent(BaseAgent):
             }
         }
         
-        result = self.call_monitor_api('PATCH', f'/stf-files/{monitor_file_id}/', update_data)
+        result = self.monitor_client.call_api('PATCH', f'/stf-files/{monitor_file_id}/', update_data)
         if result:
             self.logger.info(f"File {filename} processing status updated to {status}")
             return True
@@ -90,14 +169,15 @@ class ProcessingAgent(BaseAgent):
             }
         }
         
-        result = self.call_monitor_api('POST', '/workflow-stages/', task_data)
+        result = self.monitor_client.call_api('POST', '/workflow-stages/', task_data)
         if result:
             task_id = result.get('stage_id')
-            self.active_processing[filename] = {
-                'task_id': task_id,
-                'started_at': datetime.now(),
-                'input_data': input_data
-            }
+            with self._state_lock:
+                self.active_processing.put(
+                    filename,
+                    ProcessingRecord(task_id, input_data.get('run_id'), datetime.now(), input_data),
+                    group=input_data.get('run_id')
+                )
             self.logger.info(f"Processing task registered for {filename} with ID {task_id}")
             return task_id
         else:
@@ -106,14 +186,14 @@ class ProcessingAgent(BaseAgent):
     
     def complete_processing_task(self, filename, output_files):
         """Mark processing task as completed in monitor."""
-        if filename not in self.active_processing:
+        task_info = self.active_processing.get(filename)
+        if task_info is None:
             self.logger.warning(f"No active processing task found for {filename}")
             return False
             
-        task_info = self.active_processing[filename]
-        task_id = task_info['task_id']
+        task_id = task_info.task_id
         
-        processing_time = (datetime.now() - task_info['started_at']).total_seconds()
+        processing_time = (datetime.now() - task_info.started_at).total_seconds()
         
         self.logger.info(f"Completing processing task for {filename}...")
         
@@ -128,23 +208,28 @@ class ProcessingAgent(BaseAgent):
             }
         }
         
-        result = self.call_monitor_api('PATCH', f'/workflow-stages/{task_id}/', completion_data)
+        result = self.monitor_client.call_api('PATCH', f'/workflow-stages/{task_id}/', completion_data)
         if result:
-            self.processing_stats['total_processed'] += 1
-            del self.active_processing[filename]
+            with self._state_lock:
+                self.processing_stats['total_processed'] += 1
+                self.active_processing.pop(filename, None)
             self.logger.info(f"Processing task completed for {filename}")
             return True
         else:
             self.logger.warning(f"Failed to complete processing task for {filename}")
             return False
     
-    def send_processing_agent_heartbeat(self):
+    def send_processing_agent_heartbeat(self, counters=None):
         """Send enhanced heartbeat with processing agent context."""
-        workflow_metadata = {
-            'active_tasks': len(self.active_processing),
-            'completed_tasks': self.processing_stats['total_processed'],
-            'failed_tasks': self.processing_stats['failed_count']
-        }
+        workflow_metadata = dict(counters or {})
+        with self._state_lock:
+            workflow_metadata.update({
+                'active_tasks': len(self.active_processing),
+                'completed_tasks': self.processing_stats['total_processed'],
+                'failed_tasks': self.processing_stats['failed_count'],
+                'expired_tasks': self.active_processing.stats['expired'] + self.active_processing.stats['evicted']
+            })
+        workflow_metadata.update(self.dedup.metrics())
         
         return self.send_enhanced_heartbeat(workflow_metadata)
 
@@ -168,8 +253,8 @@ class ProcessingAgent(BaseAgent):
         self.logger.info("Processing start_run message", 
                         extra={"run_id": run_id, "simulation_tick": message_data.get('simulation_tick')})
         
-        # Send enhanced heartbeat with run context
-        self.send_processing_agent_heartbeat()
+        # Send enhanced heartbeat with run context (state change: immediate)
+        self.heartbeat.send_now()
         
         # TODO: Start monitoring for data_ready messages
         self.logger.info("Ready to process data for run", extra={"run_id": run_id})
@@ -182,10 +267,11 @@ class ProcessingAgent(BaseAgent):
                         extra={"run_id": run_id, "total_files": total_files, "simulation_tick": message_data.get('simulation_tick')})
         
         # Report final statistics via heartbeat
-        self.send_processing_agent_heartbeat()
+        self.heartbeat.send_now()
         
         # Report completion status
-        active_tasks = len(self.active_processing)
+        with self._state_lock:
+            active_tasks = self.active_processing.group_size(run_id)
         if active_tasks > 0:
             self.report_agent_status('WARNING', f'Run {run_id} ended with {active_tasks} tasks still processing')
         else:
@@ -199,8 +285,6 @@ class ProcessingAgent(BaseAgent):
         """Handle data_ready message - process STF file"""
         filename = message_data.get('filename')
         run_id = message_data.get('run_id')
-        file_url = message_data.get('file_url')
-        checksum = message_data.get('checksum')
         size_bytes = message_data.get('size_bytes')
         processed_by = message_data.get('processed_by')
         
@@ -208,29 +292,67 @@ class ProcessingAgent(BaseAgent):
                         extra={"stf_filename": filename, "run_id": run_id, "size_bytes": size_bytes,
                               "processed_by": processed_by, "simulation_tick": message_data.get('simulation_tick')})
         
-        # Simulate processing time 
-        import time
-        time.sleep(0.5)  # Simulate compute-intensive processing
+        with self._state_lock:
+            self.active_processing.put(filename, ProcessingRecord(None, run_id, datetime.now()), group=run_id)
+        
+        if self.executor is None:
+            output_files, processing_time_ms = run_reconstruction(filename, self.processing_time)
+            self._finish_processing(message_data, output_files, processing_time_ms)
+            return
         
-        # Define output files
-        output_files = [
-            f"{filename.replace('.dat', '.dst')}",
-            f"{filename.replace('.dat', '.hist.root')}"
-        ]
+        # Backpressure: wait for a free slot before taking on more work
+        self._inflight.acquire()
+        try:
+            future = self.executor.submit(run_reconstruction, filename, self.processing_time)
+        except Exception:
+            self._inflight.release()
+            with self._state_lock:
+                self.active_processing.pop(filename, None)
+            raise
+        future.add_done_callback(partial(self._on_reconstruction_done, message_data))
+
+    def _on_reconstruction_done(self, message_data, future):
+        """Completion callback for pooled reconstruction jobs."""
+        filename = message_data.get('filename')
+        try:
+            try:
+                output_files, processing_time_ms = future.result()
+            except Exception as e:
+                with self._state_lock:
+                    self.processing_stats['failed_count'] += 1
+                    self.active_processing.pop(filename, None)
+                # The listener already returned, so forget the message here to let a redelivery through
+                self.dedup.forget(message_data)
+                self.logger.error("Reconstruction failed", extra={"stf_filename": filename, "error": str(e)})
+                return
+            try:
+                self._finish_processing(message_data, output_files, processing_time_ms)
+            except Exception as e:
+                # The reconstruction succeeded but processing_complete did not go out; a redelivery retries both
+                self.dedup.forget(message_data)
+                self.logger.error("Failed to send processing_complete",
+                                  extra={"stf_filename": filename, "run_id": message_data.get('run_id'), "error": str(e)})
+        finally:
+            self._inflight.release()
+
+    def _finish_processing(self, message_data, output_files, processing_time_ms):
+        """Record a finished reconstruction and send processing_complete."""
+        filename = message_data.get('filename')
+        run_id = message_data.get('run_id')
         
-        # Update processing stats
-        self.processing_stats['total_processed'] += 1
+        with self._state_lock:
+            self.active_processing.pop(filename, None)
         
         # Send processing_complete message
         processing_complete_message = {
             "msg_type": "processing_complete",
             "filename": filename,
             "run_id": run_id,
-            "input_file_url": file_url,
-            "input_checksum": checksum,
-            "input_size_bytes": size_bytes,
+            "input_file_url": message_data.get('file_url'),
+            "input_checksum": message_data.get('checksum'),
+            "input_size_bytes": message_data.get('size_bytes'),
             "output_files": output_files,
-            "processing_time_ms": 500,
+            "processing_time_ms": processing_time_ms,
             "simulation_tick": message_data.get('simulation_tick'),
             "processed_by": self.agent_name
         }
@@ -239,10 +361,23 @@ class ProcessingAgent(BaseAgent):
         self.register_processing_results(processing_complete_message)
         
         # Send to monitoring/analysis agents
-        self.send_message('monitoring_agent', processing_complete_message)
+        with self._send_lock:
+            self.send_message('monitoring_agent', forward(message_data, processing_complete_message))
+        
+        # Count the file only once processing_complete is out, so a failed send is not counted twice on retry
+        with self._state_lock:
+            self.processing_stats['total_processed'] += 1
         self.logger.info("Sent processing_complete message", 
                         extra={"stf_filename": filename, "run_id": run_id, "destination": "monitoring_agent"})
 
+    def shutdown(self):
+        """Wait for in-flight reconstruction jobs and stop the heartbeat thread before the agent exits."""
+        self.heartbeat.stop()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        self.dedup.close()
+        self.monitor_client.close()
+
 
     
     def register_processing_results(self, processing_data):
@@ -264,4 +399,7 @@ class ProcessingAgent(BaseAgent):
 
 if __name__ == "__main__":
     agent = ProcessingAgent()
-    agent.run()
+    try:
+        agent.run()
+    finally:
+        agent.shutdown()
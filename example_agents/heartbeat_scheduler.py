@@ -0,0 +1,86 @@
+"""
+Heartbeat Scheduler: Sends agent heartbeats at a fixed cadence from a background thread.
+
+Message handlers only merge their latest workflow counters into the scheduler, which
+is cheap and never touches the network. The scheduler sends at most one heartbeat per
+interval regardless of the message rate. State changes such as run start and end can
+still force an immediate heartbeat with send_now(). An optional jitter lengthens each
+scheduled wait by a random fraction of the interval, so agents started together do not
+all hit the monitor in the same instant.
+"""
+
+import random
+import threading
+import time
+
+
+class HeartbeatScheduler:
+    """Background heartbeat sender with a fixed interval and counter merging."""
+
+    def __init__(self, send_fn, interval=30.0, logger=None, name='heartbeat', jitter=0.0, rng=None):
+        # send_fn receives a dict with the merged workflow counters
+        self.send_fn = send_fn
+        self.interval = float(interval)
+        self.jitter = float(jitter)
+        self._random = rng or random.Random()
+        self.logger = logger
+        self.name = name
+
+        self._counters = {}
+        self._counters_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_sent = None  # monotonic time of the last heartbeat
+        self._thread = None
+        self.sent_count = 0
+
+    def start(self):
+        """Start the background thread (idempotent)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def update(self, **counters):
+        """Merge the latest workflow counters; they go out with the next heartbeat."""
+        with self._counters_lock:
+            self._counters.update(counters)
+
+    def send_now(self, **counters):
+        """Merge counters and send a heartbeat immediately (for state changes)."""
+        self.update(**counters)
+        return self._send()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Sleep until one interval has passed since the last heartbeat, including
+            # heartbeats forced by send_now(), so the cadence limit always holds.
+            # Jitter only ever lengthens the wait.
+            period = self.interval * (1 + self._random.uniform(0, self.jitter)) if self.jitter else self.interval
+            last_sent = self._last_sent
+            wait = period if last_sent is None else last_sent + period - time.monotonic()
+            if wait > 0:
+                if self._stop.wait(wait):
+                    return
+                if self._last_sent != last_sent:
+                    continue
+            self._send()
+
+    def _send(self):
+        with self._send_lock:
+            with self._counters_lock:
+                counters = dict(self._counters)
+            self._last_sent = time.monotonic()
+            try:
+                result = self.send_fn(counters)
+                self.sent_count += 1
+                return result
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Scheduled heartbeat failed: {e}")
+                return None
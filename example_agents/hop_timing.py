@@ -0,0 +1,88 @@
+"""
+Hop Timing: Per-hop timing trailer carried by workflow messages.
+
+Every message carries a 'timing' trailer: the wall-clock time its chain originated and
+one record per agent it passed through:
+
+    "timing": {"origin": 1754051400.12,
+               "hops": [{"agent": "daq-simulator", "sent": 1754051400.12},
+                        {"agent": "data-agent", "received": 1754051400.19, "sent": 1754051400.31}]}
+
+The originating agent calls stamp_origin() on its outgoing messages. A relaying agent
+calls mark_received() as soon as a message arrives and forward() when building the
+message it sends on. From the trailer, hop_intervals() derives transit time (broker and
+queueing) between hops and service time within each agent. Timestamps are wall-clock
+seconds, so cross-host intervals depend on synchronised clocks.
+
+Set SWF_HOP_TIMING=0 to stop adding trailers.
+"""
+
+import os
+import time
+
+TIMING_FIELD = 'timing'
+ENABLED = os.getenv('SWF_HOP_TIMING', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def stamp_origin(message, agent, now=None):
+    """Start a trailer on a message created by `agent` (keeps an existing one)."""
+    if not ENABLED or TIMING_FIELD in message:
+        return message
+    now = time.time() if now is None else now
+    message[TIMING_FIELD] = {'origin': now, 'hops': [{'agent': agent, 'sent': now}]}
+    return message
+
+
+def mark_received(message, agent, now=None):
+    """Record the arrival of an incoming message at `agent`."""
+    if not ENABLED:
+        return message
+    now = time.time() if now is None else now
+    timing = message.get(TIMING_FIELD)
+    if not isinstance(timing, dict):
+        # Sender did not stamp: the chain starts here
+        timing = message[TIMING_FIELD] = {'origin': now, 'hops': []}
+    timing.setdefault('hops', []).append({'agent': agent, 'received': now})
+    return message
+
+
+def forward(incoming, outgoing, now=None):
+    """Carry the incoming trailer onto an outgoing message and stamp this hop's send time."""
+    if not ENABLED:
+        return outgoing
+    timing = incoming.get(TIMING_FIELD)
+    if not isinstance(timing, dict) or not timing.get('hops'):
+        return outgoing
+    hops = [dict(hop) for hop in timing['hops']]
+    hops[-1]['sent'] = time.time() if now is None else now
+    outgoing[TIMING_FIELD] = {'origin': timing.get('origin'), 'hops': hops}
+    return outgoing
+
+
+def hop_intervals(message):
+    """
+    (label, seconds) pairs derived from a message's trailer.
+
+    'A->B' is the transit from A's send to B's receipt (broker and queueing delay),
+    'B' alone is the service time inside agent B, and 'total' runs from origin to the
+    last recorded timestamp.
+    """
+    timing = message.get(TIMING_FIELD)
+    if not isinstance(timing, dict):
+        return []
+    hops = timing.get('hops') or []
+    intervals = []
+    previous = None
+    last = timing.get('origin')
+    for hop in hops:
+        received, sent = hop.get('received'), hop.get('sent')
+        if previous is not None and received is not None and previous.get('sent') is not None:
+            intervals.append((f"{previous['agent']}->{hop['agent']}", received - previous['sent']))
+        if received is not None and sent is not None:
+            intervals.append((hop['agent'], sent - received))
+        last = sent if sent is not None else received if received is not None else last
+        previous = hop
+    origin = timing.get('origin')
+    if origin is not None and last is not None and hops:
+        intervals.append(('total', last - origin))
+    return intervals
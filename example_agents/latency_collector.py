@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Latency Collector: Per-hop latency report for the E0->E1 agent chain.
+
+Subscribes to workflow messages (via the monitor's SSE stream or directly via STOMP),
+reads the hop timing trailer every agent stamps on its messages and reports p50/p95/p99
+per hop:
+
+  daq-simulator->data-agent   transit: broker and queueing delay between two agents
+  data-agent                  service: time from receipt to send inside the agent
+  total (processing_complete) origin to the collector's receipt, per message type
+
+Per-STF timelines (one entry per message type seen for the file) can be written to a
+JSON file with --output.
+
+Examples:
+  python latency_collector.py --sse --duration 600
+  python latency_collector.py --stomp --destination epictopic --destination monitoring_agent --output latency.json
+
+Note that subscribing to a queue destination over STOMP competes with that queue's
+consumer; prefer topics or the SSE stream.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from hop_timing import hop_intervals, mark_received
+from sse_benchmark import percentile
+
+COLLECTOR_NAME = 'latency-collector'
+DEFAULT_MSG_TYPES = ['stf_gen', 'data_ready', 'processing_complete']
+
+
+class LatencyCollector:
+    """Aggregates hop intervals from received messages and keeps recent per-STF timelines."""
+
+    def __init__(self, window=100000, max_timelines=10000):
+        self.window = window
+        self.max_timelines = max_timelines
+        self._lock = threading.Lock()
+        self._intervals = {}  # label -> deque of seconds
+        self._timelines = OrderedDict()  # filename -> {msg_type: hop list}
+        self.messages = 0
+        self.without_timing = 0
+
+    def add(self, message):
+        if not isinstance(message.get('timing'), dict):
+            with self._lock:
+                self.messages += 1
+                self.without_timing += 1
+            return
+        mark_received(message, COLLECTOR_NAME)
+        # Earlier hops were already counted from the upstream messages (stf_gen, data_ready),
+        # so take only the hop into the sending agent, its service time and its transit here.
+        # The upstream agent's service time is in the same three-hop tail and is skipped.
+        timing = message['timing']
+        msg_type = message.get('msg_type', 'unknown')
+        tail = timing['hops'][-3:]
+        upstream = tail[0]['agent'] if len(tail) == 3 else None
+        intervals = [(f"total ({msg_type})" if label == 'total' else label, seconds)
+                     for label, seconds in hop_intervals({'timing': {'origin': timing.get('origin'),
+                                                                      'hops': tail}})
+                     if label != upstream]
+        with self._lock:
+            self.messages += 1
+            if len(intervals) <= 1:
+                self.without_timing += 1
+                return
+            for label, seconds in intervals:
+                self._intervals.setdefault(label, deque(maxlen=self.window)).append(seconds)
+            filename = message.get('filename')
+            if filename:
+                timeline = self._timelines.pop(filename, {})
+                timeline[msg_type] = timing['hops']
+                self._timelines[filename] = timeline
+                while len(self._timelines) > self.max_timelines:
+                    self._timelines.popitem(last=False)
+
+    def summary(self):
+        """Per-label count and p50/p95/p99/max in milliseconds."""
+        with self._lock:
+            snapshot = {label: sorted(values) for label, values in self._intervals.items()}
+        summary = {}
+        for label, values in snapshot.items():
+            summary[label] = {'count': len(values)}
+            for name, fraction in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99), ('max', 1.0)):
+                summary[label][name] = round(1000 * percentile(values, fraction), 2)
+        return summary
+
+    def timelines(self):
+        with self._lock:
+            return dict(self._timelines)
+
+    def format_report(self):
+        summary = self.summary()
+        lines = [f"{'hop':<45} {'count':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}"]
+        # Transit hops first, then agent service times, then the end-to-end total
+        order = sorted(summary, key=lambda label: (label.startswith('total'), '->' not in label, label))
+        for label in order:
+            s = summary[label]
+            lines.append(f"{label:<45} {s['count']:>8} {s['p50']:>10} {s['p95']:>10} {s['p99']:>10} {s['max']:>10}")
+        lines.append(f"messages: {self.messages} (without timing trailer: {self.without_timing})")
+        return "\n".join(lines)
+
+
+def collect_sse(collector, msg_types, stop):
+    """Feed messages from the monitor's SSE stream until stop is set."""
+    from swf_testbed_cli.monitor_client import MonitorClient
+    from sse_stream import ReconnectBackoff, SSEDecoder, build_stream_url, iter_sse_events
+
+    monitor_base = (os.getenv('SWF_MONITOR_PROD_URL') or os.getenv('SWF_MONITOR_URL', 'https://localhost:8443')).rstrip('/')
+    monitor = MonitorClient.from_env(monitor_url=monitor_base, api_token=os.getenv('SWF_API_TOKEN'))
+    monitor.session.headers.update({'Accept': 'text/event-stream', 'Cache-Control': 'no-cache'})
+    url = build_stream_url(monitor_base, msg_types)
+    backoff = ReconnectBackoff()
+    decoder = SSEDecoder()
+    print(f"Collecting from SSE stream {url}")
+    while not stop.is_set():
+        headers = {'Last-Event-ID': decoder.last_event_id} if decoder.last_event_id else None
+        try:
+            response = monitor.session.get(url, stream=True, timeout=(10, 3600), allow_redirects=False, headers=headers)
+            if response.status_code == 200:
+                backoff.reset()
+                for event in iter_sse_events(response, decoder):
+                    if stop.is_set():
+                        break
+                    if event.event in ('connected', 'heartbeat'):
+                        continue
+                    try:
+                        message = json.loads(event.data)
+                    except ValueError:
+                        continue
+                    if isinstance(message, dict):
+                        collector.add(message)
+            else:
+                print(f"SSE stream request failed: HTTP {response.status_code}")
+            response.close()
+        except Exception as e:
+            print(f"SSE connection error: {e}")
+        backoff.hint(decoder.retry)
+        stop.wait(backoff.next_delay())
+
+
+def collect_stomp(collector, destinations, stop):
+    """Feed messages from STOMP destinations until stop is set."""
+    import stomp
+    from stomp_publisher import mq_settings_from_env, open_stomp_connection
+
+    class Listener(stomp.ConnectionListener):
+        def on_message(self, frame):
+            try:
+                message = json.loads(frame.body)
+            except ValueError:
+                return
+            if isinstance(message, dict):
+                collector.add(message)
+
+    conn = open_stomp_connection(mq_settings_from_env(), client_id=f"{COLLECTOR_NAME}-{os.getpid()}")
+    conn.set_listener('latency', Listener())
+    for index, destination in enumerate(destinations):
+        conn.subscribe(destination=destination, id=index + 1, ack='auto')
+        print(f"Collecting from STOMP destination {destination}")
+    try:
+        stop.wait()
+    finally:
+        conn.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-hop latency of workflow messages",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--sse', action='store_true', help="Subscribe to the monitor's SSE stream")
+    source.add_argument('--stomp', action='store_true', help='Subscribe to ActiveMQ destinations directly')
+    parser.add_argument('--message', dest='msg_types', default=','.join(DEFAULT_MSG_TYPES),
+                        help=f"SSE message types, comma-separated (default {','.join(DEFAULT_MSG_TYPES)})")
+    parser.add_argument('--destination', action='append',
+                        help='STOMP destination (repeatable, default epictopic)')
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds (default: until Ctrl+C)')
+    parser.add_argument('--interval', type=float, default=30.0, help='Seconds between reports (default 30)')
+    parser.add_argument('--output', help='Write the final summary and per-STF timelines to this JSON file')
+    args = parser.parse_args()
+
+    collector = LatencyCollector()
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    if args.sse:
+        msg_types = [t.strip() for t in args.msg_types.split(',') if t.strip()]
+        target, target_args = collect_sse, (collector, msg_types, stop)
+    else:
+        target, target_args = collect_stomp, (collector, args.destination or ['epictopic'], stop)
+    thread = threading.Thread(target=target, args=target_args, name='latency-collector', daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + args.duration if args.duration else None
+    while not stop.is_set() and thread.is_alive():
+        timeout = args.interval if deadline is None else min(args.interval, max(0.0, deadline - time.monotonic()))
+        if not stop.wait(timeout):
+            print(collector.format_report(), flush=True)
+        if deadline is not None and time.monotonic() >= deadline:
+            stop.set()
+
+    print(collector.format_report())
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': collector.summary(), 'timelines': collector.timelines()}, f, indent=2)
+        print(f"Wrote {args.output}")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+Local Transport: In-process stand-ins for ActiveMQ and the monitor REST API.
+
+LocalBroker is a message bus with STOMP-like destinations. Topics (by default
+'epictopic') deliver every message to all subscribers; any other destination is a
+queue that hands each message to one subscriber in turn and keeps messages until a
+subscriber exists. One delivery thread delivers messages in the order they were sent,
+so a run is reproducible. LocalConnection gives agents and the DAQ simulator the subset
+of the stomp.py Connection API they use.
+
+LocalMonitorAPI keeps runs, STF files, workflow stages, agent heartbeats and run numbers
+in memory. It offers the MonitorClient interface (call_api, bulk_create, session) so it
+can be passed anywhere a MonitorClient is used.
+
+create_local_agent() builds an agent on both, passing them as its connection= and
+monitor= (see agent_transport.py), so it never contacts ActiveMQ or the monitor. That makes it possible to run and profile the whole
+DAQ -> data -> processing chain in one process (see run_local_workflow.py).
+"""
+
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlparse
+
+DEFAULT_TOPICS = ('epictopic',)
+
+
+def _normalize(destination):
+    """'/topic/epictopic', '/queue/epictopic' and 'epictopic' all name the same destination."""
+    for prefix in ('/topic/', '/queue/'):
+        if destination.startswith(prefix):
+            return destination[len(prefix):]
+    return destination
+
+
+class LocalFrame:
+    """Message frame as seen by listeners (body and headers, like a stomp.py Frame)."""
+
+    __slots__ = ('body', 'headers')
+
+    def __init__(self, body, headers):
+        self.body = body
+        self.headers = headers
+
+
+class LocalBroker:
+    """In-process message bus with topic fan-out and queue round-robin."""
+
+    def __init__(self, topics=DEFAULT_TOPICS, logger=None):
+        self.topics = set(topics)
+        self.logger = logger or logging.getLogger('local-broker')
+        self._subscribers = {}  # destination -> list of listeners
+        self._round_robin = {}  # queue destination -> index of the next listener
+        self._retained = {}  # queue destination -> frames waiting for a subscriber
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._thread = None
+        self._stop = False
+        self._message_ids = itertools.count(1)
+        self.stats = {'sent': 0, 'delivered': 0, 'dropped': 0, 'failed': 0}
+        self.per_destination = {}
+
+    def is_topic(self, destination):
+        return _normalize(destination) in self.topics
+
+    def subscribe(self, destination, listener):
+        """Register a listener (anything with on_message(frame)) and release retained queue messages."""
+        destination = _normalize(destination)
+        with self._cond:
+            listeners = self._subscribers.setdefault(destination, [])
+            listeners.append(listener)
+            self._round_robin[destination] = 0
+            retained = self._retained.pop(destination, None)
+            if retained:
+                # Retained messages were sent before anything still pending: deliver them first
+                self._pending.extendleft((destination, frame) for frame in reversed(retained))
+                self._cond.notify_all()
+
+    def unsubscribe(self, destination, listener):
+        destination = _normalize(destination)
+        with self._cond:
+            listeners = self._subscribers.get(destination, [])
+            if listener in listeners:
+                listeners.remove(listener)
+
+    def send(self, destination, body, headers=None):
+        """Accept a message for delivery (thread-safe, never blocks on consumers)."""
+        destination = _normalize(destination)
+        frame_headers = dict(headers or {})
+        frame_headers.update({'destination': destination, 'message-id': str(next(self._message_ids))})
+        with self._cond:
+            self.stats['sent'] += 1
+            self.per_destination[destination] = self.per_destination.get(destination, 0) + 1
+            self._pending.append((destination, LocalFrame(body, frame_headers)))
+            self._cond.notify_all()
+
+    def start(self):
+        """Deliver messages from a background thread (the usual mode)."""
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name='local-broker', daemon=True)
+            self._thread.start()
+        return self
+
+    def pump(self):
+        """Deliver everything pending on the calling thread (when no delivery thread runs); returns the count."""
+        delivered = 0
+        while True:
+            with self._cond:
+                if not self._pending:
+                    return delivered
+                destination, frame = self._pending.popleft()
+            self._deliver(destination, frame)
+            delivered += 1
+
+    def join(self, timeout=None):
+        """Wait until no message is pending or being delivered; returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self, timeout=10.0):
+        """Stop delivering. With a delivery thread, pending messages are delivered first
+        (up to timeout); without one they are discarded (call pump() first to deliver them)."""
+        if self._thread is not None:
+            self.join(timeout)
+        with self._cond:
+            if self._thread is None:
+                self._pending.clear()
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stop)
+                if self._stop and not self._pending:
+                    return
+                destination, frame = self._pending.popleft()
+                self._busy = True
+            try:
+                self._deliver(destination, frame)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _deliver(self, destination, frame):
+        with self._cond:
+            listeners = list(self._subscribers.get(destination, ()))
+            if not listeners:
+                if destination in self.topics:
+                    self.stats['dropped'] += 1  # Nobody subscribed to the topic: the message is gone
+                else:
+                    self._retained.setdefault(destination, deque()).append(frame)
+                return
+            if destination not in self.topics:
+                index = self._round_robin[destination] % len(listeners)
+                self._round_robin[destination] = index + 1
+                listeners = [listeners[index]]
+        for listener in listeners:
+            try:
+                listener.on_message(frame)
+                self.stats['delivered'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                self.logger.error(f"Listener failed on '{destination}' message {frame.headers['message-id']}: {e}")
+
+
+class LocalConnection:
+    """The part of stomp.py's Connection API used by the agents, backed by a LocalBroker."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._connected = False
+        self._listeners = {}
+        self._subscriptions = {}
+
+    def connect(self, *args, **kwargs):
+        self._connected = True
+
+    def is_connected(self):
+        return self._connected
+
+    def disconnect(self, *args, **kwargs):
+        for destination, listener in self._subscriptions.values():
+            self.broker.unsubscribe(destination, listener)
+        self._subscriptions.clear()
+        self._connected = False
+
+    def set_listener(self, name, listener):
+        self._listeners[name] = listener
+
+    def send(self, destination, body, headers=None, **kwargs):
+        if not self._connected:
+            raise ConnectionError("Local connection is not connected")
+        self.broker.send(destination, body, headers)
+
+    def subscribe(self, destination, id, ack='auto', headers=None, **kwargs):
+        listener = _FanOut(self._listeners)
+        self._subscriptions[id] = (destination, listener)
+        self.broker.subscribe(destination, listener)
+
+    def unsubscribe(self, id, **kwargs):
+        destination, listener = self._subscriptions.pop(id)
+        self.broker.unsubscribe(destination, listener)
+
+
+class _FanOut:
+    """Passes a frame to every listener registered on a LocalConnection."""
+
+    def __init__(self, listeners):
+        self.listeners = listeners
+
+    def on_message(self, frame):
+        for listener in list(self.listeners.values()):
+            listener.on_message(frame)
+
+
+class LocalResponse:
+    """Minimal requests.Response look-alike returned by LocalMonitorAPI.session."""
+
+    def __init__(self, status_code, data=None, url=''):
+        self.status_code = status_code
+        self.url = url
+        self._data = data
+        self.content = b'' if data is None else json.dumps(data).encode()
+        self.text = self.content.decode()
+        self.headers = {'Content-Type': 'application/json'}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise RuntimeError(f"{self.status_code} {kind} Error for url: {self.url}")
+
+
+class _LocalSession:
+    """requests.Session-style front end routing '/api/...' URLs to a LocalMonitorAPI."""
+
+    def __init__(self, api):
+        self.api = api
+        self.headers = {}
+
+    def request(self, method, url, json=None, **kwargs):
+        path = urlparse(url).path
+        marker = path.find('/api/')
+        endpoint = path[marker + len('/api'):] if marker >= 0 else path
+        status, data = self.api.handle(method.upper(), endpoint, json)
+        return LocalResponse(status, data, url)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def close(self):
+        pass
+
+
+class LocalMonitorAPI:
+    """In-memory stand-in for the swf-monitor REST API with the MonitorClient interface."""
+
+    # Collections whose records are created by POST and updated by PATCH, with their id field
+    COLLECTIONS = {'runs': 'run_id', 'stf-files': 'file_id', 'workflow-stages': 'stage_id'}
+
+    def __init__(self, first_run_number=100000):
+        self.monitor_url = 'local://monitor'
+        self.api_prefix = '/api'
+        self.bulk = False
+        self.bulk_size = 200
+        self.session = _LocalSession(self)
+        self.records = {name: {} for name in self.COLLECTIONS}
+        self.agents = {}  # instance_name -> last heartbeat payload
+        self.requests = {}  # 'METHOD /collection/' -> count
+        self._ids = itertools.count(1)
+        self._run_numbers = itertools.count(first_run_number)
+        self._lock = threading.Lock()
+
+    def handle(self, method, endpoint, data=None):
+        """Serve one API call; returns (status_code, response data)."""
+        parts = [p for p in endpoint.strip('/').split('/') if p]
+        with self._lock:
+            key = f"{method} /{parts[0] if parts else ''}/"
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            if parts == ['state', 'next-run-number'] and method == 'POST':
+                count = int((data or {}).get('count', 1))
+                numbers = [next(self._run_numbers) for _ in range(count)]
+                return 200, {'status': 'success', 'run_number': numbers[0], 'run_numbers': numbers}
+            if parts[:1] == ['systemagents'] and method == 'POST':
+                payload = dict(data or {})
+                payload['last_heartbeat'] = datetime.now().isoformat()
+                self.agents[payload.get('instance_name', 'unknown')] = payload
+                return 200, payload
+
+            if not parts or parts[0] not in self.COLLECTIONS:
+                return 404, {'detail': f"Unknown endpoint {endpoint}"}
+            collection, id_field = parts[0], self.COLLECTIONS[parts[0]]
+            records = self.records[collection]
+
+            if len(parts) == 1 and method == 'POST':
+                return 201, self._create(records, id_field, data)
+            if len(parts) == 2 and parts[1] == 'bulk' and method == 'POST':
+                return 201, [self._create(records, id_field, item) for item in (data or [])]
+            if len(parts) == 1 and method == 'GET':
+                return 200, list(records.values())
+            if len(parts) == 2:
+                record = records.get(parts[1])
+                if record is None:
+                    return 404, {'detail': 'Not found.'}
+                if method in ('PATCH', 'PUT'):
+                    record.update(data or {})
+                return 200, record
+            return 405, {'detail': f"Method {method} not allowed"}
+
+    def _create(self, records, id_field, data):
+        record = dict(data or {})
+        record[id_field] = next(self._ids)
+        records[str(record[id_field])] = record
+        return record
+
+    # MonitorClient interface
+    def url(self, path):
+        return f"{self.monitor_url}{path}"
+
+    def call_api(self, method, endpoint, data=None):
+        status, result = self.handle(method.upper(), endpoint, data)
+        if status >= 400:
+            kind = 'Client' if status < 500 else 'Server'
+            raise RuntimeError(f"Monitor API call {method} {endpoint} failed: {status} {kind} Error: {result}")
+        return result
+
+    def bulk_create(self, endpoint, records):
+        return [self.call_api('POST', endpoint, record) for record in records]
+
+    def close(self):
+        pass
+
+
+def create_local_agent(agent_class, broker, monitor, *args, **kwargs):
+    """Instantiate an agent on the local broker and monitor and subscribe it to its queue."""
+    agent = agent_class(*args, connection=LocalConnection(broker), monitor=monitor, **kwargs)
+    agent.conn.connect()
+    agent.conn.subscribe(destination=agent.subscription_queue, id=1, ack='auto')
+    return agent
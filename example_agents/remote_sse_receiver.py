@@ -19,10 +19,19 @@ import time
 import json
 import signal
 import argparse
+import asyncio
+import atexit
 from pathlib import Path
 
 import requests
 from swf_common_lib.base_agent import BaseAgent
+from swf_testbed_cli.monitor_client import MonitorClient
+
+from sse_benchmark import BENCH_MSG_TYPE, BenchmarkTracker
+from sse_dispatch import EventDispatcher, JsonLinesSink
+from sse_filter import EventFilter
+from sse_multiplexer import SSEMultiplexer
+from sse_stream import ReconnectBackoff, SSEDecoder, build_stream_url, iter_sse_events
 
 # Canonical production base URL (can be overridden by SWF_MONITOR_PROD_URL)
 DEFAULT_MONITOR_BASE = "https://pandaserver02.sdcc.bnl.gov/swf-monitor"
@@ -45,7 +54,7 @@ def setup_environment() -> None:
 class RemoteSSEReceiver(BaseAgent):
     """Production-only SSE client for swf-monitor that registers as an agent."""
 
-    def __init__(self, msg_types=None, agents=None) -> None:
+    def __init__(self, msg_types=None, agents=None, dispatcher=None, print_messages=True, event_filter=None) -> None:
         setup_environment()
 
         # Production monitor base URL (env override, otherwise production default)
@@ -71,16 +80,31 @@ class RemoteSSEReceiver(BaseAgent):
         self.msg_types = msg_types
         self.agents = agents
 
+        # Resume state: the last event ID seen is sent as Last-Event-ID on reconnect
+        self.last_event_id = None
+        self.backoff = ReconnectBackoff(
+            initial=float(os.getenv('SWF_SSE_RECONNECT_INITIAL', '0.25')),
+            maximum=float(os.getenv('SWF_SSE_RECONNECT_MAX', '30'))
+        )
+
+        # Client-side filter on the raw event text; only matching events are JSON-decoded
+        self.event_filter = event_filter if event_filter is not None and event_filter.active else None
+
+        # Received messages are routed by msg_type; printing to stdout is just one handler
+        self.dispatcher = dispatcher or EventDispatcher(logger=self.logger)
+        if print_messages:
+            self.dispatcher.register(self._print_message, name='console')
+
         # HTTP session: production defaults (verify=True, env proxies honored)
-        self.session = requests.Session()
+        self.monitor = MonitorClient.from_env(monitor_url=monitor_base, api_token=self.api_token, verify=True)
+        self.session = self.monitor.session
         self.session.headers.update({
-            'Authorization': f'Token {self.api_token}',
             'Cache-Control': 'no-cache',
             'Accept': 'text/event-stream',
-            'Connection': 'keep-alive',
         })
 
-        # Simple shutdown - just exit immediately
+        # Exit by raising SystemExit in the main thread, so main() still closes the dispatcher
+        # and queued sink events are written out
         signal.signal(signal.SIGINT, lambda signum, frame: sys.exit(0))
         signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
@@ -95,44 +119,24 @@ class RemoteSSEReceiver(BaseAgent):
     def connect_and_receive(self) -> None:
         """Connect to SSE stream and process messages in a loop."""
         # Build stream URL with filters
-        stream_url = f"{self.monitor_base}/api/messages/stream/"
-        params = []
-        if self.msg_types:
-            params.append(f"msg_types={','.join(self.msg_types)}")
-        if self.agents:
-            params.append(f"agents={','.join(self.agents)}")
-        if params:
-            stream_url += "?" + "&".join(params)
+        stream_url = build_stream_url(self.monitor_base, self.msg_types, self.agents)
         status_url = f"{self.monitor_base}/api/messages/stream/status/"
         print(f"📡 Connecting to SSE stream: {stream_url}")
 
+        # The status precheck only runs for the first connection and after failed attempts;
+        # a stream that dropped after opening fine is reopened straight away.
+        precheck = True
         while True:
             try:
-                # Status precheck
-                print("🔌 Testing SSE endpoint...")
-                # Do not follow redirects; 302 likely indicates auth not reaching Django
-                # The status endpoint is a regular DRF endpoint, not an SSE stream, so override Accept header
-                status_resp = self.session.get(status_url, timeout=20, allow_redirects=False, headers={'Accept': 'application/json'})
-                if status_resp.status_code != 200:
-                    if status_resp.status_code in (401, 403):
-                        print(f"❌ Auth failed (HTTP {status_resp.status_code}). Check SWF_API_TOKEN (token may be missing/invalid).")
-                        www = status_resp.headers.get('WWW-Authenticate')
-                        if www:
-                            print(f"   WWW-Authenticate: {www}")
-                        print("   If running via Apache, ensure 'WSGIPassAuthorization On' is enabled so the Authorization header reaches Django.")
-                    elif 300 <= status_resp.status_code < 400:
-                        loc = status_resp.headers.get('Location', 'unknown')
-                        print(f"❌ Got redirect (HTTP {status_resp.status_code}) to {loc}. This usually means Authorization isn't being passed through.")
-                        print("   Enable 'WSGIPassAuthorization On' in Apache for the /swf-monitor app and reload Apache.")
-                    else:
-                        print(f"❌ SSE endpoint not available: HTTP {status_resp.status_code}")
-                    print("   Retrying in 15 seconds...")
-                    time.sleep(15)
+                if precheck and not self._check_stream_status(status_url):
+                    self._wait_before_reconnect("Retrying")
                     continue
 
                 # Open the SSE stream (blocks quietly while waiting for events)
                 # Do not follow redirects; treat as auth failure
-                response = self.session.get(stream_url, stream=True, timeout=(10, 3600), allow_redirects=False)
+                headers = {'Last-Event-ID': self.last_event_id} if self.last_event_id else None
+                response = self.session.get(stream_url, stream=True, timeout=(10, 3600),
+                                            allow_redirects=False, headers=headers)
                 if response.status_code != 200:
                     if response.status_code in (401, 403):
                         print(f"❌ Auth failed opening stream (HTTP {response.status_code}). Check SWF_API_TOKEN.")
@@ -151,11 +155,16 @@ class RemoteSSEReceiver(BaseAgent):
                             print(f"     {key}: {value}")
                         print("   Response Body:")
                         print(f"     {response.text}")
-                    print("   Retrying in 15 seconds...")
-                    time.sleep(15)
+                    precheck = True
+                    self._wait_before_reconnect("Retrying")
                     continue
 
-                print("✅ SSE stream opened - waiting for events... (Ctrl+C to exit)")
+                if self.last_event_id:
+                    print(f"✅ SSE stream reopened - resuming after event {self.last_event_id}")
+                else:
+                    print("✅ SSE stream opened - waiting for events... (Ctrl+C to exit)")
+                self.backoff.reset()
+                precheck = False
                 
                 # Register this SSE receiver as an active agent
                 self.send_heartbeat()
@@ -163,51 +172,95 @@ class RemoteSSEReceiver(BaseAgent):
                 print("-" * 60)
                 # streaming until broken or stopped
                 self._process_sse_stream(response)
+                self._wait_before_reconnect("Stream closed, reconnecting")
 
             except requests.exceptions.ReadTimeout as e:
                 print(f"⏱️  Read timeout while waiting for messages: {e}")
-                print("   Reconnecting in 15 seconds...")
-                time.sleep(15)
+                self._wait_before_reconnect("Reconnecting")
             except requests.exceptions.RequestException as e:
                 print(f"❌ Connection error: {e}")
-                print("   Retrying in 15 seconds...")
-                time.sleep(15)
+                precheck = True
+                self._wait_before_reconnect("Retrying")
             except Exception as e:
                 print(f"❌ Unexpected error: {e}")
-                time.sleep(15)
+                precheck = True
+                self._wait_before_reconnect("Retrying")
+
+    def _check_stream_status(self, status_url) -> bool:
+        """Status precheck: explains auth and proxy problems before opening the stream."""
+        print("🔌 Testing SSE endpoint...")
+        # Do not follow redirects; 302 likely indicates auth not reaching Django
+        # The status endpoint is a regular DRF endpoint, not an SSE stream, so override Accept header
+        status_resp = self.session.get(status_url, timeout=20, allow_redirects=False, headers={'Accept': 'application/json'})
+        if status_resp.status_code == 200:
+            return True
+        if status_resp.status_code in (401, 403):
+            print(f"❌ Auth failed (HTTP {status_resp.status_code}). Check SWF_API_TOKEN (token may be missing/invalid).")
+            www = status_resp.headers.get('WWW-Authenticate')
+            if www:
+                print(f"   WWW-Authenticate: {www}")
+            print("   If running via Apache, ensure 'WSGIPassAuthorization On' is enabled so the Authorization header reaches Django.")
+        elif 300 <= status_resp.status_code < 400:
+            loc = status_resp.headers.get('Location', 'unknown')
+            print(f"❌ Got redirect (HTTP {status_resp.status_code}) to {loc}. This usually means Authorization isn't being passed through.")
+            print("   Enable 'WSGIPassAuthorization On' in Apache for the /swf-monitor app and reload Apache.")
+        else:
+            print(f"❌ SSE endpoint not available: HTTP {status_resp.status_code}")
+        return False
+
+    def _wait_before_reconnect(self, action) -> None:
+        delay = self.backoff.next_delay()
+        print(f"   {action} in {delay:.2f} seconds...")
+        time.sleep(delay)
 
 
     def _process_sse_stream(self, response) -> None:
-        event_buffer = []
+        # Large reads into the decoder's buffer; events are split out incrementally
+        decoder = SSEDecoder(last_event_id=self.last_event_id)
         try:
-            for line in response.iter_lines(decode_unicode=True, chunk_size=1):
-                if line is None:
-                    continue
-                line = line.strip()
-                if not line:
-                    if event_buffer:
-                        self._handle_sse_event(event_buffer)
-                        event_buffer = []
-                else:
-                    event_buffer.append(line)
+            for event in iter_sse_events(response, decoder):
+                self.last_event_id = decoder.last_event_id
+                self._handle_sse_event(event)
         except KeyboardInterrupt:
             print("\n📡 Received interrupt - closing connection...")
         except Exception as e:
             print(f"❌ Error processing stream: {e}")
         finally:
+            # Keep the resume point and the server's retry: hint for the next connection
+            self.last_event_id = decoder.last_event_id
+            self.backoff.hint(decoder.retry)
             try:
                 response.close()
             except Exception:
                 pass
 
-    def _handle_sse_event(self, event_lines) -> None:
-        event_type = "message"
-        event_data = ""
-        for line in event_lines:
-            if line.startswith('event: '):
-                event_type = line[7:]
-            elif line.startswith('data: '):
-                event_data = line[6:]
+    def receive_multiplexed(self, subscriptions) -> None:
+        """Run several filtered subscriptions, given as (name, msg_types, agents), in one event loop."""
+        multiplexer = SSEMultiplexer(
+            self.monitor_base,
+            api_token=self.api_token,
+            verify=os.getenv('REQUESTS_CA_BUNDLE') or True,
+            heartbeat_fn=self.send_heartbeat,
+            heartbeat_interval=float(os.getenv('SWF_HEARTBEAT_INTERVAL', '30')),
+            reconnect_initial=self.backoff.initial,
+            reconnect_max=self.backoff.maximum,
+            logger=self.logger
+        )
+        for name, msg_types, agents in subscriptions:
+            multiplexer.subscribe(name, lambda event, sub: self._handle_sse_event(event, label=sub.name),
+                                  msg_types=msg_types, agents=agents)
+            print(f"📡 Subscription '{name}': {build_stream_url(self.monitor_base, msg_types, agents)}")
+        print("✅ Multiplexed SSE client running... (Ctrl+C to exit)")
+        asyncio.run(multiplexer.run())
+
+    def close(self) -> None:
+        """Let queued handlers (e.g. the --sink-file sink) finish, then release the HTTP session."""
+        self.dispatcher.close()
+        self.monitor.close()
+
+    def _handle_sse_event(self, event, label=None) -> None:
+        event_type = event.event
+        event_data = event.data
 
         timestamp = time.strftime("%H:%M:%S")
         if event_type == "connected":
@@ -221,25 +274,24 @@ class RemoteSSEReceiver(BaseAgent):
         elif event_type == "heartbeat":
             # Stay quiet on heartbeats to avoid log spam
             return
-        else:
-            try:
-                data = json.loads(event_data)
-                msg_type = data.get('msg_type', 'unknown')
-                processed_by = data.get('processed_by', 'unknown')
-                run_id = data.get('run_id', 'N/A')
-                print(f"[{timestamp}] 📨 Message received:")
-                print(f"         Message: {msg_type}")
-                print(f"           Agent: {processed_by}")
-                print(f"            Run:  {run_id}")
-                if 'message' in data:
-                    print(f"            Text: {data['message']}")
-                if 'filename' in data:
-                    print(f"            File: {data['filename']}")
-                print("-" * 60)
-            except json.JSONDecodeError:
-                print(f"[{timestamp}] 📨 Non-JSON message: {event_data}")
-            except Exception as e:
-                print(f"[{timestamp}] ❌ Error parsing message: {e}")
+        elif self.event_filter is not None and not self.event_filter.match(event_data):
+            return
+        elif not self.dispatcher.dispatch(event, source=label):
+            print(f"[{timestamp}] 📨 Non-JSON message: {event_data}")
+
+    def _print_message(self, data, event, source) -> None:
+        lines = [
+            f"[{time.strftime('%H:%M:%S')}] 📨 Message received{f' ({source})' if source else ''}:",
+            f"         Message: {data.get('msg_type', 'unknown')}",
+            f"           Agent: {data.get('processed_by', 'unknown')}",
+            f"            Run:  {data.get('run_id', 'N/A')}",
+        ]
+        if 'message' in data:
+            lines.append(f"            Text: {data['message']}")
+        if 'filename' in data:
+            lines.append(f"            File: {data['filename']}")
+        lines.append("-" * 60)
+        print("\n".join(lines))
 
 
 def main() -> None:
@@ -252,11 +304,17 @@ Examples:
   python remote_sse_receiver.py --message stf_gen         # Only STF generation messages
   python remote_sse_receiver.py --agent daq-simulator     # Only messages from daq-simulator
   python remote_sse_receiver.py --message stf_gen,data_ready --agent daq-simulator
+  python remote_sse_receiver.py --message stf_gen --run 1001 --sample stf_gen:10  # Every 10th STF of run 1001
+
+  # Several filtered streams in one process (asyncio, requires aiohttp)
+  python remote_sse_receiver.py --subscribe stf_gen@daq-simulator --subscribe data_ready,processing_complete
 
 Environment variables:
   SWF_SSE_RECEIVER_NAME - Required: descriptive agent name
   SWF_API_TOKEN         - Required: monitor API token
   SWF_MONITOR_PROD_URL  - Optional: override monitor URL
+  SWF_SSE_RECONNECT_INITIAL - Optional: first reconnect delay in seconds (default 0.25)
+  SWF_SSE_RECONNECT_MAX     - Optional: reconnect delay cap in seconds (default 30)
         """)
     
     parser.add_argument('--message', '--msg-type', dest='msg_types',
@@ -264,6 +322,24 @@ Environment variables:
     parser.add_argument('--agent', dest='agents', 
                         help='Filter by agent name(s), comma-separated (e.g., daq-simulator,data-agent)')
     
+    parser.add_argument('--subscribe', dest='subscriptions', action='append', metavar='MSG_TYPES[@AGENTS]',
+                        help='Add a multiplexed subscription (repeatable), e.g. stf_gen,data_ready@daq-simulator; '
+                             'any --subscribe switches to the asyncio client')
+    
+    parser.add_argument('--run', dest='run_ids',
+                        help='Client-side filter: run ID(s), comma-separated; a trailing * matches a prefix (e.g., 1001,20*)')
+    parser.add_argument('--file-pattern',
+                        help="Client-side filter: STF filename glob (e.g., 'swf.20250801*.stf')")
+    parser.add_argument('--sample', action='append', metavar='MSG_TYPE:N',
+                        help='Keep only 1 in N messages of MSG_TYPE (repeatable, e.g., stf_gen:10)')
+    parser.add_argument('--sink-file', metavar='PATH',
+                        help='Append every received message to PATH as JSON lines (written from its own worker thread)')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Do not print received messages')
+    parser.add_argument('--bench', action='store_true',
+                        help=f'Track {BENCH_MSG_TYPE} messages from remote_sse_sender.py --bench (rate, loss, delay) '
+                             'instead of printing messages')
+    
     args = parser.parse_args()
     
     # Parse comma-separated values
@@ -275,8 +351,44 @@ Environment variables:
     if args.agents:
         agents = [a.strip() for a in args.agents.split(',')]
     
+    subscriptions = []
+    for spec in args.subscriptions or []:
+        types_part, _, agents_part = spec.partition('@')
+        subscriptions.append((
+            spec,
+            [t.strip() for t in types_part.split(',') if t.strip()] or None,
+            [a.strip() for a in agents_part.split(',') if a.strip()] or None,
+        ))
+    
+    sample = {}
+    for spec in args.sample or []:
+        msg_type, _, every = spec.partition(':')
+        if not every.isdigit() or int(every) < 1:
+            parser.error(f"--sample expects MSG_TYPE:N with a positive N, got '{spec}'")
+        sample[msg_type.strip()] = int(every)
+    event_filter = EventFilter(
+        msg_types=msg_types,
+        run_ids=[r.strip() for r in args.run_ids.split(',')] if args.run_ids else None,
+        filename_pattern=args.file_pattern,
+        sample=sample
+    )
+    
+    receiver = None
     try:
-        receiver = RemoteSSEReceiver(msg_types=msg_types, agents=agents)
+        receiver = RemoteSSEReceiver(msg_types=msg_types, agents=agents,
+                                     print_messages=not (args.quiet or args.bench), event_filter=event_filter)
+        if args.bench:
+            tracker = BenchmarkTracker()
+            receiver.dispatcher.register(tracker, msg_types=[BENCH_MSG_TYPE], name='benchmark',
+                                         queue_size=int(os.getenv('SWF_SSE_HANDLER_QUEUE', '10000')))
+            atexit.register(lambda: print(tracker.format_summary()))
+        if args.sink_file:
+            receiver.dispatcher.register(JsonLinesSink(args.sink_file), name='file-sink',
+                                         queue_size=int(os.getenv('SWF_SSE_HANDLER_QUEUE', '10000')))
+            print(f"💾 Writing received messages to {args.sink_file}")
+        if subscriptions:
+            receiver.receive_multiplexed(subscriptions)
+            return
         if msg_types or agents:
             filters = []
             if msg_types:
@@ -294,6 +406,9 @@ Environment variables:
     except Exception as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
+    finally:
+        if receiver is not None:
+            receiver.close()
 
 
 if __name__ == "__main__":
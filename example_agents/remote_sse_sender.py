@@ -5,6 +5,10 @@ Remote SSE Sender: Sends test messages through ActiveMQ that will be relayed to
 This script demonstrates sending workflow messages that the monitor will broadcast
 to connected SSE clients. It inherits from BaseAgent to use standard logging and
 ActiveMQ connectivity.
+
+With --bench it instead generates synthetic messages at a target rate (or as fast as
+possible) from several publisher threads, each with its own connection, to measure
+relay throughput and loss together with `remote_sse_receiver.py --bench`.
 """
 
 from swf_common_lib.base_agent import BaseAgent
@@ -12,6 +16,12 @@ import os
 import json
 import time
 import sys
+import argparse
+import threading
+
+from sse_benchmark import BENCH_MSG_TYPE, make_bench_message
+from stf_payload import parse_size
+from stomp_publisher import mq_settings_from_env, open_stomp_connection
 
 class RemoteSSESender(BaseAgent):
     """
@@ -119,11 +129,120 @@ class RemoteSSESender(BaseAgent):
                 except Exception as e:
                     self.logger.error(f"Error during disconnect: {e}")
 
+    def run_benchmark(self, rate=0.0, duration=60.0, count=None, payload_bytes=0, publishers=1,
+                      destination='epictopic', msg_type=BENCH_MSG_TYPE):
+        """
+        Send synthetic messages from `publishers` threads, each on its own connection.
+
+        rate is the total target in messages/second, split evenly across publishers;
+        0 sends open-loop as fast as possible. Stops after `duration` seconds or after
+        `count` messages per publisher, whichever comes first.
+        """
+        bench_id = f"{self.agent_name}-{int(time.time())}"
+        run_id = f"bench-{bench_id}"
+        padding = 'x' * payload_bytes
+        settings = mq_settings_from_env()
+        per_publisher_rate = rate / publishers if rate > 0 else 0.0
+        results = [None] * publishers
+        self.logger.info(f"Benchmark {bench_id}: {publishers} publishers, "
+                         f"{'open-loop' if not rate else f'{rate} msg/s'}, {payload_bytes} B payload, "
+                         f"{duration}s" + (f", {count} msgs each" if count else ""))
+
+        def connect(index):
+            return open_stomp_connection(settings, client_id=f"{self.agent_name}-bench-{index}",
+                                         heart_beat='10000,30000', logger=self.logger)
+
+        def publish(index):
+            conn = None
+            sent = failures = 0
+            error = None
+            start = time.monotonic()
+            try:
+                conn = connect(index)
+                start = time.monotonic()
+                deadline = start + duration
+                while time.monotonic() < deadline and (count is None or sent < count):
+                    if per_publisher_rate:
+                        # Absolute schedule: a slow send does not shift later sends
+                        delay = start + sent / per_publisher_rate - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                    body = json.dumps(make_bench_message(bench_id, index, sent, self.agent_name,
+                                                         run_id, padding, msg_type))
+                    try:
+                        conn.send(body=body, destination=destination)
+                        sent += 1
+                    except Exception as e:
+                        failures += 1
+                        self.logger.error(f"Publisher {index} send failed: {e}")
+                        if not conn.is_connected():
+                            time.sleep(1)
+                            conn = connect(index)
+            except Exception as e:
+                # Connecting (or reconnecting) failed: the publisher stops, its result records why
+                error = str(e)
+                self.logger.error(f"Publisher {index} stopped: {e}")
+            finally:
+                results[index] = {'sent': sent, 'failures': failures, 'seconds': time.monotonic() - start}
+                if error is not None:
+                    results[index]['error'] = error
+                if conn is not None:
+                    try:
+                        conn.disconnect()
+                    except Exception:
+                        pass
+
+        self.send_heartbeat()
+        threads = [threading.Thread(target=publish, args=(i,), name=f"bench-publisher-{i}", daemon=True)
+                   for i in range(publishers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        done = [r for r in results if r]
+        total_sent = sum(r['sent'] for r in done)
+        elapsed = max((r['seconds'] for r in done), default=0.0)
+        summary = {
+            'bench_id': bench_id,
+            'sent': total_sent,
+            'failures': sum(r['failures'] for r in done),
+            'failed_publishers': sum(1 for r in done if 'error' in r),
+            'seconds': round(elapsed, 3),
+            'rate_per_sec': round(total_sent / elapsed, 1) if elapsed else None,
+            'per_publisher': done,
+        }
+        self.logger.info(f"Benchmark complete: {json.dumps(summary)}")
+        return summary
+
+
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Remote SSE Sender: send test or benchmark messages via ActiveMQ")
+    parser.add_argument('--bench', action='store_true',
+                        help='Send synthetic benchmark messages instead of the demo batch')
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help='Total target rate in messages/second (default 0: open-loop, as fast as possible)')
+    parser.add_argument('--duration', type=float, default=60.0, help='Benchmark duration in seconds (default 60)')
+    parser.add_argument('--count', type=int, help='Stop each publisher after this many messages')
+    parser.add_argument('--payload-size', default='0',
+                        help='Padding added to each message, e.g. 512, 4K (default 0)')
+    parser.add_argument('--publishers', type=int, default=1,
+                        help='Publisher threads, each with its own broker connection (default 1)')
+    parser.add_argument('--destination', default='epictopic', help='Destination (default epictopic)')
+    parser.add_argument('--msg-type', default=BENCH_MSG_TYPE, help=f'Message type (default {BENCH_MSG_TYPE})')
+    args = parser.parse_args()
+
     try:
         sender = RemoteSSESender()
-        sender.run_sender()
+        if args.bench:
+            summary = sender.run_benchmark(rate=args.rate, duration=args.duration, count=args.count,
+                                           payload_bytes=parse_size(args.payload_size),
+                                           publishers=max(1, args.publishers),
+                                           destination=args.destination, msg_type=args.msg_type)
+            print(json.dumps(summary, indent=2))
+        else:
+            sender.run_sender()
         
     except KeyboardInterrupt:
         print("\nReceived interrupt signal - exiting...")
@@ -0,0 +1,103 @@
+"""
+Run Number Allocator: Local cache of run numbers reserved from the monitor in blocks.
+
+Run starts take the next number from the local block without touching the monitor.
+Reserved but unused numbers are persisted to a small JSON state file so they survive
+restarts. When the block runs low it is refilled from a background thread; only when
+it is completely used up does a run start wait on the remote allocator.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+
+
+class RunNumberAllocator:
+    """Block-reserving, persistent run number cache in front of a remote allocator."""
+
+    def __init__(self, fetch_fn, block_size=10, state_file=None, low_watermark=None, logger=None):
+        # fetch_fn(count) reserves up to count run numbers remotely and returns them as a list
+        self.fetch_fn = fetch_fn
+        self.block_size = max(1, int(block_size))
+        self.low_watermark = self.block_size // 2 if low_watermark is None else low_watermark
+        self.state_file = Path(state_file) if state_file else None
+        self.logger = logger
+
+        self._numbers = deque()
+        self._lock = threading.Lock()
+        self._refill_thread = None
+        self.stats = {'local': 0, 'remote_fallbacks': 0, 'blocks_reserved': 0}
+        self._load()
+
+    def next(self):
+        """Return the next run number, reserving a new block only if the cache is empty."""
+        with self._lock:
+            if self._numbers:
+                number = self._numbers.popleft()
+                self.stats['local'] += 1
+                self._save()
+                if len(self._numbers) <= self.low_watermark:
+                    self._start_refill()
+                return number
+
+        # Block used up: fall back to the remote allocator and keep the rest of the new block
+        self.stats['remote_fallbacks'] += 1
+        if self.logger:
+            self.logger.warning("Run number block exhausted - reserving from monitor synchronously")
+        numbers = self._fetch()
+        if not numbers:
+            raise RuntimeError("Remote run number allocator returned no run numbers")
+        with self._lock:
+            self._numbers.extend(numbers[1:])
+            self._save()
+        return numbers[0]
+
+    def remaining(self):
+        with self._lock:
+            return len(self._numbers)
+
+    def _fetch(self):
+        numbers = [str(n) for n in self.fetch_fn(self.block_size)]
+        self.stats['blocks_reserved'] += 1
+        if self.logger:
+            self.logger.info(f"Reserved run number block: {', '.join(numbers)}")
+        return numbers
+
+    def _start_refill(self):
+        # Called with the lock held
+        if self._refill_thread is not None and self._refill_thread.is_alive():
+            return
+        self._refill_thread = threading.Thread(target=self._refill, name='run-number-refill', daemon=True)
+        self._refill_thread.start()
+
+    def _refill(self):
+        try:
+            numbers = self._fetch()
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"Background run number reservation failed: {e}")
+            return
+        with self._lock:
+            self._numbers.extend(numbers)
+            self._save()
+
+    def _load(self):
+        if not self.state_file or not self.state_file.exists():
+            return
+        try:
+            state = json.loads(self.state_file.read_text())
+            self._numbers.extend(str(n) for n in state.get('reserved', []))
+        except (OSError, ValueError) as e:
+            if self.logger:
+                self.logger.warning(f"Ignoring unreadable run number state {self.state_file}: {e}")
+
+    def _save(self):
+        # Called with the lock held; write-then-rename so a crash never leaves a torn file
+        if not self.state_file:
+            return
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_suffix('.tmp')
+        tmp_file.write_text(json.dumps({'reserved': list(self._numbers)}))
+        os.replace(tmp_file, self.state_file)
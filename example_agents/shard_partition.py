@@ -0,0 +1,77 @@
+"""
+Shard Partition: Splits the stf_gen stream between several data agent processes.
+
+Every data agent shard still subscribes to the epictopic topic. Each one keeps only the
+STFs it owns and ignores the rest. Ownership uses rendezvous (highest random weight)
+hashing of the STF's filename, or of its run_id. Every shard computes the same owner
+without any coordination. Changing the shard count moves only about 1/N of the keys.
+
+Keyed on 'filename', the STFs of one run are spread across all shards. The shard that
+owns the run_id registers the run with the monitor and broadcasts 'run_registered' so the
+other shards learn the monitor's run ID. Keyed on 'run_id', a whole run stays on one shard.
+
+Configured from the environment:
+
+  SWF_DATA_AGENT_SHARDS      number of shards (default 1: no partitioning)
+  SWF_DATA_AGENT_SHARD       this shard's index, 0 .. SHARDS-1
+  SWF_DATA_AGENT_SHARD_KEY   filename (default) or run_id
+"""
+
+import hashlib
+import os
+
+PARTITION_KEYS = ('filename', 'run_id')
+
+
+def _weight(shard, value):
+    digest = hashlib.blake2b(f"{shard}:{value}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class ShardPartition:
+    """This shard's slice of the key space, with owned/skipped counters."""
+
+    def __init__(self, index=0, count=1, key='filename'):
+        if count < 1:
+            raise ValueError(f"Shard count must be at least 1, got {count}")
+        if not 0 <= index < count:
+            raise ValueError(f"Shard index must be in 0..{count - 1}, got {index}")
+        if key not in PARTITION_KEYS:
+            raise ValueError(f"Unknown shard key '{key}' (expected {' or '.join(PARTITION_KEYS)})")
+        self.index = index
+        self.count = count
+        self.key = key
+        self.stats = {'owned': 0, 'skipped': 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(index=int(os.getenv('SWF_DATA_AGENT_SHARD', '0')),
+                   count=int(os.getenv('SWF_DATA_AGENT_SHARDS', '1')),
+                   key=os.getenv('SWF_DATA_AGENT_SHARD_KEY', 'filename').lower())
+
+    @property
+    def enabled(self):
+        return self.count > 1
+
+    def owner(self, value):
+        """Index of the shard that owns a key."""
+        if self.count == 1:
+            return 0
+        return max(range(self.count), key=lambda shard: _weight(shard, value))
+
+    def owns_run(self, run_id):
+        """True if this shard handles the run's lifecycle (registration and completion)."""
+        return self.owner(str(run_id)) == self.index
+
+    def owns_stf(self, message):
+        """True if this shard handles an stf_gen message; counts owned and skipped STFs."""
+        owned = self.owner(str(message.get(self.key))) == self.index
+        self.stats['owned' if owned else 'skipped'] += 1
+        return owned
+
+    def describe(self):
+        """Partition summary for the heartbeat."""
+        return {'shard': self.index, 'shards': self.count, 'key': self.key, **self.stats}
+
+    def __repr__(self):
+        return f"ShardPartition({self.index}/{self.count}, key={self.key!r})"
@@ -0,0 +1,109 @@
+"""
+SSE Benchmark: Synthetic workflow messages and receive-side accounting for relay benchmarks.
+
+The sender stamps every benchmark message with a benchmark ID, its publisher index,
+a per-publisher sequence number and the send time. On the receiving side
+BenchmarkTracker uses those fields to count received, lost, duplicated and reordered
+messages and to measure the end-to-end delay (ActiveMQ -> monitor -> SSE). Delays are
+only meaningful when sender and receiver clocks are synchronised.
+"""
+
+import threading
+import time
+from collections import deque
+
+BENCH_MSG_TYPE = 'sse_bench'
+
+
+def make_bench_message(bench_id, publisher, seq, sender, run_id, padding='', msg_type=BENCH_MSG_TYPE):
+    """One synthetic benchmark message; padding sets the payload size."""
+    return {
+        'msg_type': msg_type,
+        'processed_by': sender,
+        'run_id': run_id,
+        'bench_id': bench_id,
+        'publisher': publisher,
+        'seq': seq,
+        'sent_at': time.time(),
+        'payload': padding,
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class BenchmarkTracker:
+    """Dispatcher handler accounting for benchmark messages per (bench_id, publisher) stream."""
+
+    def __init__(self, latency_window=100000, report_interval=10.0, report_fn=print):
+        self.report_interval = report_interval
+        self.report_fn = report_fn
+        self._lock = threading.Lock()
+        self._next_seq = {}  # (bench_id, publisher) -> next expected sequence number
+        self._missing = {}  # (bench_id, publisher) -> sequence numbers skipped so far
+        self._latencies = deque(maxlen=latency_window)
+        self._first_at = None
+        self._last_report = time.monotonic()
+        self.counts = {'received': 0, 'lost': 0, 'duplicates': 0, 'reordered': 0, 'bytes': 0}
+
+    def __call__(self, message, event, source=None):
+        now = time.time()
+        stream = (message.get('bench_id'), message.get('publisher'))
+        seq = message.get('seq')
+        with self._lock:
+            if self._first_at is None:
+                self._first_at = now
+            self.counts['received'] += 1
+            self.counts['bytes'] += len(event.data)
+            if isinstance(seq, int):
+                expected = self._next_seq.get(stream, 0)
+                if seq >= expected:
+                    # Anything skipped is missing until (if ever) it arrives late
+                    if seq > expected:
+                        self._missing.setdefault(stream, set()).update(range(expected, seq))
+                        self.counts['lost'] += seq - expected
+                    self._next_seq[stream] = seq + 1
+                elif seq in self._missing.get(stream, ()):
+                    self._missing[stream].discard(seq)
+                    self.counts['lost'] -= 1
+                    self.counts['reordered'] += 1
+                else:
+                    self.counts['duplicates'] += 1
+            sent_at = message.get('sent_at')
+            if isinstance(sent_at, (int, float)):
+                self._latencies.append(now - sent_at)
+        if self.report_interval and time.monotonic() - self._last_report >= self.report_interval:
+            self._last_report = time.monotonic()
+            self.report_fn(self.format_summary())
+
+    def summary(self):
+        """Counters, receive rate and end-to-end delay percentiles (ms)."""
+        with self._lock:
+            counts = dict(self.counts)
+            latencies = sorted(self._latencies)
+            elapsed = time.time() - self._first_at if self._first_at else 0.0
+        expected = counts['received'] - counts['duplicates'] + counts['lost']
+        counts.update({
+            'streams': len(self._next_seq),
+            'rate_per_sec': round(counts['received'] / elapsed, 1) if elapsed > 0 else None,
+            'loss_fraction': round(counts['lost'] / expected, 6) if expected else 0.0,
+            'latency_ms': {
+                name: round(1000 * value, 2) if value is not None else None
+                for name, value in (('p50', percentile(latencies, 0.50)),
+                                    ('p95', percentile(latencies, 0.95)),
+                                    ('p99', percentile(latencies, 0.99)),
+                                    ('max', latencies[-1] if latencies else None))
+            },
+        })
+        return counts
+
+    def format_summary(self):
+        s = self.summary()
+        latency = s['latency_ms']
+        return (f"📊 Benchmark: {s['received']} received ({s['rate_per_sec']}/s), {s['lost']} lost, "
+                f"{s['reordered']} reordered, {s['duplicates']} duplicates | "
+                f"delay p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms max={latency['max']}ms")
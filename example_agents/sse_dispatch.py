@@ -0,0 +1,185 @@
+"""
+SSE Dispatch: Routes received SSE events to handlers by message type.
+
+Each event's JSON payload is decoded once and passed to every handler registered for
+its msg_type (or for all types). Handlers registered with a queue get their own
+bounded queue and worker thread, so a slow consumer never stalls the stream reader;
+when its queue is full the event is either waited for ('block') or dropped ('drop').
+RingBufferSink and JsonLinesSink keep events locally for batch consumers.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+OVERFLOW_POLICIES = ('block', 'drop')
+
+
+class _QueuedHandler:
+    """A handler fed from its own bounded queue by a worker thread."""
+
+    def __init__(self, name, handler, queue_size, overflow, logger):
+        self.name = name
+        self.handler = handler
+        self.overflow = overflow
+        self.logger = logger
+        self.stats = {'handled': 0, 'dropped': 0, 'failed': 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name=f"sse-handler-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        if self.overflow == 'block':
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def close(self, timeout):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            _call(self, *item)
+
+
+def _call(entry, message, event, source):
+    try:
+        entry.handler(message, event, source)
+        entry.stats['handled'] += 1
+    except Exception as e:
+        entry.stats['failed'] += 1
+        if entry.logger:
+            entry.logger.error(f"SSE handler '{entry.name}' failed: {e}")
+
+
+class _InlineHandler:
+    """A handler called directly on the stream reader thread."""
+
+    def __init__(self, name, handler, logger):
+        self.name = name
+        self.handler = handler
+        self.logger = logger
+        self.stats = {'handled': 0, 'dropped': 0, 'failed': 0}
+
+    def submit(self, item):
+        _call(self, *item)
+
+    def close(self, timeout):
+        pass
+
+
+class EventDispatcher:
+    """Routes decoded SSE messages to handler(message, event, source) callables by msg_type."""
+
+    def __init__(self, logger=None):
+        self.logger = logger
+        self._routes = {}  # msg_type -> handler entries; None holds the catch-all handlers
+        self._entries = []
+        self.stats = {'dispatched': 0, 'unrouted': 0, 'invalid': 0}
+
+    def register(self, handler, msg_types=None, name=None, queue_size=0, overflow='block'):
+        """
+        Register a handler for the given msg_types (all types if None).
+
+        queue_size=0 runs the handler inline on the reader thread; a positive queue_size
+        gives it a bounded queue and a dedicated worker thread.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}' (expected one of {', '.join(OVERFLOW_POLICIES)})")
+        name = name or getattr(handler, '__name__', type(handler).__name__)
+        if queue_size > 0:
+            entry = _QueuedHandler(name, handler, queue_size, overflow, self.logger)
+        else:
+            entry = _InlineHandler(name, handler, self.logger)
+        self._entries.append(entry)
+        for msg_type in (msg_types or [None]):
+            self._routes.setdefault(msg_type, []).append(entry)
+        return entry
+
+    def dispatch(self, event, source=None):
+        """Decode one event's JSON payload and route it; returns False if it is not a JSON object."""
+        try:
+            message = json.loads(event.data)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            self.stats['invalid'] += 1
+            return False
+
+        entries = self._routes.get(message.get('msg_type'), []) + self._routes.get(None, [])
+        if not entries:
+            self.stats['unrouted'] += 1
+            return True
+        item = (message, event, source)
+        for entry in entries:
+            entry.submit(item)
+        self.stats['dispatched'] += 1
+        return True
+
+    def metrics(self):
+        """Dispatcher counters plus per-handler counters and queue depths."""
+        handlers = {}
+        for entry in self._entries:
+            handlers[entry.name] = dict(entry.stats)
+            if isinstance(entry, _QueuedHandler):
+                handlers[entry.name]['queue_depth'] = entry._queue.qsize()
+        return dict(self.stats, handlers=handlers)
+
+    def close(self, timeout=10.0):
+        """Let queued handlers finish what they hold, then stop their workers."""
+        for entry in self._entries:
+            entry.close(timeout)
+        for entry in self._entries:
+            close = getattr(entry.handler, 'close', None)
+            if close:
+                close()
+
+
+def _record(message, event, source):
+    return {'received_at': time.time(), 'source': source, 'event_id': event.id, 'message': message}
+
+
+class RingBufferSink:
+    """Keeps the most recent events in memory for in-process batch consumers."""
+
+    def __init__(self, capacity=10000):
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def __call__(self, message, event, source):
+        with self._lock:
+            self._events.append(_record(message, event, source))
+
+    def drain(self):
+        """Remove and return all buffered events, oldest first."""
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+    def __len__(self):
+        return len(self._events)
+
+
+class JsonLinesSink:
+    """Appends one compact JSON record per event to a file for batch consumers."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, message, event, source):
+        self._file.write(json.dumps(_record(message, event, source), separators=(',', ':')) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,117 @@
+"""
+SSE Filter: Client-side selection of SSE events before their JSON is decoded.
+
+Workflow messages are mostly flat JSON objects, so msg_type, run_id and filename can be
+read straight from the raw event text with one precompiled regular expression each (a
+string value containing JSON escape sequences is decoded on its own). A
+match counts only if it is a key of the top-level object: keys of the same name in
+nested objects (run_conditions, timing, ...) and text inside string values are skipped.
+The agents put these fields before any nested value, where the check is a few counts;
+a key preceded by nested values costs a scan of the text before it.
+Only events passing every predicate (message types, run ID set or prefixes, filename glob
+and 1-in-N sampling per message type) are handed on for full decoding.
+"""
+
+import fnmatch
+import json
+import re
+
+_FIELD_PATTERNS = {
+    field: re.compile(r'"%s"\s*:\s*(?:("(?:[^"\\]|\\.)*")|(-?\d+))' % field)
+    for field in ('msg_type', 'run_id', 'filename')
+}
+
+
+# String literals and the brackets outside them, for locating a match in the object tree
+_STRUCTURE = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+
+def _is_top_level_key(data, pos):
+    """True if the key starting at pos belongs to the outermost object (not nested, not in a string)."""
+    # Fast path for flat messages: only the opening brace and complete, unescaped strings before pos
+    if (data.count('{', 0, pos) == 1 and data.count('}', 0, pos) == 0 and data.count('[', 0, pos) == 0
+            and data.count('\\', 0, pos) == 0 and data.count('"', 0, pos) % 2 == 0):
+        return True
+    depth = 0
+    for token in _STRUCTURE.finditer(data):
+        start = token.start()
+        if start >= pos:
+            break
+        if token.end() > pos:
+            return False  # pos lies inside a string value
+        char = data[start]
+        if char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+    return depth == 1
+
+
+def _raw_field(data, field):
+    """Value of a top-level string or integer field in raw JSON text, or None."""
+    for match in _FIELD_PATTERNS[field].finditer(data):
+        if _is_top_level_key(data, match.start()):
+            literal = match.group(1)
+            if literal is None:
+                return match.group(2)
+            if '\\' not in literal:
+                return literal[1:-1]
+            try:
+                return json.loads(literal)  # Escaped string (\", \u00e9, ...)
+            except ValueError:
+                return None
+    return None
+
+
+class EventFilter:
+    """Predicates evaluated on undecoded event data; match() returns True for events to keep."""
+
+    def __init__(self, msg_types=None, run_ids=None, filename_pattern=None, sample=None):
+        self.msg_types = frozenset(msg_types) if msg_types else None
+        # Run IDs ending in '*' match as prefixes, the rest exactly
+        run_ids = run_ids or []
+        self.run_ids = frozenset(r for r in run_ids if not r.endswith('*')) or None
+        self.run_id_prefixes = tuple(r[:-1] for r in run_ids if r.endswith('*')) or None
+        self.filename_regex = re.compile(fnmatch.translate(filename_pattern)) if filename_pattern else None
+        # Keep 1 in N events of each sampled msg_type, e.g. {'stf_gen': 10}
+        self.sample = {msg_type: int(n) for msg_type, n in (sample or {}).items() if int(n) > 1}
+        self._sample_counts = dict.fromkeys(self.sample, 0)
+        self.stats = {'seen': 0, 'passed': 0, 'rejected': 0, 'sampled_out': 0}
+
+    @property
+    def active(self):
+        return bool(self.msg_types or self.run_ids or self.run_id_prefixes or self.filename_regex or self.sample)
+
+    def match(self, data):
+        """Check one event's raw data string against all predicates."""
+        self.stats['seen'] += 1
+        if not self._matches(data):
+            self.stats['rejected'] += 1
+            return False
+        if self.sample:
+            msg_type = _raw_field(data, 'msg_type')
+            every = self.sample.get(msg_type)
+            if every:
+                count = self._sample_counts[msg_type]
+                self._sample_counts[msg_type] = count + 1
+                if count % every:
+                    self.stats['sampled_out'] += 1
+                    return False
+        self.stats['passed'] += 1
+        return True
+
+    def _matches(self, data):
+        if self.msg_types is not None and _raw_field(data, 'msg_type') not in self.msg_types:
+            return False
+        if self.run_ids is not None or self.run_id_prefixes is not None:
+            run_id = _raw_field(data, 'run_id')
+            if run_id is None:
+                return False
+            in_set = self.run_ids is not None and run_id in self.run_ids
+            if not in_set and not (self.run_id_prefixes and run_id.startswith(self.run_id_prefixes)):
+                return False
+        if self.filename_regex is not None:
+            filename = _raw_field(data, 'filename')
+            if filename is None or not self.filename_regex.match(filename):
+                return False
+        return True
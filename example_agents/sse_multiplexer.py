@@ -0,0 +1,142 @@
+"""
+SSE Multiplexer: Many filtered SSE subscriptions in one asyncio event loop.
+
+Each subscription opens its own filtered stream (msg_types/agents) over a shared aiohttp
+connection pool and passes decoded events to its own handler. Every subscription
+resumes independently with Last-Event-ID and jittered backoff after a drop. A periodic
+heartbeat callback keeps the owning agent registered with the monitor.
+
+Requires the optional aiohttp package (pip install aiohttp).
+"""
+
+import asyncio
+import inspect
+import ssl
+
+from sse_stream import ReconnectBackoff, SSEDecoder, build_stream_url
+
+try:
+    import aiohttp
+except ImportError:  # Optional dependency, checked when a multiplexer is created
+    aiohttp = None
+
+
+class SSESubscription:
+    """One filtered stream and the handler(event, subscription) that receives its events."""
+
+    def __init__(self, name, handler, msg_types=None, agents=None):
+        self.name = name
+        self.handler = handler
+        self.msg_types = msg_types
+        self.agents = agents
+        self.last_event_id = None
+        self.events_received = 0
+        self.reconnects = 0
+
+    def __repr__(self):
+        return f"SSESubscription({self.name!r}, msg_types={self.msg_types}, agents={self.agents})"
+
+
+class SSEMultiplexer:
+    """Runs SSE subscriptions concurrently over one aiohttp session."""
+
+    def __init__(self, monitor_base, api_token=None, verify=True, pool_size=32,
+                 heartbeat_fn=None, heartbeat_interval=30.0,
+                 reconnect_initial=0.25, reconnect_max=30.0, logger=None):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for multiplexed SSE subscriptions (pip install aiohttp)")
+        self.monitor_base = monitor_base.rstrip('/')
+        self.api_token = api_token
+        self.verify = verify
+        self.pool_size = pool_size
+        self.heartbeat_fn = heartbeat_fn  # Blocking callable, run in the default executor
+        self.heartbeat_interval = heartbeat_interval
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+        self.logger = logger
+        self.subscriptions = []
+
+    def subscribe(self, name, handler, msg_types=None, agents=None):
+        """Add a subscription; handler may be a plain function or a coroutine function."""
+        subscription = SSESubscription(name, handler, msg_types, agents)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    async def run(self):
+        """Run all subscriptions (and the heartbeat) until cancelled."""
+        if not self.subscriptions:
+            raise ValueError("No SSE subscriptions configured")
+        headers = {'Accept': 'text/event-stream', 'Cache-Control': 'no-cache'}
+        if self.api_token:
+            headers['Authorization'] = f'Token {self.api_token}'
+        # verify: True (default CAs), False (no verification) or a CA bundle path, as with requests
+        if isinstance(self.verify, str):
+            ssl_setting = ssl.create_default_context(cafile=self.verify)
+        else:
+            ssl_setting = None if self.verify else False
+        connector = aiohttp.TCPConnector(limit=self.pool_size, ssl=ssl_setting)
+        # No total timeout: streams stay open for hours; sock_read catches silent connections
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=3600)
+
+        async with aiohttp.ClientSession(connector=connector, headers=headers,
+                                         timeout=timeout, trust_env=True) as session:
+            tasks = [asyncio.create_task(self._run_subscription(session, sub), name=f"sse-{sub.name}")
+                     for sub in self.subscriptions]
+            if self.heartbeat_fn:
+                tasks.append(asyncio.create_task(self._heartbeat_loop(), name='sse-heartbeat'))
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_subscription(self, session, sub):
+        url = build_stream_url(self.monitor_base, sub.msg_types, sub.agents)
+        backoff = ReconnectBackoff(self.reconnect_initial, self.reconnect_max)
+        while True:
+            decoder = SSEDecoder(last_event_id=sub.last_event_id)
+            headers = {'Last-Event-ID': sub.last_event_id} if sub.last_event_id else None
+            try:
+                async with session.get(url, headers=headers, allow_redirects=False) as response:
+                    if response.status != 200:
+                        self._log('warning', f"[{sub.name}] Stream request failed: HTTP {response.status}")
+                    else:
+                        self._log('info', f"[{sub.name}] Stream opened: {url}")
+                        backoff.reset()
+                        async for chunk in response.content.iter_any():
+                            for event in decoder.feed(chunk):
+                                sub.last_event_id = decoder.last_event_id
+                                sub.events_received += 1
+                                await self._dispatch(sub, event)
+                        self._log('info', f"[{sub.name}] Stream closed by server")
+            except asyncio.CancelledError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._log('warning', f"[{sub.name}] Connection error: {e}")
+            sub.last_event_id = decoder.last_event_id
+            backoff.hint(decoder.retry)
+            sub.reconnects += 1
+            await asyncio.sleep(backoff.next_delay())
+
+    async def _dispatch(self, sub, event):
+        try:
+            result = sub.handler(event, sub)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            # A failing handler must not take down the stream or the other subscriptions
+            self._log('error', f"[{sub.name}] Handler failed for event {event.id}: {e}")
+
+    async def _heartbeat_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.heartbeat_fn)
+            except Exception as e:
+                self._log('warning', f"Heartbeat failed: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def _log(self, level, message):
+        if self.logger:
+            getattr(self.logger, level)(message)
@@ -0,0 +1,166 @@
+"""
+SSE Stream: Incremental Server-Sent Events decoder for the monitor's message stream.
+
+The stream is read in large chunks and fed into SSEDecoder, which keeps the unfinished
+tail in a reusable buffer and returns every event completed by the chunk. Parsing
+follows the SSE specification: CR, LF and CRLF line endings, 'event:', multi-line
+'data:', 'id:' (remembered across events), 'retry:' hints and ':' comment lines.
+
+ReconnectBackoff gives the jittered exponential reconnect delays used when a stream
+drops, starting from the server's 'retry:' hint when one has been received.
+"""
+
+import random
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def build_stream_url(monitor_base, msg_types=None, agents=None):
+    """The monitor's message stream URL with optional msg_types/agents filters."""
+    stream_url = f"{monitor_base}/api/messages/stream/"
+    params = []
+    if msg_types:
+        params.append(f"msg_types={','.join(msg_types)}")
+    if agents:
+        params.append(f"agents={','.join(agents)}")
+    if params:
+        stream_url += "?" + "&".join(params)
+    return stream_url
+
+
+class SSEEvent:
+    """One dispatched SSE event."""
+
+    __slots__ = ('event', 'data', 'id', 'retry')
+
+    def __init__(self, event='message', data='', id=None, retry=None):
+        self.event = event
+        self.data = data
+        self.id = id
+        self.retry = retry
+
+    def __repr__(self):
+        return f"SSEEvent(event={self.event!r}, id={self.id!r}, data={self.data[:80]!r})"
+
+
+class SSEDecoder:
+    """Turns raw stream bytes into SSEEvent objects, one chunk at a time."""
+
+    def __init__(self, last_event_id=None):
+        self.last_event_id = last_event_id
+        self.retry = None  # Latest reconnection time hint from the server, in milliseconds
+        self.comments = 0
+        self._buffer = bytearray()
+        self._pending_cr = False
+        self._at_start = True
+        self._event_type = ''
+        self._data = []
+
+    def feed(self, chunk):
+        """Consume a chunk of bytes; returns the list of events it completed."""
+        if not chunk:
+            return []
+        # A CRLF split across two chunks: the CR already ended the line
+        if self._pending_cr and chunk[:1] == b'\n':
+            chunk = chunk[1:]
+        self._pending_cr = chunk[-1:] == b'\r'
+        if b'\r' in chunk:
+            chunk = chunk.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        self._buffer += chunk
+
+        end = self._buffer.rfind(b'\n')
+        if end < 0:
+            return []
+        # A newline never falls inside a multi-byte UTF-8 sequence, so the complete lines decode safely
+        text = self._buffer[:end].decode('utf-8', 'replace')
+        del self._buffer[:end + 1]
+        if self._at_start:
+            self._at_start = False
+            if text.startswith('\ufeff'):
+                text = text[1:]
+
+        events = []
+        for line in text.split('\n'):
+            if not line:
+                event = self._dispatch()
+                if event is not None:
+                    events.append(event)
+            elif line[0] == ':':
+                self.comments += 1
+            else:
+                self._field(line)
+        return events
+
+    def _field(self, line):
+        name, sep, value = line.partition(':')
+        if sep and value[:1] == ' ':
+            value = value[1:]
+        if name == 'data':
+            self._data.append(value)
+        elif name == 'event':
+            self._event_type = value
+        elif name == 'id':
+            if '\0' not in value:
+                self.last_event_id = value
+        elif name == 'retry':
+            if value.isdigit():
+                self.retry = int(value)
+        # Unknown fields are ignored, as the specification requires
+
+    def _dispatch(self):
+        data, event_type = self._data, self._event_type
+        self._data, self._event_type = [], ''
+        if not data:
+            return None
+        return SSEEvent(event_type or 'message', '\n'.join(data), self.last_event_id, self.retry)
+
+
+def iter_chunks(response, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield stream bytes as they arrive, up to chunk_size per read, without waiting to fill a chunk."""
+    raw = getattr(response, 'raw', None)
+    if raw is not None and hasattr(raw, 'read1'):
+        # urllib3 2.x: read1 returns whatever is available (handling chunked transfer encoding)
+        while True:
+            chunk = raw.read1(chunk_size, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        # Older urllib3: with chunk_size=None each transfer chunk is yielded as it arrives
+        yield from response.iter_content(chunk_size=None)
+
+
+def iter_sse_events(response, decoder=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield SSEEvent objects from a streaming requests response."""
+    decoder = decoder or SSEDecoder()
+    for chunk in iter_chunks(response, chunk_size):
+        yield from decoder.feed(chunk)
+
+
+class ReconnectBackoff:
+    """Jittered exponential reconnect delays, starting sub-second."""
+
+    def __init__(self, initial=0.25, maximum=30.0, jitter=0.5, rng=None):
+        self.initial = initial
+        self.maximum = maximum
+        self.jitter = jitter
+        self.server_hint = None  # seconds, from the stream's retry: field
+        self.attempt = 0
+        self._random = rng or random.Random()
+
+    def hint(self, retry_ms):
+        """Adopt the server's retry: hint (milliseconds) as the base delay."""
+        if retry_ms is not None:
+            self.server_hint = retry_ms / 1000.0
+
+    def next_delay(self):
+        """Delay before the next attempt; doubles per consecutive failure up to maximum."""
+        base = self.initial if self.server_hint is None else self.server_hint
+        delay = min(self.maximum, base * (2 ** self.attempt))
+        self.attempt += 1
+        # Spread reconnects of many clients so they do not hit the server in lockstep
+        return min(self.maximum, delay * self._random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def reset(self):
+        """Call once a stream is open again."""
+        self.attempt = 0
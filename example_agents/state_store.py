@@ -0,0 +1,190 @@
+"""
+State Store: Bounded, evicting state tables for the agents' run and file bookkeeping.
+
+Long production runs produce millions of STFs, so per-file state must not grow without
+bound, and a lost end_run must not leak its run forever. A StateTable keeps records in
+least-recently-used order, drops records idle for longer than a TTL, evicts the least
+recently used record once max_entries is reached, and groups records (e.g. by run) so
+that a whole run can be dropped in one step. Records use __slots__ to stay compact.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class StateRecord:
+    """Base record: the table maintains the group and the last-touched time."""
+
+    __slots__ = ('group', 'touched')
+
+    def __init__(self):
+        self.group = None
+        self.touched = 0.0
+
+
+class RunRecord(StateRecord):
+    """Data agent view of an active run."""
+
+    __slots__ = ('monitor_run_id', 'files_created', 'total_files')
+
+    def __init__(self, monitor_run_id, files_created=0, total_files=0):
+        super().__init__()
+        self.monitor_run_id = monitor_run_id
+        self.files_created = files_created
+        self.total_files = total_files
+
+
+class FileRecord(StateRecord):
+    """Data agent view of a registered STF file."""
+
+    __slots__ = ('file_id', 'run_id', 'status')
+
+    def __init__(self, file_id, run_id, status):
+        super().__init__()
+        self.file_id = file_id
+        self.run_id = run_id
+        self.status = status
+
+
+class PendingStfRecord(StateRecord):
+    """Data agent shard: an stf_gen message held until its run is registered."""
+
+    __slots__ = ('message', 'received')
+
+    def __init__(self, message, received):
+        super().__init__()
+        self.message = message
+        self.received = received
+
+
+class ProcessingRecord(StateRecord):
+    """Processing agent view of a file being reconstructed."""
+
+    __slots__ = ('task_id', 'run_id', 'started_at', 'input_data')
+
+    def __init__(self, task_id, run_id, started_at, input_data=None):
+        super().__init__()
+        self.task_id = task_id
+        self.run_id = run_id
+        self.started_at = started_at
+        self.input_data = input_data
+
+
+class StateTable:
+    """Thread-safe mapping with LRU eviction, TTL expiry and per-group removal."""
+
+    def __init__(self, max_entries=100000, ttl=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._records = OrderedDict()  # key -> record, least recently touched first
+        self._groups = {}  # group -> set of keys
+        self._lock = threading.RLock()
+        self.stats = {'evicted': 0, 'expired': 0, 'dropped_by_group': 0}
+
+    def put(self, key, record, group=None):
+        """Insert or replace a record, optionally filing it under a group (e.g. run id)."""
+        with self._lock:
+            if key in self._records:
+                self._remove(key)
+            record.group = group
+            record.touched = self.clock()
+            self._records[key] = record
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            self._expire()
+            while len(self._records) > self.max_entries:
+                oldest = next(iter(self._records))
+                self._remove(oldest)
+                self.stats['evicted'] += 1
+        return record
+
+    def get(self, key, default=None):
+        """Return a live record and mark it as recently used."""
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return default
+            now = self.clock()
+            if self.ttl is not None and now - record.touched > self.ttl:
+                self._remove(key)
+                self.stats['expired'] += 1
+                return default
+            record.touched = now
+            self._records.move_to_end(key)
+            return record
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._records:
+                return default
+            return self._remove(key)
+
+    def drop_group(self, group):
+        """Remove every record filed under a group; returns the number removed."""
+        with self._lock:
+            keys = self._groups.pop(group, set())
+            for key in keys:
+                self._records.pop(key, None)
+            self.stats['dropped_by_group'] += len(keys)
+            return len(keys)
+
+    def pop_group(self, group):
+        """Remove every record filed under a group and return them, least recently used first."""
+        with self._lock:
+            records = [self._records.pop(key) for key in self._groups.pop(group, set())]
+            self.stats['dropped_by_group'] += len(records)
+            return sorted(records, key=lambda record: record.touched)
+
+    def group_size(self, group):
+        with self._lock:
+            return len(self._groups.get(group, ()))
+
+    def expire(self):
+        """Drop records idle for longer than the TTL; returns the number removed."""
+        with self._lock:
+            return self._expire()
+
+    def values(self):
+        """Snapshot of the records (does not count as use)."""
+        with self._lock:
+            return list(self._records.values())
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        record = self.get(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+    def _remove(self, key):
+        record = self._records.pop(key)
+        if record.group is not None:
+            keys = self._groups.get(record.group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[record.group]
+        return record
+
+    def _expire(self):
+        if self.ttl is None:
+            return 0
+        # Records are ordered by last touch, so expired ones are all at the front
+        cutoff = self.clock() - self.ttl
+        removed = 0
+        while self._records:
+            key, record = next(iter(self._records.items()))
+            if record.touched >= cutoff:
+                break
+            self._remove(key)
+            removed += 1
+        self.stats['expired'] += removed
+        return removed
@@ -0,0 +1,129 @@
+"""
+STF Payload: Generates STF data files with realistic sizes and checksums.
+
+File sizes are drawn from a fixed, normal or log-normal distribution around a mean
+size (ePIC STFs are around 1-2 GB). Files are either written in large buffered chunks
+or preallocated as sparse/fallocate'd files. The checksum (sha256 or adler32) is
+computed while the data is written, so downstream agents see real byte volumes and
+the simulator pays the real checksum cost.
+"""
+
+import hashlib
+import math
+import os
+import random
+import re
+import zlib
+
+DISTRIBUTIONS = ('fixed', 'normal', 'lognormal')
+WRITE_MODES = ('write', 'sparse', 'fallocate')
+CHECKSUMS = ('sha256', 'adler32', 'none')
+
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(text):
+    """Parse a byte size such as '1500000', '512M' or '1.5G' (binary units)."""
+    match = re.fullmatch(r'\s*([0-9]*\.?[0-9]+)\s*([KMGT]?)i?B?\s*', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size '{text}' (examples: 1048576, 512M, 1.5G)")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+class _Adler32:
+    """hashlib-style wrapper around zlib.adler32."""
+
+    def __init__(self):
+        self.value = 1
+
+    def update(self, data):
+        self.value = zlib.adler32(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value & 0xffffffff:08x}"
+
+
+class PayloadGenerator:
+    """Draws STF sizes from a distribution and writes payload files with checksums."""
+
+    def __init__(self, distribution='fixed', mean_bytes=parse_size('1.5G'), sigma=0.1,
+                 min_bytes=1, max_bytes=None, mode='write', checksum='sha256',
+                 chunk_size=parse_size('8M'), seed=None):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown size distribution '{distribution}' (expected one of {', '.join(DISTRIBUTIONS)})")
+        if mode not in WRITE_MODES:
+            raise ValueError(f"Unknown payload mode '{mode}' (expected one of {', '.join(WRITE_MODES)})")
+        if checksum not in CHECKSUMS:
+            raise ValueError(f"Unknown checksum '{checksum}' (expected one of {', '.join(CHECKSUMS)})")
+        if mean_bytes <= 0:
+            raise ValueError(f"Mean payload size must be positive, got {mean_bytes}")
+
+        self.distribution = distribution
+        self.mean_bytes = mean_bytes
+        # normal: standard deviation as a fraction of the mean; lognormal: shape parameter
+        self.sigma = sigma
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.checksum = checksum
+        self.chunk_size = chunk_size
+        self._random = random.Random(seed)
+
+        # One chunk of incompressible data, reused for every write; zeros for preallocated files
+        self._data_chunk = self._random.randbytes(chunk_size) if hasattr(self._random, 'randbytes') \
+            else os.urandom(chunk_size)
+        self._zero_chunk = bytes(chunk_size)
+
+    def sample_size(self):
+        """Draw one STF size in bytes."""
+        if self.distribution == 'fixed':
+            size = self.mean_bytes
+        elif self.distribution == 'normal':
+            size = self._random.gauss(self.mean_bytes, self.sigma * self.mean_bytes)
+        else:
+            # Log-normal with its median at mean_bytes
+            size = self._random.lognormvariate(math.log(self.mean_bytes), self.sigma)
+        size = max(self.min_bytes, int(size))
+        if self.max_bytes:
+            size = min(self.max_bytes, size)
+        return size
+
+    def _hasher(self):
+        if self.checksum == 'sha256':
+            return hashlib.sha256()
+        if self.checksum == 'adler32':
+            return _Adler32()
+        return None
+
+    def write(self, path, size=None):
+        """Write one payload file; returns (size_bytes, checksum string or None)."""
+        size = self.sample_size() if size is None else size
+        hasher = self._hasher()
+
+        if self.mode == 'write':
+            chunk = memoryview(self._data_chunk)
+            with open(path, 'wb', buffering=0) as f:
+                remaining = size
+                while remaining > 0:
+                    piece = chunk[:min(remaining, self.chunk_size)]
+                    f.write(piece)
+                    if hasher:
+                        hasher.update(piece)
+                    remaining -= len(piece)
+        else:
+            with open(path, 'wb') as f:
+                if self.mode == 'fallocate' and hasattr(os, 'posix_fallocate'):
+                    os.posix_fallocate(f.fileno(), 0, size)
+                else:
+                    f.truncate(size)  # Sparse file (also the fallback where fallocate is unavailable)
+            if hasher:
+                # The file reads back as zeros; checksum those bytes
+                chunk = memoryview(self._zero_chunk)
+                remaining = size
+                while remaining > 0:
+                    piece = chunk[:min(remaining, self.chunk_size)]
+                    hasher.update(piece)
+                    remaining -= len(piece)
+
+        checksum = f"{self.checksum}:{hasher.hexdigest()}" if hasher else None
+        return size, checksum
@@ -0,0 +1,126 @@
+"""
+STF Registration Pipeline: Moves monitor registration of STF files off the message path.
+
+The data agent hands each STF to the pipeline and returns immediately. A background
+worker collects pending registrations, coalesces repeated updates for the same file
+into a single record, and flushes them once either the batch size or the flush
+interval is reached. If a flush raises, the optional on_failure callback gets the
+records of that batch so the caller can arrange for them to be retried.
+"""
+
+import threading
+import time
+
+
+class StfRegistrationPipeline:
+    """
+    Background batcher for STF file registrations.
+
+    Records are keyed by filename; submitting a second record for a file that is
+    still pending merges the fields instead of queueing another REST call.
+    """
+
+    def __init__(self, flush_fn, batch_size=50, flush_interval=1.0, logger=None, on_failure=None):
+        self.flush_fn = flush_fn
+        self.on_failure = on_failure
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.logger = logger
+
+        self._pending = {}  # filename -> record, insertion ordered
+        self._oldest = None  # monotonic time the oldest pending record arrived
+        self._flushing = False
+        self._flush_requested = False
+        self._stopping = False
+        self._cond = threading.Condition()
+
+        self.stats = {'submitted': 0, 'coalesced': 0, 'flushed': 0, 'batches': 0, 'failed': 0}
+
+        self._worker = threading.Thread(target=self._run, name='stf-registration', daemon=True)
+        self._worker.start()
+
+    def submit(self, filename, **fields):
+        """Queue (or merge) a registration record for an STF file."""
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("STF registration pipeline is closed")
+            record = self._pending.get(filename)
+            if record is None:
+                record = dict(fields, filename=filename)
+                self._pending[filename] = record
+                self.stats['submitted'] += 1
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+            else:
+                record.update(fields)
+                self.stats['coalesced'] += 1
+            self._cond.notify_all()
+
+    def pending_count(self):
+        """Number of records waiting for the next flush."""
+        with self._cond:
+            return len(self._pending)
+
+    def drain(self, timeout=30.0):
+        """Flush everything pending now and wait until the worker is idle."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._flushing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=30.0):
+        """Flush outstanding records and stop the worker thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+
+    def _batch_due(self):
+        if not self._pending:
+            return False
+        if self._stopping or self._flush_requested or len(self._pending) >= self.batch_size:
+            return True
+        return time.monotonic() - self._oldest >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._batch_due():
+                    if self._stopping and not self._pending:
+                        return
+                    if self._pending:
+                        self._cond.wait(max(0.0, self._oldest + self.flush_interval - time.monotonic()))
+                    else:
+                        self._flush_requested = False
+                        self._cond.wait()
+                batch = list(self._pending.values())[:self.batch_size]
+                for record in batch:
+                    del self._pending[record['filename']]
+                self._oldest = time.monotonic() if self._pending else None
+                self._flushing = True
+
+            self._flush(batch)
+
+            with self._cond:
+                self._flushing = False
+                if not self._pending:
+                    self._flush_requested = False
+                self._cond.notify_all()
+
+    def _flush(self, batch):
+        try:
+            self.flush_fn(batch)
+            self.stats['flushed'] += len(batch)
+            self.stats['batches'] += 1
+        except Exception as e:
+            self.stats['failed'] += len(batch)
+            if self.logger:
+                self.logger.error(f"Failed to flush {len(batch)} STF registrations: {e}")
+            if self.on_failure:
+                self.on_failure(batch)
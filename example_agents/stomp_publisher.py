@@ -0,0 +1,238 @@
+"""
+STOMP Publisher: Non-blocking message publishing with a send queue and automatic reconnect.
+
+Producers enqueue messages into a bounded in-memory queue and return immediately. A
+dedicated sender thread drains the queue in order. If a send fails, the sender keeps
+the message, reconnects with exponential backoff and then replays everything queued
+during the outage. Queue depth and send latency are exposed through metrics().
+
+A producer is never held up for long by a full queue (a long broker outage): by default
+the oldest queued message is discarded to make room ('drop_oldest'). 'drop' discards the
+new message instead, and 'block' waits up to block_timeout seconds for space before
+discarding it. Every discarded message is counted in metrics()['dropped'].
+"""
+
+import os
+import queue
+import ssl
+import threading
+import time
+
+import stomp
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop', 'block')
+
+
+def mq_settings_from_env():
+    """ActiveMQ connection settings from the ACTIVEMQ_* environment variables."""
+    return {
+        'host': os.getenv('ACTIVEMQ_HOST', 'pandaserver02.sdcc.bnl.gov'),
+        'port': int(os.getenv('ACTIVEMQ_PORT', 61612)),
+        'user': os.getenv('ACTIVEMQ_USER', 'wenauseic'),
+        'password': os.getenv('ACTIVEMQ_PASSWORD', 'swf123_wenauseic'),
+        'use_ssl': os.getenv('ACTIVEMQ_USE_SSL', 'True').lower() == 'true',
+        'ssl_ca_certs': os.getenv('ACTIVEMQ_SSL_CA_CERTS', '/eic/u/wenauseic/github/swf-monitor/full-chain.pem'),
+    }
+
+
+def open_stomp_connection(settings, client_id, heart_beat='30000,3600000', logger=None):
+    """Create and connect a STOMP 1.1 connection using the same pattern as base_agent."""
+    host_and_port = (settings['host'], settings['port'])
+    conn = stomp.Connection(
+        host_and_ports=[host_and_port],
+        vhost=settings['host'],
+        try_loopback_connect=False
+    )
+    if settings['use_ssl']:
+        if logger:
+            logger.info(f"Configuring SSL connection with CA certs: {settings['ssl_ca_certs']}")
+        conn.transport.set_ssl(
+            for_hosts=[host_and_port],
+            ca_certs=settings['ssl_ca_certs'],
+            ssl_version=ssl.PROTOCOL_TLS_CLIENT
+        )
+    conn.connect(
+        settings['user'],
+        settings['password'],
+        wait=True,
+        version='1.1',
+        headers={
+            'client-id': client_id,
+            'heart-beat': heart_beat
+        }
+    )
+    return conn
+
+
+class QueuedPublisher:
+    """Bounded send queue drained by a sender thread that reconnects and replays."""
+
+    def __init__(self, connect_fn, conn=None, max_queue=10000, overflow='drop_oldest', block_timeout=5.0,
+                 reconnect_initial=0.5, reconnect_max=30.0, logger=None, name='stomp-publisher'):
+        # connect_fn() returns a new connected STOMP connection (called on every reconnect)
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}' (expected one of {', '.join(OVERFLOW_POLICIES)})")
+        self.connect_fn = connect_fn
+        self.conn = conn
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+        self.logger = logger
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._overflowing = False  # inside a run of overflow drops (logged once per run)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'enqueued': 0, 'sent': 0, 'dropped': 0, 'send_failures': 0, 'reconnects': 0,
+            'latency_total': 0.0, 'latency_max': 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def connected(self):
+        try:
+            return bool(self.conn and self.conn.is_connected())
+        except Exception:
+            return False
+
+    def send(self, destination, body, headers=None):
+        """Queue a message for sending; returns False only if this message was dropped on overflow."""
+        item = (destination, body, headers, time.monotonic())
+        try:
+            self._queue.put_nowait(item)
+            self._overflowing = False
+        except queue.Full:
+            if self.overflow == 'drop_oldest':
+                self._put_dropping_oldest(item)
+            elif not self._put_blocking(item):
+                self._count_drop(destination)
+                return False
+        with self._metrics_lock:
+            self._metrics['enqueued'] += 1
+        return True
+
+    def _put_blocking(self, item):
+        if self.overflow != 'block':
+            return False
+        try:
+            self._queue.put(item, timeout=self.block_timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def _put_dropping_oldest(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            try:
+                oldest = self._queue.get_nowait()
+            except queue.Empty:
+                continue  # The sender thread took it meanwhile
+            self._queue.task_done()
+            self._count_drop(oldest[0])
+
+    def _count_drop(self, destination):
+        with self._metrics_lock:
+            self._metrics['dropped'] += 1
+        if self.logger and not self._overflowing:
+            self.logger.error(f"Send queue full ({self.overflow}) - dropping messages, first for '{destination}'")
+        self._overflowing = True
+
+    def metrics(self):
+        """Queue depth, counters and send latency (enqueue to broker acceptance) in ms."""
+        with self._metrics_lock:
+            m = dict(self._metrics)
+        sent = m.pop('sent')
+        latency_total = m.pop('latency_total')
+        latency_max = m.pop('latency_max')
+        m.update({
+            'queue_depth': self._queue.qsize(),
+            'sent': sent,
+            'latency_avg_ms': round(1000 * latency_total / sent, 3) if sent else None,
+            'latency_max_ms': round(1000 * latency_max, 3),
+            'connected': self.connected,
+        })
+        return m
+
+    def close(self, timeout=30.0):
+        """Send what is queued (up to timeout), stop the sender thread and disconnect."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stop.set()
+        self._thread.join(max(0.0, deadline - time.monotonic()) + 1.0)
+        remaining = self._queue.qsize()
+        if remaining and self.logger:
+            self.logger.error(f"Publisher closed with {remaining} unsent messages")
+        if self.connected:
+            try:
+                self.conn.disconnect()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Error during disconnect: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                item = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                self._deliver(item)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, item):
+        destination, body, headers, enqueued_at = item
+        # Keep retrying this message (preserving order) until it is sent or we are stopped
+        while not self._stop.is_set():
+            if not self.connected and not self._reconnect():
+                continue
+            try:
+                self.conn.send(body=body, destination=destination, headers=headers)
+            except Exception as e:
+                with self._metrics_lock:
+                    self._metrics['send_failures'] += 1
+                if self.logger:
+                    self.logger.warning(f"Send to '{destination}' failed, reconnecting: {e}")
+                self._drop_connection()
+                continue
+            latency = time.monotonic() - enqueued_at
+            with self._metrics_lock:
+                self._metrics['sent'] += 1
+                self._metrics['latency_total'] += latency
+                self._metrics['latency_max'] = max(self._metrics['latency_max'], latency)
+            return
+
+    def _drop_connection(self):
+        try:
+            if self.conn:
+                self.conn.disconnect()
+        except Exception:
+            pass
+        self.conn = None
+
+    def _reconnect(self):
+        """Reconnect with exponential backoff; returns False if stopped while waiting."""
+        delay = self.reconnect_initial
+        while not self._stop.is_set():
+            try:
+                self.conn = self.connect_fn()
+                with self._metrics_lock:
+                    self._metrics['reconnects'] += 1
+                if self.logger:
+                    self.logger.info(f"Reconnected to broker; {self._queue.qsize() + 1} messages to replay")
+                return True
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Reconnect failed, retrying in {delay:.1f}s: {e}")
+                if self._stop.wait(delay):
+                    return False
+                delay = min(delay * 2, self.reconnect_max)
+        return False
@@ -71,7 +71,7 @@ pip install -e "$SWF_MONITOR"
 
 echo "  4/4 Installing swf-testbed CLI and core dependencies..."
 # Install core dependencies first
-pip install typer[all] supervisor psutil
+pip install typer[all] supervisor psutil requests
 # Install testbed without trying to resolve the swf-* dependencies from PyPI
 pip install -e . --no-deps
 
@@ -8,9 +8,10 @@ Simple service status check - no deep connectivity testing.
 import subprocess
 import sys
 import os
-import requests
 from pathlib import Path
 
+from swf_testbed_cli.monitor_client import MonitorClient
+
 def setup_environment():
     """Auto-activate venv and load environment variables - same pattern as run_tests."""
     script_dir = Path(__file__).resolve().parent
@@ -76,19 +77,14 @@ def check_django_status():
         os.getenv('SWF_MONITOR_HTTP_URL', 'http://localhost:8002')
     ]
     
-    session = requests.Session()
-    session.verify = False  # Allow self-signed certs
-    session.proxies = {'http': None, 'https': None}
-    session.timeout = 5
-    
-    # Suppress SSL warnings
-    import urllib3
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    # One pooled session for all URLs; self-signed certs allowed, a single quick retry
+    client = MonitorClient(monitor_urls[0], verify=False, disable_proxies=True,
+                           timeout=5, max_retries=1)
     
     results = {}
     for url in set(monitor_urls):  # Remove duplicates
         try:
-            response = session.get(f"{url}/api/systemagents/")
+            response = client.get(f"{url}/api/systemagents/")
             results[url] = {
                 'status': response.status_code,
                 'reachable': True,
@@ -0,0 +1,181 @@
+"""
+Monitor Client: Shared HTTP layer for talking to the swf-monitor REST API.
+
+All example agents and helper scripts build their monitor session here so that
+connection pool sizing, HTTP keep-alive and retry/backoff policy are configured in
+one place. The client also offers a bulk mode that submits many `/stf-files/` or
+`/workflow-stages/` records in a single request.
+
+Configuration (environment variables, all optional):
+  SWF_MONITOR_URL               - Monitor base URL
+  SWF_API_TOKEN                 - API token sent as 'Authorization: Token ...'
+  SWF_MONITOR_POOL_CONNECTIONS  - Number of host pools to cache (default: 4)
+  SWF_MONITOR_POOL_MAXSIZE      - Keep-alive connections per host (default: 16)
+  SWF_MONITOR_MAX_RETRIES       - Retry budget per request (default: 3)
+  SWF_MONITOR_BACKOFF           - Exponential backoff factor in seconds (default: 0.2)
+  SWF_MONITOR_BACKOFF_MAX       - Upper bound for a single backoff sleep (default: 10)
+  SWF_MONITOR_BULK              - Set to 1 to use bulk endpoints (default: off)
+  SWF_MONITOR_BULK_SIZE         - Maximum records per bulk request (default: 200)
+"""
+
+import os
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_MONITOR_URL = 'https://pandaserver02.sdcc.bnl.gov/swf-monitor'
+
+# Transient responses worth retrying; 4xx errors are returned to the caller unchanged.
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+
+def _env_flag(name, default='0'):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+class MonitorClient:
+    """Pooled, retrying HTTP client for the swf-monitor REST API."""
+
+    def __init__(self, monitor_url, api_token=None, verify=None, timeout=10,
+                 pool_connections=4, pool_maxsize=16, max_retries=3,
+                 backoff_factor=0.2, backoff_max=10.0, retry_methods=None,
+                 bulk=False, bulk_size=200, bulk_suffix='bulk/', api_prefix='/api',
+                 disable_proxies=False, headers=None):
+        self.monitor_url = monitor_url.rstrip('/')
+        self.api_token = api_token
+        self.timeout = timeout
+        self.api_prefix = api_prefix
+        self.bulk = bulk
+        self.bulk_size = max(1, int(bulk_size))
+        self.bulk_suffix = bulk_suffix
+
+        self.session = requests.Session()
+        self.session.headers.update({'Connection': 'keep-alive'})
+        if api_token:
+            self.session.headers.update({'Authorization': f'Token {api_token}'})
+        if headers:
+            self.session.headers.update(headers)
+
+        # For localhost development, disable SSL verification unless told otherwise
+        if verify is None:
+            verify = 'localhost' not in self.monitor_url
+        self.session.verify = verify
+        if not verify:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        if disable_proxies:
+            self.session.proxies = {'http': None, 'https': None}
+
+        retry = self._build_retry(max_retries, backoff_factor, backoff_max, retry_methods)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def from_env(cls, monitor_url=None, default_url=DEFAULT_MONITOR_URL, **overrides):
+        """Build a client from SWF_MONITOR_* environment variables."""
+        config = {
+            'api_token': os.getenv('SWF_API_TOKEN'),
+            'pool_connections': int(os.getenv('SWF_MONITOR_POOL_CONNECTIONS', '4')),
+            'pool_maxsize': int(os.getenv('SWF_MONITOR_POOL_MAXSIZE', '16')),
+            'max_retries': int(os.getenv('SWF_MONITOR_MAX_RETRIES', '3')),
+            'backoff_factor': float(os.getenv('SWF_MONITOR_BACKOFF', '0.2')),
+            'backoff_max': float(os.getenv('SWF_MONITOR_BACKOFF_MAX', '10')),
+            'bulk': _env_flag('SWF_MONITOR_BULK'),
+            'bulk_size': int(os.getenv('SWF_MONITOR_BULK_SIZE', '200')),
+        }
+        config.update(overrides)
+        return cls(monitor_url or os.getenv('SWF_MONITOR_URL', default_url), **config)
+
+    @staticmethod
+    def _build_retry(max_retries, backoff_factor, backoff_max, retry_methods):
+        """Bounded exponential retry policy (connection errors and transient 5xx)."""
+        options = {
+            'total': max_retries,
+            'backoff_factor': backoff_factor,
+            'status_forcelist': RETRY_STATUS_CODES,
+            'raise_on_status': False,
+            'respect_retry_after_header': True,
+        }
+        # POST/PATCH are not idempotent, so by default only connection failures are retried for them
+        if retry_methods is not None:
+            options['allowed_methods'] = frozenset(m.upper() for m in retry_methods)
+        try:
+            return Retry(backoff_max=backoff_max, **options)
+        except TypeError:
+            # urllib3 < 2 has no backoff_max argument
+            retry = Retry(**options)
+            retry.BACKOFF_MAX = backoff_max
+            return retry
+
+    def url(self, path):
+        """Absolute URL for a path below the monitor base (absolute URLs pass through)."""
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.monitor_url}{path}"
+
+    def request(self, method, path, **kwargs):
+        """Send a request on the pooled session and return the raw response."""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def call_api(self, method, endpoint, data=None):
+        """
+        Call a monitor API endpoint (relative to the API prefix) and return the decoded JSON.
+        HTTP errors are raised as RuntimeError, matching BaseAgent.call_monitor_api.
+        """
+        try:
+            response = self.request(method, f"{self.api_prefix}{endpoint}", json=data)
+            response.raise_for_status()
+            return response.json() if response.content else {}
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Monitor API call {method} {endpoint} failed: {e}") from e
+
+    def bulk_create(self, endpoint, records):
+        """
+        Create many records on a collection endpoint such as '/stf-files/'.
+
+        In bulk mode the records are POSTed as JSON lists to '<endpoint>bulk/' in chunks of
+        bulk_size. If the monitor does not offer the bulk endpoint (404/405) the client falls
+        back to one POST per record and stays in per-record mode. Returns one result per
+        record, in order; a failed record yields None. A failed bulk request (HTTP error,
+        connection failure or timeout) raises RuntimeError, as call_api does.
+        """
+        if self.bulk:
+            results = []
+            for start in range(0, len(records), self.bulk_size):
+                chunk = records[start:start + self.bulk_size]
+                try:
+                    response = self.request('POST', f"{self.api_prefix}{endpoint}{self.bulk_suffix}", json=chunk)
+                    if response.status_code in (404, 405):
+                        self.bulk = False
+                        return results + self._create_each(endpoint, records[start:])
+                    response.raise_for_status()
+                except requests.exceptions.RequestException as e:
+                    raise RuntimeError(f"Monitor bulk create on {endpoint} failed: {e}") from e
+                created = response.json()
+                if isinstance(created, dict):
+                    created = created.get('results', [])
+                results.extend(created + [None] * (len(chunk) - len(created)))
+            return results
+        return self._create_each(endpoint, records)
+
+    def _create_each(self, endpoint, records):
+        results = []
+        for record in records:
+            try:
+                results.append(self.call_api('POST', endpoint, record))
+            except RuntimeError:
+                results.append(None)
+        return results
+
+    def close(self):
+        self.session.close()
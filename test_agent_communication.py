@@ -10,6 +10,8 @@ import time
 import requests
 from pathlib import Path
 
+from swf_testbed_cli.monitor_client import MonitorClient
+
 def setup_environment():
     """Auto-activate venv and load environment variables."""
     script_dir = Path(__file__).resolve().parent
@@ -62,15 +64,10 @@ def test_monitor_connection():
     print(f"Monitor URL: {monitor_url}")
     print(f"API Token: {api_token[:10]}...")
     
-    # Configure session exactly like agents do
-    session = requests.Session()
-    session.headers.update({'Authorization': f'Token {api_token}'})
-    session.verify = False  # Allow self-signed certs
-    session.proxies = {'http': None, 'https': None}
-    
-    # Suppress SSL warnings
-    import urllib3
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    # Configure session exactly like agents do (self-signed certs allowed, no proxies)
+    client = MonitorClient.from_env(monitor_url=monitor_url, api_token=api_token,
+                                    verify=False, disable_proxies=True)
+    session = client.session
     
     try:
         # Test heartbeat endpoint like agents do
@@ -0,0 +1,49 @@
+from dedup_cache import DedupCache, message_key
+
+
+def stf(filename, msg_type='stf_gen', run_id=100001):
+    return {'msg_type': msg_type, 'run_id': run_id, 'filename': filename}
+
+
+def test_redelivered_file_message_is_dropped():
+    cache = DedupCache()
+    assert cache.check_and_add(stf('a.stf'))
+    assert not cache.check_and_add(stf('a.stf'))
+    assert cache.check_and_add(stf('b.stf'))
+    assert cache.check_and_add(stf('a.stf', msg_type='data_ready'))
+    assert cache.metrics()['dedup_hits'] == 1
+
+
+def test_lifecycle_messages_without_filename_are_never_dropped():
+    # A run can be paused and resumed several times; those messages must not collide
+    cache = DedupCache()
+    pause = {'msg_type': 'pause_run', 'run_id': 100001, 'simulation_tick': 10}
+    assert message_key(pause) is None
+    assert cache.check_and_add(pause)
+    assert cache.check_and_add(dict(pause, simulation_tick=20))
+    assert cache.check_and_add(pause)
+    assert cache.metrics()['dedup_entries'] == 0
+
+
+def test_forget_lets_redelivery_through():
+    cache = DedupCache()
+    assert cache.check_and_add(stf('a.stf'))
+    cache.forget(stf('a.stf'))
+    assert cache.check_and_add(stf('a.stf'))
+
+
+def test_sqlite_store_survives_restart(tmp_path):
+    db = str(tmp_path / 'seen.db')
+    cache = DedupCache(db_path=db)
+    assert cache.check_and_add(stf('a.stf'))
+    cache.close()
+    restarted = DedupCache(db_path=db)
+    assert not restarted.check_and_add(stf('a.stf'))
+    assert restarted.stats['store_hits'] == 1
+    restarted.close()
+
+
+def test_disabled_cache_passes_everything():
+    cache = DedupCache(enabled=False)
+    assert cache.check_and_add(stf('a.stf'))
+    assert cache.check_and_add(stf('a.stf'))
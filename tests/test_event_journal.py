@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from event_journal import (EventJournal, HEADER, JournalSegment, iter_events, list_segments, read_segment,
+                           segment_path, to_legacy_files)
+
+
+def stf(run_id, index):
+    return {'msg_type': 'stf_gen', 'run_id': run_id, 'filename': f"swf.{run_id}.{index:06d}.stf"}
+
+
+def test_append_and_replay_per_run(tmp_path):
+    journal = EventJournal(tmp_path, flush_every=2)
+    journal.append(1, 'run_1_imminent', {'msg_type': 'run_imminent', 'run_id': 1})
+    for index in range(3):
+        journal.append(1, f"stf_1_{index:06d}_gen", stf(1, index))
+    journal.append(2, 'stf_2_000000_gen', stf(2, 0))
+    journal.close()
+
+    assert sorted(list_segments(tmp_path)) == ['1', '2']
+    assert [name for name, _ in read_segment(segment_path(tmp_path, 1))] == [
+        'run_1_imminent', 'stf_1_000000_gen', 'stf_1_000001_gen', 'stf_1_000002_gen']
+    assert [m['filename'] for _, _, m in iter_events(tmp_path, run_id=1, msg_type='stf_gen')] == [
+        stf(1, index)['filename'] for index in range(3)]
+    assert journal.stats['records'] == 5 and journal.stats['segments'] == 2
+
+
+def test_torn_record_is_skipped_and_cut_off_on_reopen(tmp_path):
+    path = segment_path(tmp_path, 7)
+    segment = JournalSegment(path)
+    for index in range(2):
+        segment.append(f"stf_{index}", stf(7, index))
+    segment.close()
+    complete = path.stat().st_size
+    with open(path, 'r+b') as f:
+        f.truncate(complete - 5)  # crash in the middle of the last record
+
+    assert [name for name, _ in read_segment(path)] == ['stf_0']
+
+    # Appending from a new process drops the torn tail so the new record stays readable
+    segment = JournalSegment(path)
+    segment.append('stf_1', stf(7, 1))
+    segment.append('stf_2', stf(7, 2))
+    segment.close()
+    assert [name for name, _ in read_segment(path)] == ['stf_0', 'stf_1', 'stf_2']
+
+
+def test_header_only_segment_replays_nothing(tmp_path):
+    path = segment_path(tmp_path, 3)
+    JournalSegment(path).close()
+    assert path.stat().st_size == HEADER.size
+    assert list(read_segment(path)) == []
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = segment_path(tmp_path, 9)
+    path.write_bytes(b'not a journal')
+    with pytest.raises(ValueError):
+        list(read_segment(path))
+
+
+def test_to_legacy_files_rebuilds_one_file_per_event(tmp_path):
+    journal = EventJournal(tmp_path / 'events')
+    journal.append(4, 'stf_4_000000_gen', stf(4, 0))
+    journal.close()
+    assert to_legacy_files(tmp_path / 'events', tmp_path / 'legacy') == 1
+    assert json.loads((tmp_path / 'legacy' / 'stf_4_000000_gen.json').read_text()) == stf(4, 0)
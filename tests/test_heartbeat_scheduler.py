@@ -0,0 +1,98 @@
+import time
+
+from heartbeat_scheduler import HeartbeatScheduler
+
+
+class Recorder:
+    """send_fn recording when each heartbeat went out and with which counters."""
+
+    def __init__(self, fail=False):
+        self.times = []
+        self.payloads = []
+        self.fail = fail
+
+    def __call__(self, counters):
+        self.times.append(time.monotonic())
+        self.payloads.append(counters)
+        if self.fail:
+            raise RuntimeError("monitor down")
+        return 'ok'
+
+    def wait_for(self, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.times) < count and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return len(self.times) >= count
+
+
+class MaxRandom:
+    """rng whose uniform() always returns the upper bound."""
+
+    def uniform(self, low, high):
+        return high
+
+
+def gaps(times):
+    # send_fn is timed a little after the scheduler's own timestamp: allow for the difference
+    return [later - earlier + 0.002 for earlier, later in zip(times, times[1:])]
+
+
+def test_sends_once_per_interval_with_merged_counters():
+    send = Recorder()
+    scheduler = HeartbeatScheduler(send, interval=0.05)
+    scheduler.update(messages=1, run_id=7)
+    scheduler.update(messages=2)
+    started = time.monotonic()
+    scheduler.start()
+    assert send.wait_for(4)
+    scheduler.stop()
+    assert send.times[0] - started >= 0.05  # the first heartbeat waits one interval too
+    assert all(gap >= 0.05 for gap in gaps(send.times))
+    assert send.payloads[0] == {'messages': 2, 'run_id': 7}
+    assert scheduler.sent_count == len(send.times)
+
+
+def test_send_now_restarts_the_interval():
+    send = Recorder()
+    scheduler = HeartbeatScheduler(send, interval=0.1).start()
+    time.sleep(0.06)
+    assert scheduler.send_now(state='run_started') == 'ok'
+    assert send.wait_for(2)
+    scheduler.stop()
+    assert send.payloads[0] == {'state': 'run_started'}
+    assert gaps(send.times)[0] >= 0.1
+
+
+def test_jitter_only_lengthens_the_wait():
+    send = Recorder()
+    scheduler = HeartbeatScheduler(send, interval=0.04, jitter=0.5, rng=MaxRandom()).start()
+    assert send.wait_for(3)
+    scheduler.stop()
+    assert all(gap >= 0.06 for gap in gaps(send.times))
+
+    send = Recorder()
+    scheduler = HeartbeatScheduler(send, interval=0.02, jitter=1.0).start()
+    assert send.wait_for(5)
+    scheduler.stop()
+    assert all(gap >= 0.02 for gap in gaps(send.times))
+
+
+def test_stop_ends_the_thread_before_the_next_heartbeat():
+    send = Recorder()
+    scheduler = HeartbeatScheduler(send, interval=30).start()
+    started = time.monotonic()
+    scheduler.stop()
+    assert time.monotonic() - started < 1.0
+    assert not scheduler._thread.is_alive()
+    assert send.times == []
+    # Stopping a scheduler that was never started is harmless
+    HeartbeatScheduler(send).stop()
+
+
+def test_failing_send_is_not_counted_and_keeps_the_schedule():
+    send = Recorder(fail=True)
+    scheduler = HeartbeatScheduler(send, interval=0.02).start()
+    assert send.wait_for(3)
+    scheduler.stop()
+    assert scheduler.sent_count == 0
+    assert scheduler.send_now() is None
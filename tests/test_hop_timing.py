@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import hop_timing
+from hop_timing import forward, hop_intervals, mark_received, stamp_origin
+
+
+def chain():
+    """stf_gen from the DAQ simulator, relayed by the data agent and the processing agent."""
+    stf_gen = stamp_origin({'msg_type': 'stf_gen'}, 'daq-simulator', now=100.0)
+    received = mark_received(json.loads(json.dumps(stf_gen)), 'data-agent', now=100.25)
+    data_ready = forward(received, {'msg_type': 'data_ready'}, now=100.75)
+    received = mark_received(json.loads(json.dumps(data_ready)), 'processing-agent', now=101.0)
+    processing_complete = forward(received, {'msg_type': 'processing_complete'}, now=103.0)
+    return stf_gen, data_ready, processing_complete
+
+
+def test_trailer_format():
+    _, _, processing_complete = chain()
+    assert processing_complete['timing'] == {
+        'origin': 100.0,
+        'hops': [{'agent': 'daq-simulator', 'sent': 100.0},
+                 {'agent': 'data-agent', 'received': 100.25, 'sent': 100.75},
+                 {'agent': 'processing-agent', 'received': 101.0, 'sent': 103.0}],
+    }
+    assert json.loads(json.dumps(processing_complete)) == processing_complete
+
+
+def test_stamp_origin_keeps_an_existing_trailer():
+    message = stamp_origin({}, 'daq-simulator', now=1.0)
+    again = stamp_origin(message, 'other', now=2.0)
+    assert again['timing'] == {'origin': 1.0, 'hops': [{'agent': 'daq-simulator', 'sent': 1.0}]}
+
+
+def test_forward_leaves_the_incoming_trailer_untouched():
+    incoming = mark_received(stamp_origin({}, 'a', now=1.0), 'b', now=2.0)
+    outgoing = forward(incoming, {}, now=3.0)
+    assert 'sent' not in incoming['timing']['hops'][-1]
+    assert outgoing['timing']['hops'][-1] == {'agent': 'b', 'received': 2.0, 'sent': 3.0}
+    # Nothing to carry over from an unstamped message
+    assert forward({}, {'msg_type': 'x'}) == {'msg_type': 'x'}
+
+
+def test_unstamped_message_starts_its_chain_on_receipt():
+    message = mark_received({'msg_type': 'stf_gen'}, 'data-agent', now=5.0)
+    assert message['timing'] == {'origin': 5.0, 'hops': [{'agent': 'data-agent', 'received': 5.0}]}
+    assert hop_intervals(message) == [('total', 0.0)]
+
+
+def test_hop_intervals_split_transit_and_service_time():
+    stf_gen, data_ready, processing_complete = chain()
+    assert hop_intervals(stf_gen) == [('total', 0.0)]
+    assert hop_intervals(data_ready) == [('daq-simulator->data-agent', 0.25), ('data-agent', 0.5), ('total', 0.75)]
+    assert hop_intervals(processing_complete) == [
+        ('daq-simulator->data-agent', 0.25), ('data-agent', 0.5),
+        ('data-agent->processing-agent', 0.25), ('processing-agent', 2.0), ('total', 3.0)]
+    assert hop_intervals({'msg_type': 'end_run'}) == []
+
+
+def test_disabled_timing_adds_nothing(monkeypatch):
+    monkeypatch.setattr(hop_timing, 'ENABLED', False)
+    assert stamp_origin({}, 'a') == {}
+    assert mark_received({}, 'b') == {}
+    assert forward({'timing': {'origin': 1.0, 'hops': [{'agent': 'a', 'sent': 1.0}]}}, {}) == {}
+
+
+@pytest.mark.parametrize('trailer', [None, 'garbage', {'origin': 1.0}])
+def test_malformed_trailers_yield_no_intervals(trailer):
+    assert hop_intervals({'timing': trailer}) == []
@@ -0,0 +1,72 @@
+import json
+import types
+
+import pytest
+
+import hop_timing
+from hop_timing import forward, mark_received, stamp_origin
+from latency_collector import LatencyCollector
+from sse_benchmark import percentile
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls the time the collector stamps on receipt."""
+    fake = types.SimpleNamespace(now=0.0)
+    monkeypatch.setattr(hop_timing, 'time', types.SimpleNamespace(time=lambda: fake.now))
+    return fake
+
+
+def relay(message, agent, received, sent, msg_type):
+    incoming = json.loads(json.dumps(message))  # as delivered by the broker
+    return forward(mark_received(incoming, agent, now=received), {'msg_type': msg_type, 'filename': 'a.stf'}, now=sent)
+
+
+def test_each_hop_is_counted_once_across_the_chain(clock):
+    collector = LatencyCollector()
+    stf_gen = stamp_origin({'msg_type': 'stf_gen', 'filename': 'a.stf'}, 'daq-simulator', now=10.0)
+    data_ready = relay(stf_gen, 'data-agent', 10.1, 10.3, 'data_ready')
+    processing_complete = relay(data_ready, 'processing-agent', 10.5, 11.5, 'processing_complete')
+    for message, arrival in ((stf_gen, 10.05), (data_ready, 10.4), (processing_complete, 12.0)):
+        clock.now = arrival
+        collector.add(json.loads(json.dumps(message)))
+
+    summary = collector.summary()
+    assert {label: s['count'] for label, s in summary.items()} == {
+        'daq-simulator->latency-collector': 1, 'total (stf_gen)': 1,
+        'daq-simulator->data-agent': 1, 'data-agent': 1, 'data-agent->latency-collector': 1, 'total (data_ready)': 1,
+        'data-agent->processing-agent': 1, 'processing-agent': 1, 'processing-agent->latency-collector': 1,
+        'total (processing_complete)': 1,
+    }
+    assert summary['data-agent']['p50'] == 200.0
+    assert summary['processing-agent']['max'] == 1000.0
+    assert summary['total (processing_complete)']['p99'] == 2000.0
+    assert list(collector.timelines()['a.stf']) == ['stf_gen', 'data_ready', 'processing_complete']
+
+
+def test_percentiles_per_hop(clock):
+    collector = LatencyCollector()
+    for ms in range(1, 101):
+        clock.now = 1000.0 + ms / 1000
+        collector.add(stamp_origin({'msg_type': 'stf_gen'}, 'daq-simulator', now=1000.0))
+    hop = collector.summary()['daq-simulator->latency-collector']
+    assert hop == {'count': 100, 'p50': 51.0, 'p95': 95.0, 'p99': 99.0, 'max': 100.0}
+
+
+def test_percentile_picks_the_nearest_rank():
+    values = [1, 2, 3, 4, 5]
+    assert [percentile(values, f) for f in (0.0, 0.25, 0.5, 0.95, 1.0)] == [1, 2, 3, 5, 5]
+    assert percentile([7], 0.99) == 7
+    assert percentile([], 0.5) is None
+
+
+def test_window_and_messages_without_timing(clock):
+    collector = LatencyCollector(window=10, max_timelines=2)
+    for index in range(20):
+        clock.now = float(index)
+        collector.add(stamp_origin({'msg_type': 'stf_gen', 'filename': f'{index}.stf'}, 'daq-simulator',
+                                   now=index - 0.5))
+    collector.add({'msg_type': 'end_run'})
+    assert collector.summary()['total (stf_gen)']['count'] == 10
+    assert list(collector.timelines()) == ['18.stf', '19.stf']
+    assert (collector.messages, collector.without_timing) == (21, 1)
@@ -0,0 +1,146 @@
+import threading
+
+import pytest
+
+from local_transport import LocalBroker, LocalConnection, LocalMonitorAPI
+
+
+class Listener:
+    def __init__(self, fail=False):
+        self.bodies = []
+        self.fail = fail
+
+    def on_message(self, frame):
+        self.bodies.append(frame.body)
+        if self.fail:
+            raise ValueError("listener failed")
+
+
+def test_topic_fans_out_and_queue_round_robins():
+    broker = LocalBroker()
+    a, b = Listener(), Listener()
+    for listener in (a, b):
+        broker.subscribe('/topic/epictopic', listener)
+        broker.subscribe('/queue/data_agent', listener)
+    for i in range(4):
+        broker.send('epictopic', f't{i}')
+        broker.send('data_agent', f'q{i}')
+    assert broker.pump() == 8
+    assert a.bodies == ['t0', 'q0', 't1', 't2', 'q2', 't3']
+    assert b.bodies == ['t0', 't1', 'q1', 't2', 't3', 'q3']
+    assert broker.stats == {'sent': 8, 'delivered': 12, 'dropped': 0, 'failed': 0}
+
+
+def test_queue_retains_messages_until_a_subscriber_arrives():
+    broker = LocalBroker()
+    broker.send('processing_agent', 'first')
+    broker.send('epictopic', 'nobody listens')
+    broker.pump()
+    assert broker.stats['dropped'] == 1
+    listener = Listener()
+    broker.subscribe('processing_agent', listener)
+    broker.send('processing_agent', 'second')
+    broker.pump()
+    assert listener.bodies == ['first', 'second']
+
+
+def test_failing_listener_is_counted_and_others_still_receive():
+    broker = LocalBroker()
+    bad, good = Listener(fail=True), Listener()
+    broker.subscribe('epictopic', bad)
+    broker.subscribe('epictopic', good)
+    broker.send('epictopic', 'm')
+    broker.pump()
+    assert good.bodies == ['m']
+    assert broker.stats['failed'] == 1 and broker.stats['delivered'] == 1
+
+
+def test_delivery_thread_keeps_send_order_and_join_waits():
+    broker = LocalBroker().start()
+    listener = Listener()
+    broker.subscribe('epictopic', listener)
+    senders = []
+    for n in range(3):
+        sender = threading.Thread(target=lambda n=n: [broker.send('epictopic', (n, i)) for i in range(100)])
+        senders.append(sender)
+        sender.start()
+    for sender in senders:
+        sender.join()
+    assert broker.join(5)
+    assert len(listener.bodies) == 300
+    for n in range(3):
+        assert [i for m, i in listener.bodies if m == n] == list(range(100))
+    broker.close()
+
+
+def test_join_times_out_while_a_listener_blocks():
+    release = threading.Event()
+
+    class Blocking:
+        def on_message(self, frame):
+            release.wait()
+
+    broker = LocalBroker().start()
+    broker.subscribe('epictopic', Blocking())
+    broker.send('epictopic', 'm')
+    assert not broker.join(0.05)
+    release.set()
+    assert broker.join(5)
+    broker.close()
+
+
+def test_close_delivers_pending_with_a_thread_and_discards_without_one():
+    threaded = LocalBroker()
+    listener = Listener()
+    threaded.subscribe('epictopic', listener)
+    for i in range(10):
+        threaded.send('epictopic', i)
+    threaded.start().close(5)
+    assert listener.bodies == list(range(10))
+
+    unstarted = LocalBroker()
+    unstarted.subscribe('epictopic', Listener())
+    unstarted.send('epictopic', 'never delivered')
+    unstarted.close()
+    assert unstarted.pump() == 0
+
+
+def test_connection_requires_connect_and_disconnect_unsubscribes():
+    broker = LocalBroker()
+    conn = LocalConnection(broker)
+    listener = Listener()
+    conn.set_listener('agent', listener)
+    with pytest.raises(ConnectionError):
+        conn.send('epictopic', 'm')
+    conn.connect()
+    conn.subscribe(destination='/topic/epictopic', id=1)
+    conn.send('epictopic', 'm')
+    broker.pump()
+    conn.disconnect()
+    broker.send('epictopic', 'after disconnect')
+    broker.pump()
+    assert listener.bodies == ['m']
+
+
+def test_monitor_api_creates_updates_and_counts_requests():
+    monitor = LocalMonitorAPI(first_run_number=500)
+    run = monitor.call_api('POST', '/runs/', {'run_number': 500})
+    files = monitor.bulk_create('/stf-files/', [{'stf_filename': 'a.stf'}, {'stf_filename': 'b.stf'}])
+    assert [f['stf_filename'] for f in files] == ['a.stf', 'b.stf']
+    updated = monitor.call_api('PATCH', f"/stf-files/{files[0]['file_id']}/", {'status': 'processed'})
+    assert updated['status'] == 'processed'
+    assert monitor.call_api('POST', '/state/next-run-number/', {'count': 2})['run_numbers'] == [500, 501]
+    assert monitor.records['runs'][str(run['run_id'])]['run_number'] == 500
+    assert monitor.requests == {'POST /runs/': 1, 'POST /stf-files/': 2, 'PATCH /stf-files/': 1, 'POST /state/': 1}
+
+
+def test_monitor_api_errors_and_session_routing():
+    monitor = LocalMonitorAPI()
+    with pytest.raises(RuntimeError, match='404'):
+        monitor.call_api('PATCH', '/runs/999/', {})
+    with pytest.raises(RuntimeError, match='404'):
+        monitor.call_api('GET', '/unknown/')
+    response = monitor.session.post('http://monitor.example/swf-monitor/api/systemagents/heartbeat/',
+                                    json={'instance_name': 'data-agent-1', 'status': 'OK'})
+    assert response.ok and response.json()['status'] == 'OK'
+    assert monitor.agents['data-agent-1']['status'] == 'OK'
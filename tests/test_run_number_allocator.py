@@ -0,0 +1,84 @@
+import json
+import threading
+
+import pytest
+
+from run_number_allocator import RunNumberAllocator
+
+
+class FakeMonitor:
+    """Hands out consecutive run numbers; fetches can be held until released."""
+
+    def __init__(self, first=100000):
+        self.next_number = first
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def reserve(self, count):
+        self.release.wait(5)
+        self.calls.append(count)
+        numbers = list(range(self.next_number, self.next_number + count))
+        self.next_number += count
+        return numbers
+
+
+def wait_for_refill(allocator):
+    if allocator._refill_thread is not None:
+        allocator._refill_thread.join(5)
+
+
+def test_empty_cache_reserves_a_block_synchronously():
+    monitor = FakeMonitor()
+    allocator = RunNumberAllocator(monitor.reserve, block_size=4, low_watermark=0)
+    assert allocator.next() == '100000'
+    assert allocator.remaining() == 3
+    assert allocator.stats['remote_fallbacks'] == 1
+    assert monitor.calls == [4]
+    assert [allocator.next() for _ in range(3)] == ['100001', '100002', '100003']
+    # Taking the last cached number starts a background refill, so the next run does not wait
+    wait_for_refill(allocator)
+    assert allocator.next() == '100004'
+    assert allocator.stats['remote_fallbacks'] == 1
+
+
+def test_low_watermark_refills_in_the_background():
+    monitor = FakeMonitor()
+    allocator = RunNumberAllocator(monitor.reserve, block_size=4, low_watermark=2)
+    allocator.next()  # synchronous block; 3 left
+    monitor.release.clear()
+    allocator.next()  # 2 left: at the watermark, refill starts but does not block this call
+    assert allocator.remaining() == 2
+    monitor.release.set()
+    wait_for_refill(allocator)
+    assert allocator.remaining() == 6
+    assert monitor.calls == [4, 4]
+    assert [allocator.next() for _ in range(6)][-1] == '100007'
+    assert allocator.stats['remote_fallbacks'] == 1
+
+
+def test_reserved_numbers_survive_a_restart(tmp_path):
+    state = tmp_path / 'state' / 'run_numbers.json'
+    monitor = FakeMonitor()
+    allocator = RunNumberAllocator(monitor.reserve, block_size=5, state_file=state, low_watermark=0)
+    assert allocator.next() == '100000'
+    assert json.loads(state.read_text()) == {'reserved': ['100001', '100002', '100003', '100004']}
+
+    restarted = RunNumberAllocator(monitor.reserve, block_size=5, state_file=state, low_watermark=0)
+    assert restarted.remaining() == 4
+    assert restarted.next() == '100001'
+    assert monitor.calls == [5]
+
+
+def test_unreadable_state_file_is_ignored(tmp_path):
+    state = tmp_path / 'run_numbers.json'
+    state.write_text('{torn')
+    allocator = RunNumberAllocator(FakeMonitor().reserve, block_size=2, state_file=state, low_watermark=0)
+    assert allocator.remaining() == 0
+    assert allocator.next() == '100000'
+
+
+def test_empty_remote_block_raises():
+    allocator = RunNumberAllocator(lambda count: [], block_size=3)
+    with pytest.raises(RuntimeError):
+        allocator.next()
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from shard_partition import ShardPartition
+
+KEYS = [f"swf.100042.{index:06d}.stf" for index in range(2000)]
+
+
+def owners(count, keys=KEYS):
+    partition = ShardPartition(count=count)
+    return {key: partition.owner(key) for key in keys}
+
+
+def test_every_shard_computes_the_same_owner_and_load_is_balanced():
+    assert owners(4) == {key: ShardPartition(index=3, count=4).owner(key) for key in KEYS}
+    load = [list(owners(4).values()).count(shard) for shard in range(4)]
+    assert all(400 <= n <= 600 for n in load), load
+
+
+def test_adding_a_shard_only_moves_keys_to_the_new_shard():
+    before, after = owners(4), owners(5)
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == 4 for key in moved)
+    assert 0.15 < len(moved) / len(KEYS) < 0.25  # about 1/5 of the keys
+
+
+def test_removing_a_shard_only_moves_its_own_keys():
+    before, after = owners(5), owners(4)
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert moved == [key for key in KEYS if before[key] == 4]
+
+
+def test_owns_stf_counts_and_run_id_key_keeps_a_run_together():
+    shards = [ShardPartition(index=i, count=3) for i in range(3)]
+    for key in KEYS[:300]:
+        assert sum(shard.owns_stf({'filename': key}) for shard in shards) == 1
+    assert sum(shard.stats['owned'] for shard in shards) == 300
+    assert all(shard.stats['owned'] + shard.stats['skipped'] == 300 for shard in shards)
+
+    by_run = [ShardPartition(index=i, count=3, key='run_id') for i in range(3)]
+    stfs = [{'run_id': 100042, 'filename': key} for key in KEYS[:50]]
+    assert [sum(shard.owns_stf(stf) for stf in stfs) for shard in by_run].count(50) == 1
+    assert by_run[0].owns_run(100042) == by_run[0].owns_stf({'run_id': 100042})
+
+
+def test_single_shard_owns_everything_and_bad_settings_are_rejected(monkeypatch):
+    single = ShardPartition()
+    assert not single.enabled and single.owns_run(1) and single.owns_stf({'filename': 'a.stf'})
+    for kwargs in ({'count': 0}, {'index': 2, 'count': 2}, {'key': 'checksum'}):
+        with pytest.raises(ValueError):
+            ShardPartition(**kwargs)
+    monkeypatch.setenv('SWF_DATA_AGENT_SHARDS', '3')
+    monkeypatch.setenv('SWF_DATA_AGENT_SHARD', '2')
+    monkeypatch.setenv('SWF_DATA_AGENT_SHARD_KEY', 'RUN_ID')
+    assert ShardPartition.from_env().describe() == {'shard': 2, 'shards': 3, 'key': 'run_id', 'owned': 0, 'skipped': 0}
+
+
+def test_lifecycle_messages_are_handled_by_the_owning_shard(monkeypatch):
+    from example_data_agent import DataAgent
+    from local_transport import LocalBroker, LocalMonitorAPI, create_local_agent
+
+    broker = LocalBroker()
+    monitor = LocalMonitorAPI()
+    monkeypatch.setenv('SWF_DATA_AGENT_SHARDS', '2')
+    monkeypatch.setenv('SWF_DATA_AGENT_PIPELINE', '1')
+    monkeypatch.setenv('SWF_HEARTBEAT_INTERVAL', '3600')
+    agents = []
+    for index in range(2):
+        monkeypatch.setenv('SWF_DATA_AGENT_SHARD', str(index))
+        agents.append(create_local_agent(DataAgent, broker, monitor))
+    run_id = 100042
+    owner = agents[0].partition.owner(str(run_id))
+
+    def publish(message):
+        broker.send('epictopic', json.dumps(message))
+        broker.pump()
+
+    try:
+        publish({'msg_type': 'run_imminent', 'run_id': run_id, 'run_conditions': {}})
+        publish({'msg_type': 'start_run', 'run_id': run_id})
+        for key in KEYS[:20]:
+            publish({'msg_type': 'stf_gen', 'run_id': run_id, 'filename': key, 'size_bytes': 1024})
+        publish({'msg_type': 'end_run', 'run_id': run_id, 'total_files': 20})
+    finally:
+        for agent in agents:
+            agent.shutdown()
+        broker.close()
+
+    # Only the owner registers and completes the run; the other shard learns its monitor ID
+    assert monitor.requests['POST /runs/'] == 1
+    assert monitor.requests['PATCH /runs/'] == 1
+    assert broker.per_destination['epictopic'] == 23 + 1  # plus the owner's run_registered
+    # Each STF is registered once, by the shard that owns its filename, under the owner's run
+    [run] = monitor.records['runs'].values()
+    files = list(monitor.records['stf-files'].values())
+    assert sorted(f['stf_filename'] for f in files) == sorted(KEYS[:20])
+    assert all(f['run'] == run['run_id'] for f in files)
+    assert [agent.partition.stats['owned'] for agent in agents] == [
+        sum(agents[owner].partition.owner(key) == index for key in KEYS[:20]) for index in range(2)]
+    assert 0 < agents[1 - owner].partition.stats['owned'] < 20
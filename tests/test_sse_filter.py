@@ -0,0 +1,63 @@
+import json
+
+from sse_filter import EventFilter
+
+
+def event(**fields):
+    return json.dumps(fields)
+
+
+STF = event(msg_type='stf_gen', run_id=100042, filename='swf.100042.000001.stf',
+            timing={'origin': 1.0, 'hops': [{'agent': 'daq-simulator', 'sent': 1.0}]})
+
+
+def test_matches_top_level_fields():
+    assert EventFilter(msg_types=['stf_gen']).match(STF)
+    assert EventFilter(run_ids=['100042']).match(STF)
+    assert EventFilter(run_ids=['1000*']).match(STF)
+    assert EventFilter(filename_pattern='swf.100042.*.stf').match(STF)
+    assert EventFilter(msg_types=['stf_gen'], run_ids=['100042'], filename_pattern='*.stf').match(STF)
+
+
+def test_rejects_non_matching_events():
+    assert not EventFilter(msg_types=['data_ready']).match(STF)
+    assert not EventFilter(run_ids=['100043', '2*']).match(STF)
+    assert not EventFilter(filename_pattern='*.dat').match(STF)
+    # A required field that is missing rejects the event
+    assert not EventFilter(run_ids=['100042']).match(event(msg_type='heartbeat'))
+
+
+def test_nested_keys_do_not_match():
+    nested = event(msg_type='run_imminent', run_id=100042,
+                   run_conditions={'msg_type': 'stf_gen', 'run_id': 7, 'filename': 'a.stf'})
+    assert not EventFilter(msg_types=['stf_gen']).match(nested)
+    assert not EventFilter(run_ids=['7']).match(nested)
+    assert not EventFilter(filename_pattern='a.stf').match(nested)
+    # The top-level key still matches when a nested one of the same name comes first
+    late = '{"payload": {"msg_type": "other"}, "msg_type": "stf_gen"}'
+    assert EventFilter(msg_types=['stf_gen']).match(late)
+
+
+def test_key_text_inside_string_values_does_not_match():
+    quoted = event(description='looks like "msg_type": "stf_gen" and {"run_id": 7}', msg_type='log')
+    assert not EventFilter(msg_types=['stf_gen']).match(quoted)
+    assert EventFilter(msg_types=['log']).match(quoted)
+    assert not EventFilter(run_ids=['7']).match(quoted)
+
+
+def test_escaped_string_values_are_decoded():
+    assert EventFilter(filename_pattern='café.stf').match(json.dumps({'filename': 'café.stf'}))
+    assert EventFilter(filename_pattern='a"b.stf').match(event(msg_type='stf_gen', filename='a"b.stf'))
+    assert EventFilter(filename_pattern='dir\\*.stf').match(event(filename='dir\\x.stf'))
+    # Key text inside an escaped string value still does not match
+    escaped = event(note='"filename": "a.stf"', filename='b.stf')
+    assert not EventFilter(filename_pattern='a.stf').match(escaped)
+    assert EventFilter(filename_pattern='b.stf').match(escaped)
+
+
+def test_sampling_keeps_one_in_n_per_type():
+    event_filter = EventFilter(sample={'stf_gen': 3})
+    kept = [event_filter.match(STF) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert event_filter.match(event(msg_type='end_run'))
+    assert event_filter.stats == {'seen': 8, 'passed': 4, 'rejected': 0, 'sampled_out': 4}
@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+
+from sse_multiplexer import SSEMultiplexer
+
+
+class StreamServer:
+    """Local monitor stand-in: each request streams `batch` events after Last-Event-ID, then closes."""
+
+    def __init__(self, batch=2):
+        self.batch = batch
+        self.requests = []
+
+    async def stream(self, request):
+        self.requests.append(request)
+        last = int(request.headers.get('Last-Event-ID', '0'))
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        await response.write(b'retry: 10\n\n')
+        for event_id in range(last + 1, last + 1 + self.batch):
+            data = json.dumps({'msg_types': request.query.get('msg_types'), 'n': event_id})
+            await response.write(f'id: {event_id}\ndata: {data}\n\n'.encode())
+        return response
+
+
+async def run_until(multiplexer, server, condition, timeout=5.0):
+    app = web.Application()
+    app.router.add_get('/api/messages/stream/', server.stream)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    multiplexer.monitor_base = f'http://127.0.0.1:{port}'
+    task = asyncio.create_task(multiplexer.run())
+    try:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition():
+            assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+            await asyncio.sleep(0.01)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await runner.cleanup()
+
+
+def multiplexer(**kwargs):
+    return SSEMultiplexer('http://unused', reconnect_initial=0.01, reconnect_max=0.05, **kwargs)
+
+
+def test_each_subscription_gets_its_filtered_stream():
+    received = {'stf': [], 'ready': []}
+
+    async def on_ready(event, sub):
+        received['ready'].append(json.loads(event.data))
+
+    mux = multiplexer(api_token='secret')
+    mux.subscribe('stf', lambda event, sub: received['stf'].append(json.loads(event.data)), msg_types=['stf_gen'])
+    mux.subscribe('ready', on_ready, msg_types=['data_ready', 'processing_complete'])
+    server = StreamServer()
+    asyncio.run(run_until(mux, server, lambda: len(received['stf']) >= 2 and len(received['ready']) >= 2))
+    assert received['stf'][:2] == [{'msg_types': 'stf_gen', 'n': 1}, {'msg_types': 'stf_gen', 'n': 2}]
+    assert received['ready'][0]['msg_types'] == 'data_ready,processing_complete'
+    assert all(request.headers['Authorization'] == 'Token secret' for request in server.requests)
+
+
+def test_reconnect_resumes_from_last_event_id():
+    seen = []
+    mux = multiplexer()
+    sub = mux.subscribe('all', lambda event, sub: seen.append(event.id))
+    server = StreamServer(batch=2)
+    asyncio.run(run_until(mux, server, lambda: len(seen) >= 6))
+    assert seen[:6] == ['1', '2', '3', '4', '5', '6']
+    assert [request.headers.get('Last-Event-ID') for request in server.requests[:3]] == [None, '2', '4']
+    assert sub.reconnects >= 2 and sub.last_event_id == seen[-1]
+
+
+def test_failing_handler_does_not_stop_the_stream():
+    seen = []
+
+    def handler(event, sub):
+        seen.append(event.id)
+        raise ValueError("bad event")
+
+    mux = multiplexer()
+    sub = mux.subscribe('all', handler)
+    asyncio.run(run_until(mux, StreamServer(), lambda: len(seen) >= 4))
+    assert sub.events_received >= 4
+
+
+def test_heartbeat_runs_alongside_the_streams():
+    beats = []
+    mux = multiplexer(heartbeat_fn=lambda: beats.append(1), heartbeat_interval=0.01)
+    mux.subscribe('all', lambda event, sub: None)
+    asyncio.run(run_until(mux, StreamServer(), lambda: len(beats) >= 3))
+
+
+def test_run_without_subscriptions_fails():
+    with pytest.raises(ValueError):
+        asyncio.run(multiplexer().run())
@@ -0,0 +1,79 @@
+import random
+
+from sse_stream import ReconnectBackoff, SSEDecoder
+
+STREAM = (
+    b'\xef\xbb\xbf: keep-alive\r\n'
+    b'retry: 2500\r\n'
+    b'id: 41\r\n'
+    b'event: connected\r\n'
+    b'data: {"status": "ok"}\r\n'
+    b'\r\n'
+    b'id: 42\n'
+    b'data: {"msg_type": "stf_gen",\n'
+    b'data:  "filename": "caf\xc3\xa9.stf"}\n'
+    b'\n'
+    b'data: no id of its own\r'
+    b'\r'
+)
+
+
+def decode(chunks, decoder=None):
+    decoder = decoder or SSEDecoder()
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    return decoder, events
+
+
+def summary(events):
+    return [(event.event, event.data, event.id, event.retry) for event in events]
+
+
+def test_decodes_fields_ids_and_retry():
+    decoder, events = decode([STREAM])
+    assert summary(events) == [
+        ('connected', '{"status": "ok"}', '41', 2500),
+        ('message', '{"msg_type": "stf_gen",\n "filename": "café.stf"}', '42', 2500),
+        ('message', 'no id of its own', '42', 2500),  # the last event ID carries over
+    ]
+    assert decoder.comments == 1
+    assert decoder.last_event_id == '42'
+
+
+def test_every_chunk_boundary_gives_the_same_events():
+    # Splits inside CRLF pairs, multi-byte UTF-8 characters and field names included
+    _, expected = decode([STREAM])
+    for size in (1, 2, 3, 5, 7, 16):
+        _, events = decode([STREAM[i:i + size] for i in range(0, len(STREAM), size)])
+        assert summary(events) == summary(expected), size
+
+
+def test_incomplete_event_is_held_until_its_blank_line():
+    decoder = SSEDecoder()
+    assert decoder.feed(b'data: partial') == []
+    assert decoder.feed(b'\n') == []
+    events = decoder.feed(b'\n')
+    assert [event.data for event in events] == ['partial']
+
+
+def test_invalid_retry_and_null_id_are_ignored():
+    decoder = SSEDecoder(last_event_id='7')
+    events = decoder.feed(b'retry: soon\nid: a\x00b\ndata: x\n\n')
+    assert events[0].id == '7' and events[0].retry is None
+
+
+def test_backoff_doubles_from_server_hint_up_to_maximum():
+    backoff = ReconnectBackoff(initial=0.25, maximum=4.0, jitter=0.0)
+    assert [backoff.next_delay() for _ in range(3)] == [0.25, 0.5, 1.0]
+    backoff.reset()
+    backoff.hint(2500)
+    assert [backoff.next_delay() for _ in range(3)] == [2.5, 4.0, 4.0]
+
+
+def test_backoff_jitter_stays_within_bounds():
+    backoff = ReconnectBackoff(initial=1.0, maximum=30.0, jitter=0.5, rng=random.Random(1))
+    for attempt in range(8):
+        delay = backoff.next_delay()
+        base = min(30.0, 2 ** attempt)
+        assert 0.5 * base <= delay <= min(30.0, 1.5 * base)
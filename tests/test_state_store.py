@@ -0,0 +1,73 @@
+from state_store import FileRecord, StateTable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def record(run_id=1):
+    return FileRecord(None, run_id, 'registered')
+
+
+def test_lru_eviction_keeps_recently_used():
+    table = StateTable(max_entries=2)
+    table.put('a', record())
+    table.put('b', record())
+    assert table.get('a') is not None  # 'a' is now the most recently used
+    table.put('c', record())
+    assert 'b' not in table
+    assert 'a' in table and 'c' in table
+    assert table.stats['evicted'] == 1
+
+
+def test_ttl_expiry_on_access_and_on_put():
+    clock = FakeClock()
+    table = StateTable(ttl=10, clock=clock)
+    table.put('a', record())
+    table.put('b', record())
+    clock.now = 5
+    assert table.get('b') is not None  # touching 'b' restarts its TTL
+    clock.now = 11
+    assert table.get('a') is None
+    table.put('c', record())
+    assert len(table) == 2
+    clock.now = 16
+    assert table.expire() == 1  # 'b' (touched at 5)
+    assert list(table.values())[0] is table.get('c')
+    assert table.stats['expired'] == 2
+
+
+def test_drop_group_removes_only_that_group():
+    table = StateTable()
+    for index in range(3):
+        table.put(f"run1-{index}", record(1), group=1)
+    table.put('run2-0', record(2), group=2)
+    assert table.group_size(1) == 3
+    assert table.drop_group(1) == 3
+    assert len(table) == 1 and table.group_size(1) == 0
+    assert table.drop_group(1) == 0
+    assert table.stats['dropped_by_group'] == 3
+
+
+def test_replacing_a_record_moves_it_between_groups():
+    table = StateTable()
+    table.put('a', record(1), group=1)
+    table.put('a', record(2), group=2)
+    assert table.group_size(1) == 0 and table.group_size(2) == 1
+
+
+def test_pop_group_returns_records_in_use_order():
+    clock = FakeClock()
+    table = StateTable(clock=clock)
+    for index, key in enumerate(('x', 'y', 'z')):
+        clock.now = index
+        table.put(key, record(1), group=1)
+    clock.now = 5
+    table.get('x')
+    popped = table.pop_group(1)
+    assert [r.touched for r in popped] == [1, 2, 5]
+    assert len(table) == 0
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from stf_registration_pipeline import StfRegistrationPipeline
+
+
+class Recorder:
+    """flush_fn that records batches and can be held to keep the worker busy."""
+
+    def __init__(self):
+        self.batches = []
+        self.flushed = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, batch):
+        self.release.wait()
+        self.batches.append([dict(record) for record in batch])
+        self.flushed.set()
+
+
+def test_batch_size_triggers_flush_before_interval():
+    flush = Recorder()
+    pipeline = StfRegistrationPipeline(flush, batch_size=3, flush_interval=60)
+    for i in range(3):
+        pipeline.submit(f'{i}.stf', run_id=1)
+    assert flush.flushed.wait(5)
+    assert [record['filename'] for record in flush.batches[0]] == ['0.stf', '1.stf', '2.stf']
+    pipeline.close()
+
+
+def test_interval_triggers_flush_of_partial_batch():
+    flush = Recorder()
+    pipeline = StfRegistrationPipeline(flush, batch_size=50, flush_interval=0.05)
+    started = time.monotonic()
+    pipeline.submit('a.stf', run_id=1)
+    assert flush.flushed.wait(5)
+    assert time.monotonic() - started >= 0.05
+    assert len(flush.batches[0]) == 1
+    pipeline.close()
+
+
+def test_updates_for_pending_file_are_coalesced():
+    flush = Recorder()
+    pipeline = StfRegistrationPipeline(flush, batch_size=50, flush_interval=60)
+    pipeline.submit('a.stf', run_id=1, status='registered')
+    pipeline.submit('b.stf', run_id=1, status='registered')
+    pipeline.submit('a.stf', file_size=10, status='processed')
+    assert pipeline.pending_count() == 2
+    assert pipeline.drain(5)
+    assert flush.batches == [[{'filename': 'a.stf', 'run_id': 1, 'status': 'processed', 'file_size': 10},
+                              {'filename': 'b.stf', 'run_id': 1, 'status': 'registered'}]]
+    assert pipeline.stats['submitted'] == 2 and pipeline.stats['coalesced'] == 1
+    pipeline.close()
+
+
+def test_drain_times_out_while_flush_is_stuck():
+    flush = Recorder()
+    flush.release.clear()
+    pipeline = StfRegistrationPipeline(flush, batch_size=50, flush_interval=60)
+    pipeline.submit('a.stf', run_id=1)
+    assert not pipeline.drain(0.1)
+    flush.release.set()
+    assert pipeline.drain(5)
+    assert pipeline.stats['flushed'] == 1
+    pipeline.close()
+
+
+def test_close_flushes_pending_and_rejects_new_records():
+    flush = Recorder()
+    pipeline = StfRegistrationPipeline(flush, batch_size=2, flush_interval=60)
+    for name in ('a.stf', 'b.stf', 'c.stf'):
+        pipeline.submit(name, run_id=1)
+    pipeline.close(5)
+    assert [record['filename'] for batch in flush.batches for record in batch] == ['a.stf', 'b.stf', 'c.stf']
+    assert pipeline.pending_count() == 0
+    with pytest.raises(RuntimeError):
+        pipeline.submit('d.stf', run_id=1)
+
+
+def test_failed_flush_is_counted_and_passed_to_on_failure():
+    def flush(batch):
+        raise RuntimeError("monitor down")
+
+    failed = []
+    pipeline = StfRegistrationPipeline(flush, batch_size=50, flush_interval=60, on_failure=failed.extend)
+    pipeline.submit('a.stf', run_id=1)
+    pipeline.submit('b.stf', run_id=1)
+    assert pipeline.drain(5)
+    assert [record['filename'] for record in failed] == ['a.stf', 'b.stf']
+    assert pipeline.stats['failed'] == 2 and pipeline.stats['flushed'] == 0
+    pipeline.close()
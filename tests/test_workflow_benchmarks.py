@@ -0,0 +1,74 @@
+"""
+Throughput benchmarks for the example agents (see workflow_benchmarks.py).
+
+Results are recorded into a throwaway history under tmp_path (run workflow_benchmarks.py
+directly to append to the real history). The assertions only check that each stage
+handled all of its messages, so slow machines do not fail the suite.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import workflow_benchmarks as wb
+
+
+@pytest.fixture
+def history(tmp_path):
+    return tmp_path / 'benchmark_history.jsonl'
+
+
+def test_sse_parse_throughput(history):
+    metrics = wb.bench_sse_parse(wb.scaled(20000))
+    entry = wb.record('sse_parse', metrics, history)
+    print(wb.format_entry(entry))
+    assert metrics['events'] == wb.scaled(20000) + 1  # plus the 'connected' event
+    assert metrics['dispatched'] == wb.scaled(20000)
+
+
+def test_sse_parse_small_chunks():
+    # Reads that split lines and events mid-way must not change what is dispatched
+    metrics = wb.bench_sse_parse(500, chunk_size=7)
+    assert metrics['dispatched'] == 500
+
+
+def test_daq_generation_throughput(history):
+    pytest.importorskip('simpy')
+    pytest.importorskip('requests')
+    pytest.importorskip('stomp')
+    pytest.importorskip('swf_common_lib')
+    metrics = wb.bench_daq_generation(wb.scaled(2000))
+    entry = wb.record('daq_generation', metrics, history)
+    print(wb.format_entry(entry))
+    # The schedule's rate must be the achieved rate: duration * stf_rate STFs per period
+    assert abs(metrics['stfs'] - metrics['expected_stfs']) <= 1
+    # run_imminent, start_run and end_run go out besides one stf_gen per STF
+    assert metrics['messages'] >= metrics['stfs'] + 3
+
+
+def test_data_agent_on_message_rate(history):
+    pytest.importorskip('swf_common_lib')
+    pytest.importorskip('requests')
+    metrics = wb.bench_data_agent(wb.scaled(2000))
+    entry = wb.record('data_agent', metrics, history)
+    print(wb.format_entry(entry))
+    assert metrics['data_ready_sent'] == wb.scaled(2000)
+
+
+def test_processing_agent_on_message_rate(history):
+    pytest.importorskip('swf_common_lib')
+    metrics = wb.bench_processing_agent(wb.scaled(2000))
+    entry = wb.record('processing_agent', metrics, history)
+    print(wb.format_entry(entry))
+    assert metrics['processing_complete_sent'] == wb.scaled(2000)
+
+
+def test_record_flags_regression(tmp_path):
+    path = tmp_path / 'history.jsonl'
+    for rate in (1000.0, 1100.0, 900.0):
+        wb.record('sse_parse', {'events_per_second': rate}, path)
+    entry = wb.record('sse_parse', {'events_per_second': 500.0}, path)
+    assert entry['baseline']['median'] == 1000.0
+    assert entry['baseline']['regression'] is True
+    assert len(wb.load_history(path, 'sse_parse')) == 4
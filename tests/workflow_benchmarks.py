@@ -0,0 +1,347 @@
+"""
+Workflow throughput benchmarks for the example agents.
+
+Each benchmark drives one stage of the DAQ -> data -> processing chain on the
+in-process transport (example_agents/local_transport.py), so no ActiveMQ broker or
+monitor is needed, and returns a dict of metrics:
+
+  daq_generation      DAQSimulator STF generation on the fast clock (STFs and messages/s)
+  data_agent          DataAgent.on_message for stf_gen messages (messages/s)
+  processing_agent    ProcessingAgent.on_message for data_ready messages (messages/s)
+  sse_parse           SSEDecoder plus EventDispatcher on a synthetic stream (events/s, MB/s)
+
+record() appends each result as one JSON line to the history file (benchmark_history.jsonl
+at the repo root, or SWF_BENCHMARK_HISTORY) together with the git commit, and compares
+the primary rate against the median of earlier entries so regressions stand out.
+SWF_BENCHMARK_SCALE multiplies the message counts (default 1).
+
+The tests in test_workflow_benchmarks.py run these under pytest; to run them on their own:
+
+  python tests/workflow_benchmarks.py [--scale 5] [--only sse_parse]
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+AGENTS_DIR = REPO_ROOT / 'example_agents'
+# Run as a script: the agents import their sibling modules and swf_testbed_cli from src/
+for path in (REPO_ROOT / 'src', AGENTS_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+HISTORY_FILE = Path(os.getenv('SWF_BENCHMARK_HISTORY', REPO_ROOT / 'benchmark_history.jsonl'))
+SCALE = float(os.getenv('SWF_BENCHMARK_SCALE', '1'))
+BASELINE_WINDOW = 5  # earlier entries the primary rate is compared against
+REGRESSION_THRESHOLD = 0.8  # flag a rate below 80% of the baseline
+
+# Benchmark name -> metric used for the regression comparison
+PRIMARY_METRIC = {
+    'daq_generation': 'messages_per_second',
+    'data_agent': 'messages_per_second',
+    'processing_agent': 'messages_per_second',
+    'sse_parse': 'events_per_second',
+}
+
+
+def scaled(count):
+    return max(1, int(count * SCALE))
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 1) if seconds > 0 else None
+
+
+@contextmanager
+def _environment(**values):
+    """Temporarily set environment variables read by agent constructors."""
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update({name: str(value) for name, value in values.items()})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@contextmanager
+def _working_directory(path):
+    """The simulator writes daq_events/ and daq_data/ into the current directory."""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def bench_daq_generation(num_stfs=2000, stf_rate=100.0):
+    """DAQSimulator: one run with a single physics period producing about num_stfs STFs."""
+    from daq_schedule import parse_schedule
+    from daq_simulator import DAQSimulator, create_environment
+    from local_transport import LocalBroker, LocalConnection, LocalMonitorAPI
+
+    duration = num_stfs / stf_rate
+    schedule = parse_schedule({
+        'defaults': {'states': {'no_beam_not_ready': 0, 'beam_not_ready': 0, 'beam_ready': 0,
+                                'standby': 0, 'run_end': 0},
+                     'gap_after': 0},
+        'runs': [{'physics_periods': [{'duration': duration, 'stf_rate': stf_rate}]}],
+    })
+    broker = LocalBroker()
+    monitor = LocalMonitorAPI()
+    with tempfile.TemporaryDirectory() as workdir, _working_directory(workdir):
+        env = create_environment('fast')
+        simulator = DAQSimulator(env, persist_payload=False, persist_events=False, log_mode='local',
+                                 run_number_state=None, connection=LocalConnection(broker), monitor=monitor)
+        started = time.perf_counter()
+        env.run(until=env.process(simulator.run_schedule(schedule)))
+        simulator.close()
+        seconds = time.perf_counter() - started
+    broker.close()
+    return {
+        'stf_rate': stf_rate,
+        'expected_stfs': round(duration * stf_rate),  # what the schedule asks for
+        'stfs': simulator.file_counter,
+        'messages': broker.stats['sent'],
+        'seconds': round(seconds, 4),
+        'stfs_per_second': _rate(simulator.file_counter, seconds),
+        'messages_per_second': _rate(broker.stats['sent'], seconds),
+        'monitor_requests': sum(monitor.requests.values()),
+    }
+
+
+def _frames(messages):
+    from local_transport import LocalFrame
+    return [LocalFrame(json.dumps(message), {'destination': 'benchmark'}) for message in messages]
+
+
+def _stf_messages(run_id, count, msg_type='stf_gen'):
+    now = time.time()
+    return [{
+        'msg_type': msg_type,
+        'filename': f"swf.{run_id}.{index:06d}.stf",
+        'run_id': run_id,
+        'file_url': f"file:///daq_data/{run_id}/swf.{run_id}.{index:06d}.stf",
+        'checksum': 'ad:12345678',
+        'size_bytes': 1024,
+        'simulation_tick': index,
+        'processed_by': 'daq-simulator',
+        'timing': {'origin': now, 'hops': [{'agent': 'daq-simulator', 'sent': now}]},
+    } for index in range(count)]
+
+
+def _time_on_message(agent, frames):
+    started = time.perf_counter()
+    for frame in frames:
+        agent.on_message(frame)
+    return time.perf_counter() - started
+
+
+def bench_data_agent(num_messages=2000):
+    """DataAgent.on_message for stf_gen, pipelined registration (the unpipelined path sleeps 0.1s per STF)."""
+    from example_data_agent import DataAgent
+    from local_transport import LocalBroker, LocalMonitorAPI, create_local_agent
+
+    broker = LocalBroker()  # not started: outgoing data_ready messages are only queued
+    monitor = LocalMonitorAPI()
+    with _environment(SWF_DATA_AGENT_PIPELINE='1', SWF_HEARTBEAT_INTERVAL='3600'):
+        agent = create_local_agent(DataAgent, broker, monitor)
+    run_id = 900001
+    try:
+        for frame in _frames([{'msg_type': 'run_imminent', 'run_id': run_id, 'simulation_tick': 0,
+                               'run_conditions': {}},
+                              {'msg_type': 'start_run', 'run_id': run_id, 'simulation_tick': 0}]):
+            agent.on_message(frame)
+        seconds = _time_on_message(agent, _frames(_stf_messages(run_id, num_messages)))
+    finally:
+        agent.shutdown()
+        broker.close()
+    return {
+        'messages': num_messages,
+        'seconds': round(seconds, 4),
+        'messages_per_second': _rate(num_messages, seconds),
+        'data_ready_sent': broker.per_destination.get('processing_agent', 0),
+        'monitor_requests': sum(monitor.requests.values()),
+    }
+
+
+def bench_processing_agent(num_messages=2000):
+    """ProcessingAgent.on_message for data_ready, inline executor with zero reconstruction time."""
+    from example_processing_agent import ProcessingAgent
+    from local_transport import LocalBroker, LocalMonitorAPI, create_local_agent
+
+    broker = LocalBroker()
+    monitor = LocalMonitorAPI()
+    with _environment(SWF_PROCESSING_EXECUTOR='inline', SWF_PROCESSING_TIME='0', SWF_HEARTBEAT_INTERVAL='3600'):
+        agent = create_local_agent(ProcessingAgent, broker, monitor)
+    run_id = 900002
+    try:
+        seconds = _time_on_message(agent, _frames(_stf_messages(run_id, num_messages, msg_type='data_ready')))
+    finally:
+        agent.shutdown()
+        broker.close()
+    return {
+        'messages': num_messages,
+        'seconds': round(seconds, 4),
+        'messages_per_second': _rate(num_messages, seconds),
+        'processing_complete_sent': agent.processing_stats['total_processed'],
+        'monitor_requests': sum(monitor.requests.values()),
+    }
+
+
+def build_sse_stream(num_events, msg_type='stf_gen'):
+    """A synthetic SSE stream as the monitor sends it, with a keepalive every 100 events."""
+    parts = [b'event: connected\ndata: {"status": "connected"}\n\n']
+    for index, message in enumerate(_stf_messages(100001, num_events, msg_type=msg_type)):
+        if index and index % 100 == 0:
+            parts.append(b': keepalive\n\n')
+        parts.append(f"id: {index}\nevent: {msg_type}\ndata: {json.dumps(message)}\n\n".encode())
+    return b''.join(parts)
+
+
+def bench_sse_parse(num_events=20000, chunk_size=None):
+    """The receiver's parse path: SSEDecoder on 64 KiB reads, then JSON decoding and dispatch."""
+    from sse_dispatch import EventDispatcher
+    from sse_stream import DEFAULT_CHUNK_SIZE, SSEDecoder
+
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    stream = build_sse_stream(num_events)
+    chunks = [stream[offset:offset + chunk_size] for offset in range(0, len(stream), chunk_size)]
+    received = []
+    dispatcher = EventDispatcher()
+    dispatcher.register(lambda message, event, source: received.append(message['filename']), msg_types=['stf_gen'])
+
+    decoder = SSEDecoder()
+    started = time.perf_counter()
+    events = 0
+    for chunk in chunks:
+        for event in decoder.feed(chunk):
+            events += 1
+            dispatcher.dispatch(event)
+    seconds = time.perf_counter() - started
+    dispatcher.close()
+    return {
+        'events': events,
+        'dispatched': len(received),
+        'bytes': len(stream),
+        'seconds': round(seconds, 4),
+        'events_per_second': _rate(events, seconds),
+        'mb_per_second': round(len(stream) / seconds / 1e6, 2) if seconds > 0 else None,
+    }
+
+
+BENCHMARKS = {
+    'daq_generation': lambda: bench_daq_generation(scaled(2000)),
+    'data_agent': lambda: bench_data_agent(scaled(2000)),
+    'processing_agent': lambda: bench_processing_agent(scaled(2000)),
+    'sse_parse': lambda: bench_sse_parse(scaled(20000)),
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path=None, benchmark=None):
+    """History entries, oldest first (optionally for one benchmark)."""
+    path = Path(path or HISTORY_FILE)
+    if not path.exists():
+        return []
+    entries = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if benchmark is None or entry.get('benchmark') == benchmark:
+                entries.append(entry)
+    return entries
+
+
+def record(benchmark, metrics, path=None):
+    """Append a result to the history file; returns the entry with its baseline comparison."""
+    path = Path(path or HISTORY_FILE)
+    metric = PRIMARY_METRIC.get(benchmark)
+    entry = {
+        'benchmark': benchmark,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'scale': SCALE,
+        'metrics': metrics,
+    }
+    if metric and metrics.get(metric):
+        earlier = [e['metrics'].get(metric) for e in load_history(path, benchmark)[-BASELINE_WINDOW:]
+                   if e.get('scale') == SCALE]
+        earlier = [value for value in earlier if value]
+        if earlier:
+            baseline = statistics.median(earlier)
+            entry['baseline'] = {'metric': metric, 'median': baseline, 'entries': len(earlier),
+                                 'ratio': round(metrics[metric] / baseline, 3),
+                                 'regression': metrics[metric] < REGRESSION_THRESHOLD * baseline}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+    return entry
+
+
+def format_entry(entry):
+    metric = PRIMARY_METRIC.get(entry['benchmark'])
+    line = f"{entry['benchmark']:<18} {metric}={entry['metrics'].get(metric)}"
+    baseline = entry.get('baseline')
+    if baseline:
+        flag = '  ⚠️ REGRESSION' if baseline['regression'] else ''
+        line += f" (x{baseline['ratio']} vs median {baseline['median']} of {baseline['entries']}){flag}"
+    return line
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the workflow throughput benchmarks")
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help='Run only this benchmark (repeatable)')
+    parser.add_argument('--scale', type=float, help='Multiply message counts (default SWF_BENCHMARK_SCALE or 1)')
+    parser.add_argument('--history', help=f'History file (default {HISTORY_FILE})')
+    parser.add_argument('--no-record', action='store_true', help='Print results without appending to the history')
+    args = parser.parse_args()
+
+    global SCALE
+    if args.scale:
+        SCALE = args.scale
+    status = 0
+    for name in args.only or BENCHMARKS:
+        try:
+            metrics = BENCHMARKS[name]()
+        except ImportError as e:
+            print(f"{name:<18} skipped ({e})")
+            continue
+        if args.no_record:
+            print(f"{name:<18} {json.dumps(metrics)}")
+            continue
+        entry = record(name, metrics, args.history)
+        print(format_entry(entry))
+        if entry.get('baseline', {}).get('regression'):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())